@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+
+### --------------------------------------------- ###
+### Part of iViz                                  ###
+### (C) 2022 Eddy ilg (me@eddy-ilg.net)           ###
+### Creative Commons                              ###
+### Attribution-NonCommercial-NoDerivatives       ###
+### 4.0 International License.                    ###
+### Commercial use an redistribution prohibited.  ###
+### See https://github.com/eddy-ilg/iviz          ###
+### --------------------------------------------- ###
+
+# Compares range changes of FloatPixmapVisualization with and without the
+# quantized mode, for each viz type, and reports the largest deviation of
+# the quantized output from the exact one (in 8 bit output levels).
+
+import sys
+import time
+import argparse
+import numpy as np
+from iviz.renderers import FloatPixmapVisualization
+
+
+class _Variable:
+    def __init__(self, data): self._data = data
+    def numpy(self): return self._data
+    def data(self): return self._data
+    def valid(self): return True
+    def file(self): return None
+
+
+class _Data:
+    def __init__(self, data): self._variable = _Variable(data)
+    def float(self): return self._variable
+    def props(self): return None
+
+
+def _time_ranges(viz, ranges):
+    start = time.perf_counter()
+    for range_min, range_max in ranges:
+        viz.set_range_min(range_min)
+        viz.set_range_max(range_max)
+    return (time.perf_counter() - start) / (2 * len(ranges))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--width", type=int, default=3840)
+    parser.add_argument("--height", type=int, default=2160)
+    parser.add_argument("--steps", type=int, default=20, help="Number of range changes to time")
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(0)
+    data = _Data(rng.standard_normal((args.height, args.width)).astype(np.float32))
+    ranges = [(-3 + i * 0.1, 3 - i * 0.1) for i in range(args.steps)]
+
+    print(f"{args.width} x {args.height}, {args.steps} range changes")
+    for viz_type in ['grayscale', 'heatmap']:
+        exact = FloatPixmapVisualization()
+        exact.set_viz_type(viz_type)
+        exact.set_data(data)
+        exact_time = _time_ranges(exact, ranges)
+
+        quantized = FloatPixmapVisualization(quantized=True)
+        quantized.set_viz_type(viz_type)
+        start = time.perf_counter()
+        quantized.set_data(data)
+        set_data_time = time.perf_counter() - start
+        quantized_time = _time_ranges(quantized, ranges)
+
+        deviation = np.abs(exact.image().astype(np.int32) - quantized.image().astype(np.int32)).max()
+        print(f"{viz_type:>10}: exact {exact_time * 1000:.1f} ms, quantized {quantized_time * 1000:.1f} ms "
+              f"per change ({set_data_time * 1000:.1f} ms to quantize), max deviation {deviation} levels")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
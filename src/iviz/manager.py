@@ -14,8 +14,9 @@ from itypes import addr, TraceLogger
 from math import pow
 from itypes import bind_to_instance
 from PyQt5.QtCore import QObject
-from PyQt5.QtCore import pyqtSignal, Qt, QSize, QPoint, QPointF, QRect, QRectF
+from PyQt5.QtCore import pyqtSignal, Qt, QSize, QPoint, QPointF, QRect, QRectF, QLineF
 from copy import copy
+from .memory import MemoryGovernor
 
 
 class Manager(QObject):
@@ -31,10 +32,16 @@ class Manager(QObject):
         self._groups = {}
         self._preview_widget_pos = None
         self._linear_preview_zoom = 4
+        self._line_tool = False
         for group_name in ["S", "1", "2", "3", "4", "5"]:
             self._groups[group_name] = set()
+        self._memory = MemoryGovernor(self)
 
     def preview_widget_pos(self): return self._preview_widget_pos
+    def line_tool(self): return self._line_tool
+    def current_display(self): return self._current_display
+    def displays(self): return self._displays
+    def memory(self): return self._memory
 
     def preview_zoom(self):
         return pow(1.1, self._linear_preview_zoom)
@@ -42,6 +49,31 @@ class Manager(QObject):
     def register_display(self, display):
         self._displays.append(display)
 
+    def replace_display(self, old, new):
+        # The new display takes the place, group memberships and current
+        # state of the old one
+        if new in self._displays:
+            self._displays.remove(new)
+        if old in self._displays:
+            self._displays[self._displays.index(old)] = new
+        else:
+            self._displays.append(new)
+        for group in self._groups.values():
+            if old in group:
+                group.discard(old)
+                group.add(new)
+        if self._current_display is old:
+            self._current_display = new
+        self._highlight_displays()
+
+    def deregister_display(self, display):
+        if display in self._displays:
+            self._displays.remove(display)
+        for group in self._groups.values():
+            group.discard(display)
+        if self._current_display is display:
+            self._current_display = None
+
     def turn_on_modifier(self, modifier):
         if modifier not in self._modifiers:
             self._modifiers.add(modifier)
@@ -113,6 +145,18 @@ class Manager(QObject):
     def no_selection(self):
         return len(self.selected_displays()) == 0
 
+    def _views(self, displays):
+        # Displays that are not created yet record the calls to their view
+        for display in displays:
+            if hasattr(display, 'view'):
+                yield display.view()
+            elif hasattr(display, 'pending_view'):
+                yield display.pending_view()
+
+    def _linked_views(self):
+        # Views of the selected displays other than the current one
+        return self._views(display for display in self.selected_displays() if display != self._current_display)
+
     def update_preview_pos(self, widget_pos):
         if self._preview_widget_pos == widget_pos:
             return
@@ -132,72 +176,78 @@ class Manager(QObject):
 
     relative_zoom_set = pyqtSignal(float, QPointF)
     def set_relative_zoom(self, value, pos):
-        for display in self.selected_displays():
-            if not hasattr(display, 'view'): continue
-            display.view().set_relative_zoom(value, pos)
+        for view in self._views(self.selected_displays()):
+            view.set_relative_zoom(value, pos)
         self.relative_zoom_set.emit(value, pos)
 
     def broadcast_differential_relative_zoom(self, value, pos):
-        for display in self.selected_displays():
-            if not hasattr(display, 'view'): continue
-            if display != self._current_display:
-                display.view().differential_relative_zoom(value, pos)
+        for view in self._linked_views():
+            view.differential_relative_zoom(value, pos)
 
     screen_zoom_set = pyqtSignal(float, QPointF)
     def set_screen_zoom(self, value, pos):
-        for display in self.selected_displays():
-            if not hasattr(display, 'view'): continue
-            display.view().set_screen_zoom(value, pos)
+        for view in self._views(self.selected_displays()):
+            view.set_screen_zoom(value, pos)
         self.screen_zoom_set.emit(value, pos)
 
     pan_offset_set = pyqtSignal(QPoint)
     def set_pan_offset(self, value):
-        for display in self.selected_displays():
-            if not hasattr(display, 'view'): continue
-            display.view().set_pan_offset(value)
+        for view in self._views(self.selected_displays()):
+            view.set_pan_offset(value)
         self.pan_offset_set.emit(value)
 
     def broadcast_differential_pan_offset(self, value):
-        for display in self.selected_displays():
-            if not hasattr(display, 'view'): continue
-            if display != self._current_display:
-                display.view().differential_pan_offset(value)
+        for view in self._linked_views():
+            view.differential_pan_offset(value)
 
     selected_pixel_changed = pyqtSignal(QPointF)
     def select_pixel(self, value):
-        for display in self.selected_displays():
-            if not hasattr(display, 'view'): continue
-            display.view().select_pixel(value)
+        for view in self._views(self.selected_displays()):
+            view.select_pixel(value)
         self.selected_pixel_changed.emit(value)
 
     selected_region_changed = pyqtSignal(QRectF)
     def select_region(self, value):
-        for display in self.selected_displays():
-            if not hasattr(display, 'view'): continue
-            display.view().select_region(value)
+        for view in self._views(self.selected_displays()):
+            view.select_region(value)
         self.selected_region_changed.emit(value)
 
+    selected_line_changed = pyqtSignal(QLineF)
+    def select_line(self, value):
+        for view in self._views(self.selected_displays()):
+            view.select_line(value)
+        self.selected_line_changed.emit(value)
+
+    def set_line_tool(self, value):
+        # Dragging with the left button draws a line instead of a box
+        self._line_tool = value
+
+    data_changed = pyqtSignal(object)
+    def notify_data_changed(self, display):
+        self.data_changed.emit(display)
+
     selection_cleared = pyqtSignal()
     def clear_selection(self):
-        for display in self.selected_displays():
-            if not hasattr(display, 'view'): continue
-            display.view().clear_selection()
+        for view in self._views(self.selected_displays()):
+            view.clear_selection()
         self.selection_cleared.emit()
 
+    probe_requested = pyqtSignal(object, QRect)
+    def request_probe(self, display, region):
+        self.probe_requested.emit(display, region)
+
     def set_interpolation(self, value):
-        for display in self._displays:
-            if not hasattr(display, 'view'): continue
-            display.view().set_interpolation(value)
+        for view in self._views(self._displays):
+            view.set_interpolation(value)
 
     def zoom_to_selection(self):
-        for display in self.selected_displays():
-            if not hasattr(display, 'view'): continue
-            display.view().zoom_to_selection()
+        for view in self._views(self.selected_displays()):
+            view.zoom_to_selection()
 
     def broadcast_property_update(self, sender, property, value):
         sender.update_property(property, value)
         for display in self.selected_displays():
-            if not hasattr(display, 'view'): continue
+            if not hasattr(display, 'view') and not hasattr(display, 'pending_view'): continue
             if display == sender:
                 continue
             display.update_property(property, value)
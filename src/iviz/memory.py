@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+
+### --------------------------------------------- ###
+### Part of iViz                                  ###
+### (C) 2022 Eddy ilg (me@eddy-ilg.net)           ###
+### Creative Commons                              ###
+### Attribution-NonCommercial-NoDerivatives       ###
+### 4.0 International License.                    ###
+### Commercial use an redistribution prohibited.  ###
+### See https://github.com/eddy-ilg/iviz          ###
+### --------------------------------------------- ###
+
+import time
+from itypes import Struct, TraceLogger
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal
+from .resources import memory_budget, memory_check_interval
+from .sequence import frame_cache
+from .utils import region_statistics_memory, release_region_statistics
+from .renderers.pixviz import preview_queue_memory, release_preview_queue
+
+
+def format_bytes(value):
+    for unit in ['B', 'KB', 'MB', 'GB']:
+        if value < 1024 or unit == 'GB':
+            return f"{value:.0f} {unit}" if unit == 'B' else f"{value:.1f} {unit}"
+        value /= 1024
+
+
+class MemoryGovernor(QObject):
+    # Accounts for the bytes held by the displays of a manager (colorized
+    # images, pixmaps, spare buffers, annotations, decoded data), by further
+    # caches (region statistics, queued previews, thumbnails) and by the
+    # frame cache. Over budget, hidden displays release their derived
+    # images, least recently viewed first, then the caches and the frame
+    # cache give up entries. Visible displays are never touched.
+    usage_changed = pyqtSignal()
+
+    def __init__(self, manager, budget=memory_budget, interval=memory_check_interval):
+        self.__log = TraceLogger()
+        super().__init__()
+        self._manager = manager
+        self._budget = budget
+        self._last_viewed = {}
+        self._caches = []
+        self._usage = Struct(displays=0, frames=0, total=0, per_display=[], caches=[])
+        self.add_cache("Region statistics", region_statistics_memory, release_region_statistics)
+        self.add_cache("Preview queue", preview_queue_memory, release_preview_queue)
+
+        self._timer = QTimer(self)
+        self._timer.timeout.connect(self.update)
+        self._timer.start(int(interval * 1000))
+
+    def budget(self): return self._budget
+    def usage(self): return self._usage
+
+    def add_cache(self, name, memory, release):
+        # release(nbytes) frees at least nbytes if possible and returns the
+        # bytes freed. Caches are released in the order they were added.
+        self._caches.append((name, memory, release))
+
+    def set_budget(self, budget):
+        self._budget = budget
+        self.update()
+
+    def _account(self):
+        now = time.monotonic()
+        per_display = []
+        for display in self._manager.displays():
+            if not display.invisible():
+                self._last_viewed[display] = now
+            per_display.append((display, display.memory()))
+
+        # Displays that are gone are forgotten
+        displays = set(display for display, _ in per_display)
+        for display in [display for display in self._last_viewed if display not in displays]:
+            del self._last_viewed[display]
+
+        usage = Struct()
+        usage.per_display = per_display
+        usage.displays = sum(bytes for _, bytes in per_display)
+        usage.caches = [(name, memory()) for name, memory, _ in self._caches]
+        usage.frames = frame_cache().memory()
+        usage.total = usage.displays + sum(bytes for _, bytes in usage.caches) + usage.frames
+        return usage
+
+    def update(self):
+        usage = self._account()
+        excess = usage.total - self._budget
+        if excess > 0:
+            # Hidden displays, least recently viewed first
+            hidden = [(self._last_viewed.get(display, 0), index, display, bytes)
+                      for index, (display, bytes) in enumerate(usage.per_display)
+                      if bytes > 0 and display.invisible()]
+            for _, _, display, bytes in sorted(hidden, key=lambda entry: entry[:2]):
+                if excess <= 0:
+                    break
+                display.release_memory()
+                released = bytes - display.memory()
+                self.__log.debug(f"released {released} bytes of display {display.id()}")
+                excess -= released
+
+            for _, _, release in self._caches:
+                if excess <= 0:
+                    break
+                excess -= release(excess)
+
+            if excess > 0:
+                excess -= frame_cache().release(excess)
+            usage = self._account()
+
+        self._usage = usage
+        self.usage_changed.emit()
+
+    def status(self):
+        usage = self._usage
+        return f"Memory: {format_bytes(usage.total)} / {format_bytes(self._budget)}"
+
+    def details(self):
+        usage = self._usage
+        lines = [
+            f"Displays: {format_bytes(usage.displays)}",
+            f"Frame cache: {format_bytes(usage.frames)}",
+        ]
+        for name, bytes in usage.caches:
+            lines.append(f"{name}: {format_bytes(bytes)}")
+        for display, bytes in sorted(usage.per_display, key=lambda entry: -entry[1]):
+            if bytes > 0:
+                lines.append(f"  {display.id()}: {format_bytes(bytes)}")
+        return "\n".join(lines)
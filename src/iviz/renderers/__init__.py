@@ -14,5 +14,10 @@ from .pixviz.renderer import PixelVisualizationRenderer
 from .pixviz import ImagePixmapVisualization
 from .pixviz import FlowPixmapVisualization
 from .pixviz import FloatPixmapVisualization
+from .pixviz import LabelPixmapVisualization
 
-from .text import TextRenderer
\ No newline at end of file
+from .text import TextRenderer
+
+from .pipeline import RenderPipeline
+
+from .thumbnails import ThumbnailRenderer
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+
+### --------------------------------------------- ###
+### Part of iViz                                  ###
+### (C) 2022 Eddy ilg (me@eddy-ilg.net)           ###
+### Creative Commons                              ###
+### Attribution-NonCommercial-NoDerivatives       ###
+### 4.0 International License.                    ###
+### Commercial use an redistribution prohibited.  ###
+### See https://github.com/eddy-ilg/iviz          ###
+### --------------------------------------------- ###
+
+from itypes import TraceLogger
+from ..utils import thread_pool
+
+
+class RenderPipeline:
+    # Sets data on several displays at once. The data of all displays is
+    # rendered concurrently on a thread pool (numpy releases the GIL for the
+    # heavy parts) and the results are then applied on the GUI thread in one
+    # batch, so a grid updates in about the time of its slowest display.
+
+    def __init__(self, pool='render'):
+        self.__log = TraceLogger()
+        self._pool = pool
+
+    def _renders(self, display, data):
+        # Suspended displays defer their data anyway, text displays have
+        # nothing to render
+        return data is not None and hasattr(display, 'render') and not display.suspended()
+
+    def set_data(self, updates):
+        updates = list(updates)
+        jobs = [(display, data) for display, data in updates if self._renders(display, data)]
+
+        rendered = {}
+        if len(jobs) == 1:
+            display, data = jobs[0]
+            rendered[id(display)] = self._render(display, data)
+        elif len(jobs) > 1:
+            pool = thread_pool(self._pool)
+            futures = [(display, pool.submit(self._render, display, data)) for display, data in jobs]
+            for display, future in futures:
+                rendered[id(display)] = future.result()
+        self.__log.debug(f"rendered {len(jobs)} of {len(updates)} displays")
+
+        for display, data in updates:
+            display.set_data(data, rendered.get(id(display)))
+
+    def _render(self, display, data):
+        # Errors are not raised here, set_data() renders again on the GUI
+        # thread and raises them there as before
+        try:
+            return display.render(data)
+        except Exception:
+            return None
@@ -12,6 +12,10 @@
 
 from .renderer import PixelVisualizationRenderer
 
+from ._pixviz import preview_queue_memory
+from ._pixviz import release_preview_queue
+
 from .float import FloatPixmapVisualization
 from .flow import FlowPixmapVisualization
-from .image import ImagePixmapVisualization
\ No newline at end of file
+from .image import ImagePixmapVisualization
+from .label import LabelPixmapVisualization
\ No newline at end of file
@@ -11,29 +11,147 @@
 ### --------------------------------------------- ###
 
 import itypes
+import threading
+import numpy as np
 from ..._baseviz import _BaseVisualization
 from itypes import File, is_torch, is_numpy, is_str, TraceLogger
 from itypes import convert_device, convert_dims
+from itypes import Struct
+from PyQt5.QtCore import Qt
+from ...utils import to_qimage, BufferPool, thread_pool, disk_cache, file_key
+from ...sequence import frame_cache
+from ...resources import preview_max_size, preview_max_pending
+
+
+# Previews queued for storing by key, with their future and size. The queue
+# is bounded so that fast scrubbing does not pile up images on the encoding
+# thread.
+_pending_lock = threading.Lock()
+_pending_previews = {}
+
+
+def preview_queue_memory():
+    with _pending_lock:
+        return sum(nbytes for _, nbytes in _pending_previews.values())
+
+
+def release_preview_queue(nbytes):
+    # Drops queued previews that did not start yet, returns the bytes freed
+    freed = 0
+    with _pending_lock:
+        for key, (future, size) in list(_pending_previews.items()):
+            if freed >= nbytes:
+                break
+            if future is not None and future.cancel():
+                del _pending_previews[key]
+                freed += size
+    return freed
+
+
+class _RenderedImage:
+    def __init__(self, data, settings, image, qimage):
+        self.data = data
+        self.settings = settings
+        self.image = image
+        self.qimage = qimage
 
 
 class _PixmpVisualization(_BaseVisualization):
     def __init__(self, data=None):
         self.__log = TraceLogger()
         self._image = None
+        self._qimage = None
+        self._revision = 0
+        self._buffers = BufferPool()
         self._file = None
         super().__init__(data)
 
-    def _update_image(self):
+    def buffers(self): return self._buffers
+    def set_buffers(self, buffers): self._buffers = buffers
+
+    def revision(self): return self._revision
+
+    def _render_settings(self):
+        return Struct()
+
+    def _update_render_settings(self, data, settings):
+        pass
+
+    def _apply_render_settings(self, settings):
+        pass
+
+    def _render_image(self, data, settings):
         raise NotImplementedError
 
-    def set_data(self, data):
+    def _set_image(self, image, qimage=None):
+        # Output arrays come from the buffer pool and go back to it once
+        # replaced. The revision tells users of image() that it changed,
+        # even if a recycled array is the same object as before.
+        old = self._image
+        self._image = image
+        self._qimage = qimage
+        self._revision += 1
+        if old is not image:
+            self._buffers.release(old)
+
+    def memory(self):
+        # Bytes held for the colorized image and for decoded data that the
+        # frame cache does not account for (e.g. arrays of itypes datasets).
+        # An image that is the data itself (e.g. RGB images) is only
+        # accounted for with the data.
+        total = 0
+        if self._image is not None:
+            data = self.numpy_data()
+            if data is None or not np.may_share_memory(self._image, data):
+                total += self._image.nbytes
+            if data is not None and not frame_cache().holds(data):
+                total += data.nbytes
+        if self._qimage is not None:
+            total += self._qimage.sizeInBytes()
+        return total
+
+    def release_image(self):
+        # Drops the colorized image, it is rendered again by setting the
+        # data. Returns whether there was one.
+        if self._image is None and self._qimage is None:
+            return False
+        self._set_image(None)
+        self._buffers.clear()
+        return True
+
+    def _to_qimage(self, image):
+        return to_qimage(image, buffers=self._buffers)
+
+    def _update_image(self):
+        self._set_image(self._render_image(self._data, self._render_settings()))
+        self.changed.emit()
+
+    def render(self, data):
+        # Does the work of set_data(data) without modifying the visualization,
+        # so that it can run on a worker thread. The result is passed back to
+        # set_data() on the GUI thread.
+        settings = self._render_settings()
+        self._update_render_settings(data, settings)
+        image = self._render_image(data, settings)
+        qimage = None if image is None else self._to_qimage(image)
+        return _RenderedImage(data, settings, image, qimage)
+
+    def set_data(self, data, rendered=None):
         self.__log.debug(f"set data to {'None' if data is None else type(data)}")
+        if rendered is None or rendered.data is not data:
+            rendered = self.render(data)
+
         self._data = data
-        self._update_data()
-        self._update_image()
+        self._apply_render_settings(rendered.settings)
+        self._set_image(rendered.image, rendered.qimage)
 
         self.changed.emit()
 
+    def qimage(self):
+        if self._qimage is None and self._image is not None:
+            self._qimage = self._to_qimage(self._image)
+        return self._qimage
+
     def props(self):
         return self._data.props()
 
@@ -47,9 +165,69 @@ class _PixmpVisualization(_BaseVisualization):
         self._data.reload()
         self.set_data(self._data)
 
-    def file(self):
+    def data_file(self, data):
         raise NotImplementedError
 
+    def file(self):
+        if self._data is None:
+            return None
+        return self.data_file(self._data)
+
+    def _preview_settings(self):
+        return self._render_settings()
+
+    def preview_key(self, data):
+        # Previews are keyed by the file and the settings of the
+        # visualization, so they match what rendering the data would show
+        if data is None:
+            return None
+        settings = self._preview_settings()
+        return file_key(self.data_file(data), type(self).__name__, sorted(settings.items()))
+
+    def load_preview(self, data):
+        # Downscaled render of the data from a previous run, with the size
+        # of the full image in its width and height texts
+        image = disk_cache('previews').get_image(self.preview_key(data))
+        if image is None or not image.text('width') or not image.text('height'):
+            return None
+        return image
+
+    def store_preview(self, rendered):
+        # Scaling and encoding run in the background, rendered images are
+        # not modified once created
+        if rendered.qimage is None or rendered.qimage.isNull():
+            return
+        key = self.preview_key(rendered.data)
+        cache = disk_cache('previews')
+        if key is None or cache.contains(key):
+            return
+        with _pending_lock:
+            if key in _pending_previews or len(_pending_previews) >= preview_max_pending:
+                return
+            _pending_previews[key] = (None, 0)
+
+        # A fast reduction to twice the preview size keeps the queued image
+        # small, the smooth scaling to the final size runs in the background
+        qimage = rendered.qimage
+        width, height = qimage.width(), qimage.height()
+        if max(width, height) > 2 * preview_max_size:
+            qimage = qimage.scaled(2 * preview_max_size, 2 * preview_max_size, Qt.KeepAspectRatio, Qt.FastTransformation)
+        def store():
+            try:
+                image = qimage
+                if max(image.width(), image.height()) > preview_max_size:
+                    image = image.scaled(preview_max_size, preview_max_size, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+                image.setText('width', str(width))
+                image.setText('height', str(height))
+                cache.put_image(key, image)
+            finally:
+                with _pending_lock:
+                    _pending_previews.pop(key, None)
+        future = thread_pool('previews', workers=1).submit(store)
+        with _pending_lock:
+            if key in _pending_previews:
+                _pending_previews[key] = (future, qimage.sizeInBytes())
+
     def image(self):
         raise NotImplementedError
 
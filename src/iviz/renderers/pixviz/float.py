@@ -14,26 +14,50 @@ import numpy as np
 from itypes import Struct, addr, TraceLogger
 from copy import copy
 from ._pixviz import _PixmpVisualization
+from .quantized import QuantizedFloats
+from ...utils import process_rows
 from iutils import heatmap_viz
 from PyQt5.QtCore import pyqtSignal
 
 
+def _hwc(data):
+    if len(data.shape) == 3:
+        return data
+    elif len(data.shape) == 2:
+        return np.expand_dims(data, 2)
+    else:
+        return np.expand_dims(np.expand_dims(data, 0), 2)
+
+
+def _normalize(data, range_min, range_max, out, scratch):
+    np.subtract(data, range_min, out=scratch)
+    np.divide(scratch, range_max - range_min, out=scratch)
+    np.clip(scratch, 0, 1, out=scratch)
+    np.multiply(scratch, 255.0, out=scratch)
+    out[...] = scratch
+
+
+def _scratch_type(data):
+    return np.result_type(data.dtype, np.float32)
+
+
 class FloatPixmapVisualization(_PixmpVisualization):
     range_min_changed = pyqtSignal(float)
     range_max_changed = pyqtSignal(float)
     viz_type_changed = pyqtSignal(str)
+    quantized_changed = pyqtSignal(bool)
 
-    def __init__(self, data=None, range_min=0, range_max=1):
+    def __init__(self, data=None, range_min=0, range_max=1, quantized=False):
         self.__log = TraceLogger()
         self._viz_type = 'heatmap'
         self._range_min = range_min
         self._range_max = range_max
+        self._quantize = quantized
+        self._quantized = None
         super().__init__(data)
 
-    def file(self):
-        if self._data is None:
-            return None
-        return self._data.float().file()
+    def data_file(self, data):
+        return data.float().file()
 
     def image(self):
         return self._image
@@ -48,50 +72,108 @@ class FloatPixmapVisualization(_PixmpVisualization):
             return None
         return len(self._data.shape)
 
-    def _update_data(self):
-        if self._data is None or not self._data.float().valid():
-            return
+    def _render_settings(self):
+        return Struct(viz_type=self._viz_type, range_min=self._range_min, range_max=self._range_max, quantized=self._quantized)
 
-        data = self._data.float().numpy()
+    def memory(self):
+        total = super().memory()
+        if self._quantized is not None:
+            total += self._quantized.memory()
+        return total
 
-        self._range_min = data[np.logical_not(np.isnan(data))].min()
-        self._range_max = data[np.logical_not(np.isnan(data))].max()
+    def _preview_settings(self):
+        # The range is taken from each frame
+        return Struct(viz_type=self._viz_type)
 
-    def _update_image(self):
-        if self._data is None or not self._data.float().valid():
-            self._image = None
-            self.changed.emit()
+    def _update_render_settings(self, data, settings):
+        settings.quantized = None
+        if data is None or not data.float().valid():
             return
 
-        # Extract HWC data
-        data = self.numpy_slice_data()
-        self.__log.debug(f"data.shape={self._data.float().data().shape}")
-        self.__log.debug(f"numpy_slice_data().shape={data.shape}")
-        self.__log.debug(f"range_min={self._range_min}, range_max={self._range_max}")
+        data = data.float().numpy()
+
+        settings.range_min = np.nanmin(data)
+        settings.range_max = np.nanmax(data)
 
-        # Render the data
-        if self._viz_type == 'grayscale':
-            transformed = (data - float(self._range_min)) / (float(self._range_max) - float(self._range_min))
-            transformed[transformed > 1] = 1
-            transformed[transformed < 0] = 0
-            self._image = (transformed[:, :, 0] * 255.0).astype(np.uint8)
+        # In quantized mode each frame is quantized once, range and viz type
+        # changes are then rendered from the quantized frame
+        if self._quantize:
+            settings.quantized = QuantizedFloats(_hwc(data), self._buffers)
 
-        elif self._viz_type == 'rgb':
-            transformed = (data - float(self._range_min)) / (float(self._range_max) - float(self._range_min))
-            transformed[transformed > 1] = 1
-            transformed[transformed < 0] = 0
-            self._image = (transformed[:, :, :] * 255.0).astype(np.uint8)
+    def _apply_render_settings(self, settings):
+        self._range_min = settings.range_min
+        self._range_max = settings.range_max
+        self._set_quantized(settings.quantized)
 
-        elif self._viz_type == 'heatmap':
-            heatmap = heatmap_viz(data[:, :, 0], self._range_min, self._range_max)
-            self._image = heatmap.astype(np.uint8)
+    def _set_quantized(self, quantized):
+        if self._quantized is not None and self._quantized is not quantized:
+            self._quantized.release()
+        self._quantized = quantized
+
+    def _render_image(self, data, settings):
+        if data is None or not data.float().valid():
+            return None
+
+        # Extract HWC data
+        self.__log.debug(f"data.shape={data.float().data().shape}")
+        data = _hwc(data.float().numpy())
+        self.__log.debug(f"numpy_slice_data().shape={data.shape}")
+        self.__log.debug(f"range_min={settings.range_min}, range_max={settings.range_max}")
+
+        # Render the data, large images in parallel bands of rows
+        range_min = float(settings.range_min)
+        range_max = float(settings.range_max)
+        if settings.quantized is not None:
+            return self._render_quantized(settings.quantized, settings)
+
+        if settings.viz_type == 'grayscale':
+            image = self._buffers.acquire(data.shape[:2], np.uint8)
+            scratch = self._buffers.acquire(data.shape[:2], _scratch_type(data))
+            process_rows(lambda d, out, tmp: _normalize(d[:, :, 0], range_min, range_max, out, tmp), data, image, scratch)
+            self._buffers.release(scratch)
+            return image
+
+        elif settings.viz_type == 'rgb':
+            image = self._buffers.acquire(data.shape, np.uint8)
+            scratch = self._buffers.acquire(data.shape, _scratch_type(data))
+            process_rows(lambda d, out, tmp: _normalize(d, range_min, range_max, out, tmp), data, image, scratch)
+            self._buffers.release(scratch)
+            return image
+
+        elif settings.viz_type == 'heatmap':
+            def heatmap(d, out):
+                out[...] = heatmap_viz(d[:, :, 0], settings.range_min, settings.range_max)
+            channels = heatmap_viz(data[:1, :1, 0], settings.range_min, settings.range_max).shape[2:]
+            image = self._buffers.acquire(data.shape[:2] + channels, np.uint8)
+            return process_rows(heatmap, data, image)
 
         else:
             raise Exception('invalid viztype')
 
-        self.changed.emit()
+    def _render_quantized(self, quantized, settings):
+        # The mapping is computed for the 65536 bin values only and then
+        # gathered into the image. The NaN bin is always present, it maps to
+        # whatever NaN pixels map to without quantization.
+        values = quantized.values()
+        shape = quantized.shape()
+        if settings.viz_type in ['grayscale', 'rgb']:
+            lut = np.empty(values.shape, dtype=np.uint8)
+            with np.errstate(invalid='ignore'):
+                _normalize(values, float(settings.range_min), float(settings.range_max), lut, np.empty_like(values))
+            if settings.viz_type == 'grayscale':
+                return quantized.gather(lut, self._buffers.acquire(shape[:2], np.uint8), channel=0)
+            return quantized.gather(lut, self._buffers.acquire(shape, np.uint8))
+
+        elif settings.viz_type == 'heatmap':
+            with np.errstate(invalid='ignore'):
+                lut = heatmap_viz(values[None, :], settings.range_min, settings.range_max)[0].astype(np.uint8)
+            return quantized.gather(lut, self._buffers.acquire(shape[:2] + lut.shape[1:], np.uint8), channel=0)
+
+        else:
+            raise Exception('invalid viztype')
 
     def viz_type(self): return self._viz_type
+    def quantized(self): return self._quantize
 
     def range_min(self): 
         self.__log.debug(f'range_min = {self._range_min}')
@@ -105,15 +187,7 @@ class FloatPixmapVisualization(_PixmpVisualization):
         if self._data is None or not self._data.float().valid():
             return
 
-        data = self._data.float().numpy()
-
-        # Return HWC
-        if len(data.shape) == 3:
-            return data
-        elif len(data.shape) == 2:
-            return np.expand_dims(data, 2)
-        else:
-            return np.expand_dims(np.expand_dims(data, 0), 2)
+        return _hwc(self._data.float().numpy())
 
     def set_viz_type(self, type):
         if self._viz_type ==  type:
@@ -125,16 +199,24 @@ class FloatPixmapVisualization(_PixmpVisualization):
         self._update_image()
         self.viz_type_changed.emit(self._viz_type)
 
+    def set_quantized(self, value):
+        if self._quantize == value:
+            return
+
+        self._quantize = value
+        data = self.numpy_slice_data() if value else None
+        self._set_quantized(None if data is None else QuantizedFloats(data, self._buffers))
+        self._update_image()
+        self.quantized_changed.emit(self._quantize)
+
     def data_index(self, x, y):
         return (y, x, 0)
 
     def min_value(self):
-        data = self.numpy_data()
-        return data[np.logical_not(np.isnan(data))].min()
+        return np.nanmin(self.numpy_data())
 
     def max_value(self):
-        data = self.numpy_data()
-        return data[np.logical_not(np.isnan(data))].max()
+        return np.nanmax(self.numpy_data())
 
     def set_range_min(self, value):
         self.__log.trace(f"value = {value}")
@@ -10,7 +10,10 @@
 ### See https://github.com/eddy-ilg/iviz          ###
 ### --------------------------------------------- ###
 
+import numpy as np
+from itypes import Struct
 from ._pixviz import _PixmpVisualization
+from ...utils import process_rows
 from iutils import flow_viz
 from PyQt5.QtCore import pyqtSignal
 
@@ -24,10 +27,8 @@ class FlowPixmapVisualization(_PixmpVisualization):
         self._scale = scale
         super().__init__(data)
 
-    def file(self):
-        if self._data is None:
-            return None
-        return self._data.flow().file()
+    def data_file(self, data):
+        return data.flow().file()
 
     def image(self):
         return self._image
@@ -70,19 +71,23 @@ class FlowPixmapVisualization(_PixmpVisualization):
 
         self.set_scale(edge)
 
-    def _update_image(self):
-        if self._data is None or not self._data.flow().valid():
-            self._image = None
-            self.changed.emit()
-            return
+    def _render_settings(self):
+        return Struct(viz_type=self._viz_type, scale=self._scale)
 
-        data = self._data.flow().numpy()
+    def _render_image(self, data, settings):
+        if data is None or not data.flow().valid():
+            return None
+
+        data = data.flow().numpy()
         if data.shape[2] != 2:
             raise Exception(f"FlowVisualization data must have 2 channels (got {data.shape[2]} instead)")
 
-        self._image = flow_viz(data, self._scale, self._viz_type)
-
-        self.changed.emit()
+        # Large flows are colorized in parallel bands of rows
+        def colorize(d, out):
+            out[...] = flow_viz(d, settings.scale, settings.viz_type)
+        sample = flow_viz(data[:1, :1], settings.scale, settings.viz_type)
+        image = self._buffers.acquire(data.shape[:2] + sample.shape[2:], sample.dtype)
+        return process_rows(colorize, data, image)
 
     def viz_type(self):
         return self._viz_type
@@ -10,6 +10,8 @@
 ### See https://github.com/eddy-ilg/iviz          ###
 ### --------------------------------------------- ###
 
+import numpy as np
+from itypes import Struct
 from ._pixviz import _PixmpVisualization
 from PyQt5.QtCore import pyqtSignal
 
@@ -21,19 +23,22 @@ class ImagePixmapVisualization(_PixmpVisualization):
         self._viz_type = 'RGB'
         super().__init__(data)
 
-    def _update_image(self):
-        if self._data is None or not self._data.image().valid():
-            self._image = None
-            self.changed.emit()
-            return
+    def _render_settings(self):
+        return Struct(viz_type=self._viz_type)
 
-        data = self._data.image().numpy()
+    def _render_image(self, data, settings):
+        if data is None or not data.image().valid():
+            return None
+
+        data = data.image().numpy()
         channels = data.shape[2]
         if channels == 1:
             pass
         elif channels == 3:
-            if self._viz_type != "RGB":
-                data = data[:, :, ::-1]
+            if settings.viz_type != "RGB":
+                image = self._buffers.acquire(data.shape, data.dtype)
+                np.copyto(image, data[:, :, ::-1])
+                return image
         elif channels == 2:
             raise Exception(f"ImageVisualization got {channels} channels but cannot handle grayscale alpha currently")
         elif channels == 4:
@@ -41,8 +46,7 @@ class ImagePixmapVisualization(_PixmpVisualization):
         else:
             raise Exception(f"ImageVisualization got invalid number of channels: {channels}")
 
-        self._image = data
-        self.changed.emit()
+        return data
 
     def is_grayscale(self):
         if self._data is None or not self._data.image().valid():
@@ -64,10 +68,8 @@ class ImagePixmapVisualization(_PixmpVisualization):
         self._update_image()
         self.viz_type_changed.emit(self._viz_type)
 
-    def file(self):
-        if self._data is None:
-            return None
-        return self._data.image().file()
+    def data_file(self, data):
+        return data.image().file()
 
     def image(self):
         return self._image
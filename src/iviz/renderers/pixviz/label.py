@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+
+### --------------------------------------------- ###
+### Part of iViz                                  ###
+### (C) 2022 Eddy ilg (me@eddy-ilg.net)           ###
+### Creative Commons                              ###
+### Attribution-NonCommercial-NoDerivatives       ###
+### 4.0 International License.                    ###
+### Commercial use an redistribution prohibited.  ###
+### See https://github.com/eddy-ilg/iviz          ###
+### --------------------------------------------- ###
+
+import numpy as np
+from itypes import TraceLogger
+from ._pixviz import _PixmpVisualization
+from PyQt5.QtCore import pyqtSignal
+from PyQt5.QtGui import QColor, qRgb, qRgba
+
+
+def _label_color(label):
+    # Well separated hues for neighboring labels, label 0 is background
+    if label == 0:
+        return QColor(0, 0, 0)
+    return QColor.fromHsv(int(label * 137.508) % 360, 200 + 55 * (label % 2), 255 - 80 * ((label // 2) % 2))
+
+
+_color_palette = [_label_color(i).rgb() for i in range(256)]
+_gray_palette = [qRgb(i, i, i) for i in range(256)]
+
+
+class LabelPixmapVisualization(_PixmpVisualization):
+    # Label maps are rendered as Indexed8 images. The pixels are the labels
+    # themselves, colors come from the color table only, so changing the
+    # palette, highlighting or hiding labels never touches the pixels.
+    palette_changed = pyqtSignal(str)
+    highlighted_changed = pyqtSignal(object)
+    hidden_changed = pyqtSignal(object)
+
+    def __init__(self, data=None, palette='color'):
+        self.__log = TraceLogger()
+        self._palette = palette
+        self._highlighted = None
+        self._hidden = frozenset()
+        super().__init__(data)
+
+    def data_file(self, data):
+        return data.label().file()
+
+    def image(self):
+        return self._image
+
+    def numpy_data(self):
+        if self._data is None:
+            return None
+        return self._data.label().numpy()
+
+    def numpy_slice_data(self):
+        return self.numpy_data()
+
+    def _render_image(self, data, settings):
+        if data is None or not data.label().valid():
+            return None
+
+        data = data.label().numpy()
+        if len(data.shape) == 3:
+            if data.shape[2] != 1:
+                raise Exception(f"LabelVisualization data must have 1 channel (got {data.shape[2]} instead)")
+            data = data[:, :, 0]
+
+        if data.dtype == np.uint8:
+            return data
+        if not np.issubdtype(data.dtype, np.integer) or data.min() < 0 or data.max() > 255:
+            raise Exception("LabelVisualization supports labels 0 to 255 only")
+        labels = self._buffers.acquire(data.shape, np.uint8)
+        np.copyto(labels, data, casting='unsafe')
+        return labels
+
+    def _color_table(self):
+        palette = _gray_palette if self._palette == 'gray' else _color_palette
+        table = list(palette)
+        if self._highlighted is not None:
+            for label in range(256):
+                if label != self._highlighted:
+                    table[label] = QColor(table[label]).darker(300).rgb()
+        for label in self._hidden:
+            table[label] = qRgba(0, 0, 0, 0)
+        return table
+
+    def _to_qimage(self, image):
+        qimage = super()._to_qimage(image)
+        qimage.setColorTable(self._color_table())
+        return qimage
+
+    def _update_colors(self):
+        if self._qimage is not None:
+            self._qimage.setColorTable(self._color_table())
+        self._revision += 1
+        self.changed.emit()
+
+    def label(self, x, y):
+        if self._image is None or x < 0 or y < 0 or y >= self._image.shape[0] or x >= self._image.shape[1]:
+            return None
+        return int(self._image[y, x])
+
+    def palette(self): return self._palette
+    def highlighted(self): return self._highlighted
+    def hidden(self): return self._hidden
+
+    def set_palette(self, palette):
+        if self._palette == palette:
+            return
+
+        if palette not in ["color", "gray"]:
+            raise Exception(f"\"{palette}\" invalid for set_palette(palette=...) must be \"color\" or \"gray\"")
+        self._palette = palette
+        self._update_colors()
+        self.palette_changed.emit(self._palette)
+
+    def set_highlighted(self, label):
+        if self._highlighted == label:
+            return
+
+        self.__log.debug(f"label = {label}")
+        self._highlighted = label
+        self._update_colors()
+        self.highlighted_changed.emit(self._highlighted)
+
+    def set_hidden(self, labels):
+        labels = frozenset(labels)
+        if self._hidden == labels:
+            return
+
+        self.__log.debug(f"labels = {sorted(labels)}")
+        self._hidden = labels
+        self._update_colors()
+        self.hidden_changed.emit(self._hidden)
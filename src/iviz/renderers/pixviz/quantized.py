@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+
+### --------------------------------------------- ###
+### Part of iViz                                  ###
+### (C) 2022 Eddy ilg (me@eddy-ilg.net)           ###
+### Creative Commons                              ###
+### Attribution-NonCommercial-NoDerivatives       ###
+### 4.0 International License.                    ###
+### Commercial use an redistribution prohibited.  ###
+### See https://github.com/eddy-ilg/iviz          ###
+### --------------------------------------------- ###
+
+import numpy as np
+from ...utils import process_rows
+
+
+def _gather(lut, index, out, rows=32):
+    # numpy converts the indices to intp for take(), in small chunks of
+    # rows this stays in cache
+    for y in range(0, index.shape[0], rows):
+        np.take(lut, index[y:y + rows], axis=0, out=out[y:y + rows])
+
+
+class QuantizedFloats:
+    # A float HWC frame quantized once into uint16 bin indices over its
+    # finite value range, together with the value each bin stands for. Any
+    # per-value mapping (range normalization, colormaps) can then be applied
+    # to the 65536 bin values and gathered into the image, independent of
+    # the frame size.
+    #
+    # Accuracy: bins are uniform, (max - min) / 65535 wide, and represent
+    # their center, so a value is off by at most half a bin width. Rendered
+    # to 8 bits this is within one output level as long as the displayed
+    # range covers at least 1/256 of the value range of the frame; narrower
+    # ranges show banding. NaN gets a bin of its own, infinite values fall
+    # into the first or last bin.
+
+    levels = 65535
+    nan_index = 65535
+
+    def __init__(self, data, buffers=None):
+        self._buffers = buffers
+        self._min = float(np.nanmin(data)) if data.size else 0.0
+        self._max = float(np.nanmax(data)) if data.size else 0.0
+        if not np.isfinite(self._min) or not np.isfinite(self._max):
+            finite = data[np.isfinite(data)]
+            self._min = float(finite.min()) if finite.size else 0.0
+            self._max = float(finite.max()) if finite.size else 0.0
+
+        step = (self._max - self._min) / self.levels
+        self._values = np.empty(self.levels + 1, dtype=np.float64)
+        self._values[:-1] = self._min + (np.arange(self.levels) + 0.5) * step
+        self._values[self.nan_index] = np.nan
+        scale = 1.0 / step if step > 0 else 0.0
+
+        if buffers is None:
+            self._index = np.empty(data.shape, dtype=np.uint16)
+        else:
+            self._index = buffers.acquire(data.shape, np.uint16)
+        process_rows(lambda d, out: self._quantize(d, out, scale), data, self._index)
+
+    def _quantize(self, data, out, scale):
+        scaled = (data - self._min) * scale
+        np.clip(scaled, 0, self.levels - 1, out=scaled)
+        np.copyto(scaled, self.nan_index, where=np.isnan(scaled))
+        out[...] = scaled
+
+    def index(self): return self._index
+    def values(self): return self._values
+    def shape(self): return self._index.shape
+
+    def gather(self, lut, out, channel=None):
+        # out[...] = lut[index], lut has one entry (of any shape) per bin
+        index = self._index if channel is None else self._index[:, :, channel]
+        return process_rows(lambda i, o: _gather(lut, i, o), index, out)
+
+    def memory(self):
+        index = 0 if self._index is None else self._index.nbytes
+        return index + self._values.nbytes
+
+    def release(self):
+        if self._buffers is not None:
+            self._buffers.release(self._index)
+        self._index = None
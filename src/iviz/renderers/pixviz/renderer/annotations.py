@@ -10,21 +10,332 @@
 ### See https://github.com/eddy-ilg/iviz          ###
 ### --------------------------------------------- ###
 
-from PyQt5.QtCore import Qt, QPoint, QPointF
-from PyQt5.QtGui import QPixmap, QPainter, QColor, QBrush, QPen, QTransform
+from collections import OrderedDict
+from PyQt5.QtCore import Qt, QPoint, QPointF, QRectF, QLineF
+from PyQt5.QtGui import QPixmap, QPainter, QColor, QBrush, QPen, QTransform, QPicture, QPainterPath, QPolygonF
+
+
+class _Unsupported(Exception):
+    pass
+
+
+def _line(args):
+    if len(args) == 1:
+        return QLineF(args[0])
+    if len(args) == 2:
+        return QLineF(QPointF(args[0]), QPointF(args[1]))
+    return QLineF(*[float(v) for v in args])
+
+
+def _rect(args):
+    if len(args) == 1:
+        return QRectF(args[0])
+    return QRectF(*[float(v) for v in args])
+
+
+def _points(args):
+    if len(args) == 1 and not isinstance(args[0], (QPoint, QPointF)):
+        args = args[0]
+    return [QPointF(p) for p in args]
+
+
+def _style_key(pen, brush):
+    # Shapes drawn with equal pens and brushes are drawn together, pens and
+    # brushes with gradients or textures are not batched
+    for b in (pen.brush(), brush):
+        if b.gradient() is not None or b.style() == Qt.TexturePattern:
+            raise _Unsupported('gradient or texture')
+    return (
+        pen.style(), pen.color().rgba(), pen.widthF(), pen.capStyle(), pen.joinStyle(), pen.isCosmetic(),
+        tuple(pen.dashPattern()) if pen.style() == Qt.CustomDashLine else (),
+        brush.style(), brush.color().rgba()
+    )
+
+
+class _Recorder:
+    # Stands in for the painter while an annotation paints and collects its
+    # lines, points and shapes with the pen and brush they are drawn with.
+    # Painter calls it does not know raise _Unsupported, such annotations
+    # are recorded into a picture instead.
+
+    def __init__(self, scale_coeff):
+        self.scale_coeff = scale_coeff
+        self.shapes = []
+        self._pen = QPen()
+        self._brush = QBrush()
+        self._stack = []
+
+    def __getattr__(self, name):
+        raise _Unsupported(name)
+
+    def pen(self): return QPen(self._pen)
+    def brush(self): return QBrush(self._brush)
+
+    def setPen(self, pen):
+        self._pen = QPen(QColor(pen)) if isinstance(pen, (QColor, Qt.GlobalColor)) else QPen(pen)
+
+    def setBrush(self, brush):
+        self._brush = QBrush(brush)
+
+    def save(self):
+        self._stack.append((self._pen, self._brush))
+
+    def restore(self):
+        self._pen, self._brush = self._stack.pop()
+
+    def _add(self, kind, geometry):
+        self.shapes.append((_style_key(self._pen, self._brush), self._pen, self._brush, kind, geometry))
+
+    def drawLine(self, *args): self._add('lines', [_line(args)])
+    def drawRect(self, *args): self._add('fill', _rect(args))
+    def drawPoint(self, *args): self._add('points', _points([QPointF(*args)] if len(args) == 2 else args))
+    def drawPoints(self, *args): self._add('points', _points(args))
+    def drawPolyline(self, *args): self._add('outline', QPolygonF(_points(args)))
+    def drawPath(self, path): self._add('fill', QPainterPath(path))
+
+    def drawLines(self, lines):
+        lines = list(lines)
+        if len(lines) and isinstance(lines[0], (QPoint, QPointF)):
+            lines = [QLineF(QPointF(a), QPointF(b)) for a, b in zip(lines[0::2], lines[1::2])]
+        self._add('lines', [QLineF(line) for line in lines])
+
+    def drawRects(self, rects):
+        for rect in rects:
+            self._add('fill', QRectF(rect))
+
+    def drawEllipse(self, *args):
+        if len(args) == 3:
+            center, rx, ry = args
+            rect = QRectF(center.x() - rx, center.y() - ry, 2 * rx, 2 * ry)
+        else:
+            rect = _rect(args)
+        path = QPainterPath()
+        path.addEllipse(rect)
+        self._add('fill', path)
+
+    def drawPolygon(self, *args):
+        if len(args) == 2 and isinstance(args[1], Qt.FillRule):
+            args = args[:1]
+        polygon = QPolygonF(_points(args))
+        path = QPainterPath()
+        path.addPolygon(polygon)
+        path.closeSubpath()
+        self._add('fill', path)
+
+
+def _shape_bounds(kind, geometry):
+    if kind == 'lines':
+        bounds = QRectF()
+        for line in geometry:
+            bounds = bounds.united(QRectF(line.p1(), line.p2()).normalized())
+        return bounds
+    if kind == 'points':
+        return QPolygonF(geometry).boundingRect()
+    if isinstance(geometry, QRectF):
+        return geometry
+    return geometry.boundingRect()
+
+
+class _Group:
+    # Everything drawn with one pen and brush in a tile
+    def __init__(self, pen, brush):
+        self.pen = pen
+        self.brush = brush
+        self.fill = QPainterPath()
+        self.fill.setFillRule(Qt.WindingFill)
+        self.outline = QPainterPath()
+        self.lines = []
+        self.points = []
+
+    def add(self, kind, geometry):
+        if kind == 'lines':
+            self.lines.extend(geometry)
+        elif kind == 'points':
+            self.points.extend(geometry)
+        elif kind == 'outline':
+            self.outline.addPolygon(geometry)
+        elif isinstance(geometry, QRectF):
+            self.fill.addRect(geometry)
+        else:
+            self.fill.addPath(geometry)
+
+    def memory(self):
+        # Rough size of the geometry
+        return 32 * len(self.lines) + 16 * len(self.points) + 24 * (self.fill.elementCount() + self.outline.elementCount())
+
+    def paint(self, painter):
+        painter.setPen(self.pen)
+        painter.setBrush(self.brush)
+        if not self.fill.isEmpty():
+            painter.drawPath(self.fill)
+        if len(self.lines):
+            painter.drawLines(self.lines)
+        if len(self.points):
+            painter.drawPoints(QPolygonF(self.points))
+        if not self.outline.isEmpty():
+            painter.setBrush(Qt.NoBrush)
+            painter.drawPath(self.outline)
+
+
+class _Batch:
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.groups = OrderedDict()
+        self.pictures = []
+
+    def memory(self):
+        return sum(group.memory() for group in self.groups.values()) + sum(picture.size() for picture in self.pictures)
+
+    def paint(self, painter):
+        for group in self.groups.values():
+            group.paint(painter)
+        for picture in self.pictures:
+            painter.drawPicture(0, 0, picture)
+
+
+class _AnnotationBatches:
+    # Collects the annotations once into per-tile batches, in which all
+    # lines, points and shapes of the same pen and brush are drawn with one
+    # call. Annotations are assigned to the tile containing the center of
+    # their bounding box, each tile keeps the union of the bounds of its
+    # annotations so that it can be skipped when it does not intersect the
+    # painted region. Annotations larger than a tile get a batch of their
+    # own.
+
+    def __init__(self, annotations, scale_coeff, tile_size):
+        self._batches = []
+
+        tiles = OrderedDict()
+        for ann in annotations:
+            recorder = _Recorder(scale_coeff)
+            picture = None
+            try:
+                ann.paint(recorder)
+                shapes = recorder.shapes
+            except (_Unsupported, TypeError):
+                picture, shapes = self._record(ann, scale_coeff), []
+
+            if picture is not None and picture.isNull():
+                continue
+
+            bounds = QRectF()
+            for _, pen, _, kind, geometry in shapes:
+                bounds = bounds.united(self._inflate(_shape_bounds(kind, geometry), pen, scale_coeff))
+            if picture is not None:
+                # Pictures do not know the extent of some commands (e.g.
+                # text), those without bounds are always painted
+                if picture.boundingRect().isEmpty():
+                    bounds = None
+                else:
+                    bounds = self._inflate(QRectF(picture.boundingRect()), picture.pen, scale_coeff)
+            elif not len(shapes):
+                continue
+
+            if bounds is None:
+                key = None
+            elif bounds.width() > tile_size or bounds.height() > tile_size:
+                key = len(tiles)
+            else:
+                center = bounds.center()
+                key = (int(center.x() // tile_size), int(center.y() // tile_size))
+            if key not in tiles:
+                tiles[key] = _Batch(bounds)
+            batch = tiles[key]
+            if bounds is not None:
+                batch.bounds = batch.bounds.united(bounds)
+            for style, pen, brush, kind, geometry in shapes:
+                if style not in batch.groups:
+                    batch.groups[style] = _Group(pen, brush)
+                batch.groups[style].add(kind, geometry)
+            if picture is not None and not picture.isNull():
+                batch.pictures.append(picture)
+
+        self._batches = list(tiles.values())
+
+    def _record(self, ann, scale_coeff):
+        picture = QPicture()
+        painter = QPainter(picture)
+        painter.scale_coeff = scale_coeff
+        try:
+            ann.paint(painter)
+            picture.pen = painter.pen()
+        finally:
+            painter.end()
+        return picture
+
+    def _inflate(self, bounds, pen, scale_coeff):
+        # Strokes extend beyond the geometry by the pen width (given in
+        # screen pixels for cosmetic pens)
+        margin = max(1.0, pen.widthF()) * (scale_coeff if pen.isCosmetic() else 1.0)
+        return bounds.normalized().adjusted(-margin, -margin, margin, margin)
+
+    def memory(self):
+        return sum(batch.memory() for batch in self._batches)
+
+    def paint(self, painter, region=None):
+        painter.save()
+        for batch in self._batches:
+            if region is not None and batch.bounds is not None and not batch.bounds.intersects(region):
+                continue
+            batch.paint(painter)
+        painter.restore()
 
 
 class Annotations:
-    def __init__(self):
+    def __init__(self, tile_size=256, max_cached_scales=4):
         self._props = None
+        self._tile_size = tile_size
+        self._max_cached_scales = max_cached_scales
+        self._batches = OrderedDict()
+        self._painted_scales = OrderedDict()
 
     def set_props(self, props):
+        if props is self._props:
+            return
         self._props = props
+        self._batches.clear()
+        self._painted_scales.clear()
 
-    def paint(self, painter):
-        if self._props is None:
+    def memory(self):
+        # Bytes of the batched geometry and recorded pictures
+        return sum(batches.memory() for batches in self._batches.values())
+
+    def release(self):
+        self._batches.clear()
+        self._painted_scales.clear()
+
+    def _batches_for(self, scale_coeff):
+        # Annotations size their markers with scale_coeff, so the batches
+        # are only valid for the scale they were collected at. Collecting
+        # costs a few plain paints, so it is only done once the
+        # same annotations are painted a second time at the same scale.
+        key = round(scale_coeff, 6)
+        if key in self._batches:
+            self._batches.move_to_end(key)
+            return self._batches[key]
+        # Only the last scales are remembered, wheel zooming paints at a new
+        # scale each step
+        if key not in self._painted_scales:
+            self._painted_scales[key] = True
+            while len(self._painted_scales) > self._max_cached_scales:
+                self._painted_scales.popitem(last=False)
+            return None
+        del self._painted_scales[key]
+
+        batches = _AnnotationBatches(self._props.ann, scale_coeff, self._tile_size)
+        self._batches[key] = batches
+        while len(self._batches) > self._max_cached_scales:
+            self._batches.popitem(last=False)
+        return batches
+
+    def paint(self, painter, region=None):
+        if self._props is None or not len(self._props.ann):
+            return
+
+        batches = self._batches_for(painter.scale_coeff)
+        if batches is not None:
+            batches.paint(painter, region)
             return
 
         for ann in self._props.ann:
             ann.paint(painter)
-
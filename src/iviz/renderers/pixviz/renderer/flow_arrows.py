@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+
+### --------------------------------------------- ###
+### Part of iViz                                  ###
+### (C) 2022 Eddy ilg (me@eddy-ilg.net)           ###
+### Creative Commons                              ###
+### Attribution-NonCommercial-NoDerivatives       ###
+### 4.0 International License.                    ###
+### Commercial use an redistribution prohibited.  ###
+### See https://github.com/eddy-ilg/iviz          ###
+### --------------------------------------------- ###
+
+import math
+import numpy as np
+from collections import OrderedDict
+from PyQt5.QtCore import Qt, QLineF
+from PyQt5.QtGui import QPainter, QPen
+
+
+class FlowArrows:
+    # Arrows of the flow vectors on a grid. They only depend on the flow,
+    # zoom and pan, so they are painted into the cached frame of the
+    # renderer and not with the overlays, which are repainted on every
+    # crosshair or selection move.
+
+    def __init__(self, spacing=24, head_angle=25, max_cached_levels=8, tile_cells=32):
+        self._flow = None
+        self._scale = 1.0
+        self._visible = False
+        self._spacing = spacing
+        self._head_angle = math.radians(head_angle)
+        self._max_cached_levels = max_cached_levels
+        self._tile_cells = tile_cells
+        self._lines = OrderedDict()
+
+    def visible(self):
+        return self._visible
+
+    def set_visible(self, value):
+        self._visible = value
+
+    def set_flow(self, flow, scale=1.0):
+        if flow is self._flow and scale == self._scale:
+            return
+        self._flow = flow
+        self._scale = scale
+        self._lines.clear()
+
+    def step(self, screen_zoom):
+        # Arrow spacing in image pixels. Rounding up to a power of two keeps
+        # the arrows at least `spacing` screen pixels apart (which, with the
+        # lines clipped to the visible rect, bounds their number by the
+        # viewport size) and limits the number of cached levels.
+        step = self._spacing / screen_zoom
+        if step <= 1:
+            return 1
+        return 2 ** int(math.ceil(math.log2(step)))
+
+    def bounds(self, step, image_rect=None):
+        # Image area to compute arrows for: the visible rect rounded out to
+        # tiles of cells (so that small pans reuse the cached lines), or the
+        # whole image
+        height, width = self._flow.shape[0], self._flow.shape[1]
+        if image_rect is None:
+            return 0, 0, width, height
+        tile = step * self._tile_cells
+        x1 = max(0, int(image_rect.left() // tile) * tile)
+        y1 = max(0, int(image_rect.top() // tile) * tile)
+        x2 = min(width, (int(image_rect.right() // tile) + 1) * tile)
+        y2 = min(height, (int(image_rect.bottom() // tile) + 1) * tile)
+        return x1, y1, max(x1, x2), max(y1, y2)
+
+    def compute_lines(self, step, bounds=None):
+        flow = self._flow
+        left, top, right, bottom = bounds if bounds is not None else self.bounds(step)
+        # Bounds are multiples of the step, so arrows stay on the same grid
+        ys = np.arange(top + step // 2, bottom, step)
+        xs = np.arange(left + step // 2, right, step)
+        vectors = flow[ys[:, None], xs[None, :], 0:2].reshape(-1, 2).astype(np.float32)
+        x0, y0 = [a.ravel() + 0.5 for a in np.meshgrid(xs, ys)]
+
+        # An arrow with the magnitude of the color wheel scale spans one cell
+        factor = step / self._scale if self._scale > 0 else 0.0
+        dx = vectors[:, 0] * factor
+        dy = vectors[:, 1] * factor
+        length = np.hypot(dx, dy)
+
+        # Skip arrows that would be shorter than a screen pixel
+        valid = np.isfinite(length) & (length * self._spacing >= step)
+        x0, y0, dx, dy, length = x0[valid], y0[valid], dx[valid], dy[valid], length[valid]
+
+        clip = np.minimum(1.0, step / length)
+        dx *= clip
+        dy *= clip
+        length *= clip
+
+        x1 = x0 + dx
+        y1 = y0 + dy
+        ux = dx / length
+        uy = dy / length
+        head = 0.3 * length
+        c = math.cos(self._head_angle)
+        s = math.sin(self._head_angle)
+
+        segments = np.empty((len(x0), 3, 4), dtype=np.float64)
+        segments[:, :, 0] = x1[:, None]
+        segments[:, :, 1] = y1[:, None]
+        segments[:, 0, 0] = x0
+        segments[:, 0, 1] = y0
+        segments[:, 1, 2] = x1 - head * (c * ux - s * uy)
+        segments[:, 1, 3] = y1 - head * (s * ux + c * uy)
+        segments[:, 2, 2] = x1 - head * (c * ux + s * uy)
+        segments[:, 2, 3] = y1 - head * (-s * ux + c * uy)
+        segments[:, 0, 2] = x1
+        segments[:, 0, 3] = y1
+
+        return [QLineF(*segment) for segment in segments.reshape(-1, 4).tolist()]
+
+    def lines(self, screen_zoom, image_rect=None):
+        step = self.step(screen_zoom)
+        bounds = self.bounds(step, image_rect)
+        key = (step, bounds)
+        if key in self._lines:
+            self._lines.move_to_end(key)
+            return self._lines[key]
+
+        lines = self.compute_lines(step, bounds)
+        self._lines[key] = lines
+        while len(self._lines) > self._max_cached_levels:
+            self._lines.popitem(last=False)
+        return lines
+
+    def paint(self, painter, region=None):
+        if not self._visible or self._flow is None:
+            return
+        # Only the arrows in the visible part of the image are computed
+        lines = self.lines(1 / painter.scale_coeff, region)
+        if not len(lines):
+            return
+        painter.save()
+        painter.setCompositionMode(QPainter.CompositionMode_SourceOver)
+        painter.setPen(QPen(Qt.black, 0))
+        painter.drawLines(lines)
+        painter.restore()
@@ -18,6 +18,7 @@ from PyQt5.QtGui import QPixmap, QPainter, QColor, QBrush, QPen, QTransform
 class Overlay:
     def paint(self, painter): raise NotImplementedError
     def clear_selection(self): pass
+    def dirty_rects(self, width, height): return []
 
 
 class CrosshairOverlay(Overlay):
@@ -52,6 +53,13 @@ class CrosshairOverlay(Overlay):
         painter.drawLine(QPointF(0, y), QPointF(width, y))
         painter.drawLine(QPointF(x, 0), QPointF(x, height))
 
+    def dirty_rects(self, width, height):
+        if self._int_pos is None:
+            return []
+        x = self._int_pos.x()
+        y = self._int_pos.y()
+        return [QRectF(0, y, width, 1), QRectF(x, 0, 1, height)]
+
     def clear_selection(self):
         self._pos = None
         self._int_pos = None
@@ -94,16 +102,53 @@ class SelectionOverlay(Overlay):
             return
         painter.drawRect(QRectF(self._int_region))
 
+    def dirty_rects(self, width, height):
+        if self._int_region is None:
+            return []
+        r = QRectF(self._int_region)
+        return [
+            QRectF(r.left(), r.top(), r.width(), 0),
+            QRectF(r.left(), r.bottom(), r.width(), 0),
+            QRectF(r.left(), r.top(), 0, r.height()),
+            QRectF(r.right(), r.top(), 0, r.height()),
+        ]
+
     def clear_selection(self):
         self._region = None
         self._int_region = None
 
 
+class LineOverlay(Overlay):
+    # Segment in image coordinates, for profiles along it
+    def __init__(self):
+        self._line = None
+
+    def set_line(self, image_line):
+        self._line = image_line
+
+    def line(self):
+        return self._line
+
+    def paint(self, painter):
+        if self._line is None:
+            return
+        painter.drawLine(self._line)
+
+    def dirty_rects(self, width, height):
+        if self._line is None:
+            return []
+        return [QRectF(self._line.p1(), self._line.p2()).normalized()]
+
+    def clear_selection(self):
+        self._line = None
+
+
 class Overlays:
     def __init__(self):
         self._overlays = OrderedDict()
         self.add_overlay("crosshair", CrosshairOverlay())
         self.add_overlay("selection", SelectionOverlay())
+        self.add_overlay("line", LineOverlay())
 
     def add_overlay(self, name, overlay):
         self._overlays[name] = overlay
@@ -115,6 +160,12 @@ class Overlays:
         for overlay in self._overlays.values():
             overlay.clear_selection()
 
+    def dirty_rects(self, width, height):
+        rects = []
+        for overlay in self._overlays.values():
+            rects += overlay.dirty_rects(width, height)
+        return rects
+
     def paint(self, painter):
         painter.setCompositionMode(QPainter.RasterOp_SourceXorDestination)
         painter.setPen(QPen(Qt.white, 0))
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+
+### --------------------------------------------- ###
+### Part of iViz                                  ###
+### (C) 2022 Eddy ilg (me@eddy-ilg.net)           ###
+### Creative Commons                              ###
+### Attribution-NonCommercial-NoDerivatives       ###
+### 4.0 International License.                    ###
+### Commercial use an redistribution prohibited.  ###
+### See https://github.com/eddy-ilg/iviz          ###
+### --------------------------------------------- ###
+
+import math
+import time
+from itypes import Struct
+from ....resources import render_frame_budget, render_idle_delay
+
+
+class RenderQualityGovernor:
+    # Chooses how a frame is painted. While the frame is replaced at a high
+    # rate (pan, zoom, slider drags and playback) the cheapest quality that
+    # was measured to fit into the frame budget is used, once the frames
+    # stop changing full quality is restored.
+    #
+    # Qualities are (smooth, level) with level being the pyramid level the
+    # pixmap is drawn from, each level halving its size.
+
+    def __init__(self, budget=render_frame_budget, idle_delay=render_idle_delay, max_level=3, decay=0.3):
+        self._budget = budget
+        self._idle_delay = idle_delay
+        self._max_level = max_level
+        self._decay = decay
+        self._frame_times = {}
+        self._last_change = None
+        self._active_until = 0
+
+    def idle_delay(self): return self._idle_delay
+
+    def active(self):
+        return time.perf_counter() < self._active_until
+
+    def changed(self):
+        # A change following the previous one within the idle delay starts
+        # (or extends) an interaction
+        now = time.perf_counter()
+        if self._last_change is not None and now - self._last_change < self._idle_delay:
+            self._active_until = now + self._idle_delay
+        self._last_change = now
+
+    def set_idle(self):
+        self._active_until = 0
+        self._last_change = None
+
+    def record(self, quality, seconds):
+        key = (quality.smooth, quality.level)
+        previous = self._frame_times.get(key)
+        if previous is None:
+            self._frame_times[key] = seconds
+        else:
+            self._frame_times[key] = previous + self._decay * (seconds - previous)
+
+    def frame_time(self, quality):
+        return self._frame_times.get((quality.smooth, quality.level))
+
+    def full_quality(self, interpolation):
+        return Struct(smooth=interpolation, level=0)
+
+    def _candidates(self, interpolation, screen_zoom):
+        # From best to cheapest. Smoothing from a pyramid level that still
+        # has at least screen resolution looks nearly the same as smoothing
+        # from the full image.
+        candidates = [(interpolation, 0)]
+        if not interpolation:
+            return candidates
+        if screen_zoom is not None and 0 < screen_zoom < 0.5:
+            level = min(self._max_level, int(math.floor(math.log2(1 / screen_zoom))))
+            candidates.append((True, level))
+        candidates.append((False, 0))
+        return candidates
+
+    def quality(self, interpolation, screen_zoom):
+        if not self.active():
+            return self.full_quality(interpolation)
+
+        # Take the best quality within the budget. A quality that was not
+        # measured yet is tried once to learn its cost.
+        candidates = self._candidates(interpolation, screen_zoom)
+        for smooth, level in candidates:
+            frame_time = self._frame_times.get((smooth, level))
+            if frame_time is None or frame_time <= self._budget:
+                return Struct(smooth=smooth, level=level)
+        smooth, level = candidates[-1]
+        return Struct(smooth=smooth, level=level)
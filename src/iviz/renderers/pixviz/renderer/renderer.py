@@ -10,18 +10,22 @@
 ### See https://github.com/eddy-ilg/iviz          ###
 ### --------------------------------------------- ###
 
+import time
+from collections import OrderedDict
 from itypes import Struct, clamp, addr, TraceLogger
 from copy import deepcopy
 
 from PyQt5.QtCore import Qt, QPoint, QPointF, QRectF, QRect
-from PyQt5.QtGui import QPixmap, QPainter, QColor, QBrush, QPen, QTransform
+from PyQt5.QtGui import QPixmap, QPainter, QColor, QBrush, QPen, QTransform, QRegion
 
-from ....utils import to_qpixmap
+from ....utils import to_qpixmap, BufferPool
 from ....utils import print_qtransform
+from ....resources import max_screen_zoom
 from ..._base import _BaseRenderer
 
 from .overlays import Overlays
 from .annotations import Annotations
+from .quality import RenderQualityGovernor
 
 
 class PixelVisualizationRenderer(_BaseRenderer):
@@ -31,9 +35,17 @@ class PixelVisualizationRenderer(_BaseRenderer):
         self._pixviz = pixviz
         self._interpolation = interpolation
         self._image = None
+        self._image_revision = None
         self._pixmap = None
+        self._pyramid = {}
+        self._preview = None
+        self._shown_preview = None
         self._valid = False
         self._fade = False
+        self._frame = None
+        self._frame_dirty = True
+        self._quality = None
+        self._governor = RenderQualityGovernor()
 
         self._geometry = Struct()
         self._geometry.viewport_width = None 
@@ -48,6 +60,10 @@ class PixelVisualizationRenderer(_BaseRenderer):
         self._geometry.y0 = None
         self._geometry.centered_x0 = None
         self._geometry.centered_y0 = None
+        self._geometry.fit_zoom = None
+        self._geometry.relative_zoom = 1.0
+        self._geometry.center_x = 0.5
+        self._geometry.center_y = 0.5
         self._geometry.T_image_to_norm = None
         self._geometry.T_norm_to_image = None
         self._geometry.T_norm_to_viewport = None
@@ -59,20 +75,79 @@ class PixelVisualizationRenderer(_BaseRenderer):
 
         self._overlays = Overlays()
         self._annotations = Annotations()
+        self._layers = OrderedDict()
+        self._buffers = BufferPool()
+        if pixviz is not None:
+            pixviz.set_buffers(self._buffers)
 
     def overlays(self): return self._overlays
     def annotations(self): return self._annotations
+    def layers(self): return self._layers
     def pixviz(self): return self._pixviz
     def interpolation(self): return self._interpolation
-    def set_pixviz(self, pixviz): self._pixviz = pixviz
+    def buffers(self): return self._buffers
+    def governor(self): return self._governor
+
+    def set_pixviz(self, pixviz):
+        # The pixviz renders into buffers owned by the renderer
+        self._pixviz = pixviz
+        if pixviz is not None:
+            pixviz.set_buffers(self._buffers)
 
 
     def set_interpolation(self, interpolation):
         if interpolation == self._interpolation:
             return False
         self._interpolation = interpolation
+        self.invalidate_frame()
         return True
 
+    def set_fade(self, value):
+        if self._fade == value:
+            return
+        self._fade = value
+        self.invalidate_frame()
+
+    def memory(self):
+        # Bytes held by the pixmaps, spare buffers and recorded annotations
+        def pixmap_bytes(pixmap):
+            if pixmap is None: return 0
+            return pixmap.width() * pixmap.height() * pixmap.depth() // 8
+        total = pixmap_bytes(self._pixmap) + pixmap_bytes(self._frame)
+        total += sum(pixmap_bytes(pixmap) for pixmap in self._pyramid.values())
+        return total + self._buffers.memory() + self._annotations.memory()
+
+    def set_preview(self, image):
+        # Shown in place of the image until the pixviz has one, the preview
+        # is a downscaled render with the full size in its width and height
+        # texts
+        self._preview = image
+
+    def invalidate_frame(self):
+        self._frame_dirty = True
+
+    def add_layer(self, name, layer):
+        # Layers are painted into the frame above the annotations, they
+        # invalidate it through invalidate_frame() when they change
+        self._layers[name] = layer
+        self.invalidate_frame()
+
+    def release(self):
+        # Drop the pixmaps, spare buffers and recorded annotations, they are
+        # recreated on next render
+        self._buffers.clear()
+        self._annotations.release()
+        self._image = None
+        self._pixmap = None
+        self._pyramid = {}
+        self._preview = None
+        self._shown_preview = None
+        self._frame = None
+        self._frame_dirty = True
+        self._valid = False
+        self._geometry.image_width = None
+        self._geometry.image_height = None
+
     def set_viewport_size(self, width, height):
         g = self._geometry
 
@@ -86,24 +161,32 @@ class PixelVisualizationRenderer(_BaseRenderer):
         g.viewport_width = width
         g.viewport_height = height
         self._compute_geometry() 
+        self.invalidate_frame()
 
     def update_image(self):
         g = self._geometry
 
         # Check if we have an image 
         if self._pixviz is None or self._pixviz.image() is None:
+            if self._preview is not None:
+                return self._update_preview()
             self._image = None
             self._valid = False
             g.image_width = None
             g.image_height = None
             self._annotations.set_props(None)
+            self._frame = None
             return None
 
-        # Update values
-        if self._image is self._pixviz.image():
+        # Update values, pooled image buffers are reused so the revision
+        # tells whether the image changed
+        if self._image is not None and self._image_revision == self._pixviz.revision():
             return
 
         self._image = self._pixviz.image()
+        self._image_revision = self._pixviz.revision()
+        self._preview = None
+        self._shown_preview = None
         new_width = self._image.shape[1]
         new_height = self._image.shape[0]
         if g.image_width != new_width or g.image_height != new_height:
@@ -116,11 +199,28 @@ class PixelVisualizationRenderer(_BaseRenderer):
         props = self._pixviz.props().data()
         self._annotations.set_props(props)
 
-        # Update pixmap
-        self._pixmap = to_qpixmap(self._image)
+        # Update pixmap, the pixviz may have converted the image already
+        self._pixmap = to_qpixmap(self._pixviz.qimage())
+        self._pyramid = {}
+        self._governor.changed()
+        self.invalidate_frame()
+
+    def _update_preview(self):
+        g = self._geometry
+        if self._shown_preview is self._preview:
+            return
+        self._shown_preview = self._preview
+        g.image_width = int(self._preview.text('width'))
+        g.image_height = int(self._preview.text('height'))
+        self._compute_geometry()
+        self._annotations.set_props(None)
+        self._image = None
+        self._pixmap = to_qpixmap(self._preview)
+        self._pyramid = {}
+        self.invalidate_frame()
 
     def render_preview(self, viewport_point, zoom, width, height):
-        if not self._valid:
+        if not self._valid or self._image is None:
             return None
 
         # Set up painter and fill background
@@ -153,7 +253,7 @@ class PixelVisualizationRenderer(_BaseRenderer):
 
         # Paint annotation
         painter.scale_coeff = 1 / zoom
-        self._annotations.paint(painter)
+        self._annotations.paint(painter, source_rect)
 
         # # Paint overlay with XOR composition
         # self._overlays.paint(painter)
@@ -171,11 +271,81 @@ class PixelVisualizationRenderer(_BaseRenderer):
         screen_zoom = g.scaled_height / g.image_height
         return screen_zoom
 
+    def _changed_geometry(self, relative_zoom, center_x, center_y):
+        g = self._geometry
+        if (g.relative_zoom, g.center_x, g.center_y) == (relative_zoom, center_x, center_y):
+            return False
+        g.relative_zoom = relative_zoom
+        g.center_x = center_x
+        g.center_y = center_y
+        self._compute_geometry()
+        self._governor.changed()
+        self.invalidate_frame()
+        return True
+
+    def set_relative_zoom(self, zoom, anchor=None):
+        # Zoom relative to fitting the image into the viewport, keeping the
+        # normalized image point anchor at its place in the viewport. Only
+        # the transform changes, the pixmap is not touched.
+        g = self._geometry
+        if not self._valid:
+            g.relative_zoom = max(1.0, zoom)
+            return False
+
+        zoom = clamp(zoom, 1.0, max(1.0, max_screen_zoom / g.fit_zoom))
+        if anchor is None:
+            return self._changed_geometry(zoom, g.center_x, g.center_y)
+
+        # The anchor is at the same viewport position before and after
+        viewport_x = g.x0 + anchor.x() * g.scaled_width
+        viewport_y = g.y0 + anchor.y() * g.scaled_height
+        scaled_width = g.scaled_width * zoom / g.relative_zoom
+        scaled_height = g.scaled_height * zoom / g.relative_zoom
+        center_x = anchor.x() + (g.viewport_width / 2 - viewport_x) / scaled_width
+        center_y = anchor.y() + (g.viewport_height / 2 - viewport_y) / scaled_height
+        return self._changed_geometry(zoom, center_x, center_y)
+
+    def set_screen_zoom(self, zoom, anchor=None):
+        if not self._valid: return False
+        return self.set_relative_zoom(zoom / self._geometry.fit_zoom, anchor)
+
+    def pan(self, norm_delta):
+        # Moves the image by a distance in normalized image coordinates
+        g = self._geometry
+        if not self._valid: return False
+        return self._changed_geometry(g.relative_zoom, g.center_x - norm_delta.x(), g.center_y - norm_delta.y())
+
+    def pan_offset(self):
+        # Offset of the image from being centered in viewport pixels
+        g = self._geometry
+        if not self._valid: return None
+        return QPoint(int(round(g.x0 - g.centered_x0)), int(round(g.y0 - g.centered_y0)))
+
+    def set_pan_offset(self, offset):
+        g = self._geometry
+        if not self._valid: return False
+        return self._changed_geometry(
+            g.relative_zoom,
+            0.5 - offset.x() / g.scaled_width,
+            0.5 - offset.y() / g.scaled_height
+        )
+
+    def zoom_to_rect(self, image_rect):
+        # Zooms such that the rectangle (in image coordinates) fills the
+        # viewport and is centered
+        g = self._geometry
+        if not self._valid or image_rect.width() <= 0 or image_rect.height() <= 0:
+            return False
+        screen_zoom = min(g.viewport_width / image_rect.width(), g.viewport_height / image_rect.height())
+        zoom = clamp(screen_zoom / g.fit_zoom, 1.0, max(1.0, max_screen_zoom / g.fit_zoom))
+        center = image_rect.center()
+        return self._changed_geometry(zoom, center.x() / g.image_width, center.y() / g.image_height)
+
     def _compute_geometry(self):
         g = self._geometry
         self._valid = False
 
-        if self._image is None:
+        if g.image_width is None or g.image_height is None:
             return
         if g.viewport_width is None or g.viewport_height is None:
             return
@@ -189,12 +359,22 @@ class PixelVisualizationRenderer(_BaseRenderer):
         else:
             g.scaled_width = int(g.sy * g.image_width + 0.5)
             g.scaled_height = g.viewport_height
+        g.fit_zoom = g.scaled_height / g.image_height
+
+        # Apply the zoom relative to the fitting size
+        if g.relative_zoom != 1.0:
+            g.scaled_width = g.scaled_width * g.relative_zoom
+            g.scaled_height = g.scaled_height * g.relative_zoom
 
-        # Origin
+        # Origin, an axis on which the image is smaller than the viewport is
+        # centered, otherwise the center is kept such that the viewport stays
+        # within the image
         g.centered_x0 = (g.viewport_width - g.scaled_width) // 2
         g.centered_y0 = (g.viewport_height - g.scaled_height) // 2
-        g.x0 = g.centered_x0
-        g.y0 = g.centered_y0
+        g.center_x = self._clamp_center(g.center_x, g.viewport_width, g.scaled_width)
+        g.center_y = self._clamp_center(g.center_y, g.viewport_height, g.scaled_height)
+        g.x0 = g.centered_x0 + (0.5 - g.center_x) * g.scaled_width
+        g.y0 = g.centered_y0 + (0.5 - g.center_y) * g.scaled_height
 
         # Transforms 
         g.T_image_to_viewport = QTransform(
@@ -232,16 +412,97 @@ class PixelVisualizationRenderer(_BaseRenderer):
 
         self._valid = True 
         
-    def paint_image(self, painter):
-        painter.setRenderHint(QPainter.SmoothPixmapTransform, self._interpolation)
-        pixmap = self._pixmap
-        painter.drawPixmap(0, 0, pixmap)
+    def _clamp_center(self, center, viewport_size, scaled_size):
+        if scaled_size <= viewport_size:
+            return 0.5
+        margin = viewport_size / scaled_size / 2
+        return clamp(center, margin, 1 - margin)
+
+    def _pixmap_level(self, level):
+        # Pyramid levels are built on first use and kept until the image
+        # changes
+        if level == 0:
+            return self._pixmap
+        if level not in self._pyramid:
+            width = max(1, self._pixmap.width() >> level)
+            height = max(1, self._pixmap.height() >> level)
+            self._pyramid[level] = self._pixmap.scaled(width, height, Qt.IgnoreAspectRatio, Qt.FastTransformation)
+        return self._pyramid[level]
+
+    def reduced_quality(self):
+        if self._quality is None: return False
+        return self._quality != self._governor.full_quality(self._interpolation)
+
+    def restore_quality(self):
+        # Called once the view is idle, repaints at full quality if the
+        # current frame was painted at reduced quality
+        self._governor.set_idle()
+        if not self.reduced_quality():
+            return False
+        self.invalidate_frame()
+        return True
+
+    def paint_image(self, painter, quality=None):
+        if quality is None:
+            quality = self._governor.full_quality(self._interpolation)
+        painter.setRenderHint(QPainter.SmoothPixmapTransform, quality.smooth)
+        # Pyramid levels and previews are smaller than the image and drawn
+        # stretched over it
+        g = self._geometry
+        target = QRectF(0, 0, g.image_width, g.image_height)
+        pixmap = self._pixmap_level(quality.level)
+        if pixmap.width() == g.image_width and pixmap.height() == g.image_height:
+            painter.drawPixmap(0, 0, pixmap)
+        else:
+            painter.drawPixmap(target, pixmap, QRectF(pixmap.rect()))
         if self._fade:
-            painter.fillRect(pixmap.rect(), QColor(150, 150, 150, 200))
+            painter.fillRect(target, QColor(150, 150, 150, 200))
 
     def valid(self):
         return self._valid
 
+    def render_frame(self, width, height, device_pixel_ratio=1.0):
+        # The frame holds everything below the overlays (background, image,
+        # fade, annotations and layers). It is only repainted when one of them changes,
+        # so that moving the crosshair or selection just blits it again.
+        g = self._geometry
+        frame = self._frame
+        if frame is not None and not self._frame_dirty \
+                and frame.devicePixelRatioF() == device_pixel_ratio \
+                and frame.width() == int(width * device_pixel_ratio) \
+                and frame.height() == int(height * device_pixel_ratio):
+            return frame
+
+        self.__log.debug(f"rendering frame {width}x{height}")
+        frame = QPixmap(int(width * device_pixel_ratio), int(height * device_pixel_ratio))
+        frame.setDevicePixelRatio(device_pixel_ratio)
+        painter = QPainter(frame)
+
+        # Fill background
+        painter.fillRect(0, 0, width, height, QBrush(Qt.gray))
+
+        # Operate in image coordinates
+        painter.setTransform(g.T_image_to_viewport)
+        painter.scale_coeff = g.image_width / g.scaled_width
+
+        # Paint the image and annotations in the quality chosen by the
+        # governor and measure how long it takes. Building a pyramid level
+        # is not counted, it is done once per image.
+        self._quality = self._governor.quality(self._interpolation, self.screen_zoom())
+        self._pixmap_level(self._quality.level)
+        start = time.perf_counter()
+        self.paint_image(painter, self._quality)
+        visible = g.T_viewport_to_image.mapRect(QRectF(0, 0, width, height))
+        self._annotations.paint(painter, visible)
+        for layer in self._layers.values():
+            layer.paint(painter, visible)
+        painter.end()
+        self._governor.record(self._quality, time.perf_counter() - start)
+
+        self._frame = frame
+        self._frame_dirty = False
+        return frame
+
     def render(self, painter):
         # Update state
         g = self._geometry
@@ -251,27 +512,33 @@ class PixelVisualizationRenderer(_BaseRenderer):
         self.set_viewport_size(width, height)
         self.update_image()
 
-        # Fill background
-        painter.fillRect(0, 0, width, height, QBrush(Qt.gray))
-
         # Do noting if we don't have valid geometry
         if not self._valid:
+            painter.fillRect(0, 0, width, height, QBrush(Qt.gray))
             return False
 
+        # Copy the cached frame, the painter is clipped to the exposed region
+        frame = self.render_frame(width, height, painter.device().devicePixelRatioF())
+        painter.drawPixmap(0, 0, frame)
+
         # Operate in image coordinates
-        painter.setViewport(int(g.x0), int(g.y0), int(g.scaled_width), int(g.scaled_height))
-        painter.setWindow(0, 0, int(g.image_width), int(g.image_height))
+        painter.setTransform(g.T_image_to_viewport)
         painter.scale_coeff = g.image_width / g.scaled_width
 
-        # Paint the image
-        self.paint_image(painter)
-
-        # Paint annotation
-        self._annotations.paint(painter)
-
-        # Paint overlay with XOR composition
+        # Paint overlay with XOR composition on top of the frame
         self._overlays.paint(painter)
 
+    def overlay_region(self, margin=2):
+        # Viewport region covered by the overlays, grown by a margin to cover
+        # pen width and rounding when mapping from image coordinates
+        if not self._valid: return None
+        g = self._geometry
+        region = QRegion()
+        for rect in self._overlays.dirty_rects(g.image_width, g.image_height):
+            rect = g.T_image_to_viewport.mapRect(rect).toAlignedRect()
+            region += rect.adjusted(-margin, -margin, margin, margin)
+        return region
+
     def viewport_to_image(self, point):
         if not self._valid: return None
         return self._geometry.T_viewport_to_image.map(QPointF(point))
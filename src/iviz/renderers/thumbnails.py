@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+
+### --------------------------------------------- ###
+### Part of iViz                                  ###
+### (C) 2022 Eddy ilg (me@eddy-ilg.net)           ###
+### Creative Commons                              ###
+### Attribution-NonCommercial-NoDerivatives       ###
+### 4.0 International License.                    ###
+### Commercial use an redistribution prohibited.  ###
+### See https://github.com/eddy-ilg/iviz          ###
+### --------------------------------------------- ###
+
+import threading
+import numpy as np
+from itypes import TraceLogger
+from PyQt5.QtCore import QObject, Qt, QSize, pyqtSignal
+from PyQt5.QtGui import QImage, QImageReader
+from ..utils import thread_pool, disk_cache, file_key, qimage_to_numpy
+from ..resources import thumbnail_size
+from ..sequence import viz_type, read_frame, frame_cache
+from .pixviz import ImagePixmapVisualization, FlowPixmapVisualization, FloatPixmapVisualization, LabelPixmapVisualization
+
+
+_pixviz_classes = {
+    'image': ImagePixmapVisualization,
+    'flow': FlowPixmapVisualization,
+    'float': FloatPixmapVisualization,
+    'label': LabelPixmapVisualization,
+}
+
+
+class _ReducedVariable:
+    # Stands in for the variable of a data item, holding a reduced
+    # resolution version of its array
+    def __init__(self, file, data):
+        self._file = file
+        self._data = data
+
+    def file(self): return self._file
+    def numpy(self): return self._data
+    def data(self): return self._data
+    def valid(self): return self._data is not None
+    def reload(self): pass
+
+
+class _NoProps:
+    def data(self):
+        return None
+
+
+class _ReducedData:
+    def __init__(self, variable):
+        self._variable = variable
+
+    def image(self): return self._variable
+    def float(self): return self._variable
+    def flow(self): return self._variable
+    def label(self): return self._variable
+    def props(self): return _NoProps()
+    def reload(self): pass
+
+
+class ThumbnailRenderer(QObject):
+    # Renders small versions of one visualization of a dataset on a
+    # background thread, colorized like its display with default settings.
+    # Where possible only a reduced version of the file is decoded (scaled
+    # JPEG decoding, strided reads of memory mapped numpy files). Thumbnails
+    # of files are kept in the on disk cache.
+
+    thumbnail_ready = pyqtSignal(int, QImage)
+
+    def __init__(self, dataset, index, size=thumbnail_size, pool='thumbnails'):
+        self.__log = TraceLogger()
+        super().__init__()
+        self._ds = dataset
+        self._seq = index
+        self._size = QSize(size)
+        self._pool = pool
+        self._lock = threading.Lock()
+        self._pending = set()
+        self._wanted = (0, -1)
+
+        # The first visualization that is not text is shown
+        self._viz_id = None
+        self._type = None
+        for id in dataset.viz.ids():
+            type = viz_type(dataset.viz[id])
+            if type in _pixviz_classes:
+                self._viz_id = id
+                self._type = type
+                break
+
+        # Thumbnails are rendered one at a time, so a single visualization
+        # is enough
+        self._pixviz = None if self._type is None else _pixviz_classes[self._type]()
+        self._cache = disk_cache('thumbnails')
+
+    def valid(self): return self._pixviz is not None
+    def size(self): return self._size
+    def viz_id(self): return self._viz_id
+
+    def set_wanted(self, first, last):
+        # Requests outside of this range that did not start yet are dropped
+        with self._lock:
+            self._wanted = (first, last)
+
+    def request(self, index):
+        if not self.valid():
+            return
+        with self._lock:
+            if index in self._pending:
+                return
+            self._pending.add(index)
+        # The sequence index and the dataset are only queried on the GUI
+        # thread, the background thread gets the resolved data item
+        try:
+            data = self._data(index)
+        except Exception as e:
+            self.__log.debug(f"cannot resolve thumbnail {index}: {e}")
+            data = None
+        thread_pool(self._pool, workers=1).submit(self._run, index, data)
+
+    def _run(self, index, data):
+        try:
+            with self._lock:
+                if not self._wanted[0] <= index <= self._wanted[1]:
+                    return
+            image = self.thumbnail(data)
+        except Exception as e:
+            self.__log.debug(f"cannot render thumbnail {index}: {e}")
+            image = None
+        finally:
+            with self._lock:
+                self._pending.discard(index)
+        if image is not None:
+            self.thumbnail_ready.emit(index, image)
+
+    def _data(self, index):
+        group_id = self._seq.group_id(self._seq.group(index))
+        item_id = self._seq.item_id(index)
+        return self._ds.viz[self._viz_id].data(group_id, item_id)
+
+    def thumbnail(self, data):
+        if data is None:
+            return None
+        variable = getattr(data, self._type)()
+        file = variable.file()
+
+        key = file_key(file, self._type, self._size.width(), self._size.height())
+        image = self._cache.get_image(key)
+        if image is not None:
+            return image
+
+        # A preview stored by a display is already colorized
+        preview = self._pixviz.load_preview(data)
+        if preview is not None:
+            image = preview.scaled(self._size, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+        else:
+            reduced = self._reduced(variable, file)
+            if reduced is None:
+                return None
+            rendered = self._pixviz.render(_ReducedData(_ReducedVariable(file, reduced)))
+            if rendered.qimage is None:
+                return None
+            image = rendered.qimage.scaled(self._size, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+            self._pixviz.buffers().release(rendered.image)
+
+        self._cache.put_image(key, image)
+        return image
+
+    def _step(self, height, width):
+        return max(1, min(height // self._size.height(), width // self._size.width()))
+
+    def _reduced(self, variable, file):
+        path = None if file is None else str(file)
+
+        # Qt decodes JPEGs directly at a reduced scale
+        if path is not None and self._type == 'image':
+            reader = QImageReader(path)
+            if reader.canRead():
+                size = reader.size()
+                if size.isValid():
+                    step = self._step(size.height(), size.width())
+                    reader.setScaledSize(QSize(max(1, size.width() // step), max(1, size.height() // step)))
+                image = reader.read()
+                if not image.isNull():
+                    return qimage_to_numpy(image)
+
+        # Memory mapped numpy files only read the rows that are used. Other
+        # files are read directly instead of through the frame cache, so
+        # that thumbnails do not evict the frames being viewed.
+        if path is None:
+            data = variable.numpy()
+        else:
+            data = frame_cache().peek(path)
+            if data is None and path.endswith('.npy'):
+                data = np.load(path, mmap_mode='r')
+            elif data is None:
+                data = read_frame(self._type, path)
+        if data is None:
+            return None
+
+        step = self._step(data.shape[0], data.shape[1])
+        reduced = np.array(data[::step, ::step])
+        if reduced.ndim == 2 and self._type != 'float':
+            reduced = reduced[:, :, None]
+        return reduced
@@ -42,9 +42,70 @@ visible_icon_file = iviz_icons_root.file('visible.svg')
 invisible_icon_file = iviz_icons_root.file('invisible.svg')
 
 settings_file = home.cd('.iviz').file('settings.json')
+cache_root = home.cd('.iviz').cd('cache')
 
 expanding_minimum_size = QSize(250, 150)
 
+# Grids with more displays only create them once they are scrolled into view
+virtual_grid_threshold = 16
+
+# Largest zoom of a view, in screen pixels per image pixel
+max_screen_zoom = 64
+# Zoom factor per mouse wheel step
+wheel_zoom_step = 1.25
+
+# Views lower the rendering quality while frames change faster than this
+# (seconds per frame) and restore it after being idle this long (seconds)
+render_frame_budget = 0.012
+render_idle_delay = 0.3
+
+# Size of the thumbnails in the filmstrip under the sequence controls
+thumbnail_size = QSize(96, 64)
+
+# Size limit of each on disk cache under cache_root (in bytes) and the
+# largest side of the previews stored for instant first paint
+disk_cache_max_bytes = 256 * 1024 * 1024
+preview_max_size = 512
+
+# Number of previews queued for storing at most, further ones are
+# skipped until the queue drains
+preview_max_pending = 4
+
+# Decoded frames kept in memory (in bytes), as arrays and compressed, and
+# the number of frames read ahead of the current index
+frame_cache_max_bytes = 1024 * 1024 * 1024
+frame_cache_max_compressed_bytes = 512 * 1024 * 1024
+frame_prefetch_count = 4
+# Frames waiting to be compressed, further frames falling out of memory are
+# dropped
+frame_compress_max_pending = 4
+
+# Memory the displays and the frame cache may hold together (in bytes) and
+# how often it is checked (in seconds)
+memory_budget = 4 * 1024 * 1024 * 1024
+memory_check_interval = 1.0
+
+# Colors of the curves in plots, channels named r, g and b use their own
+plot_colors = [QColor("#ff7f0e"), QColor("#9467bd"), QColor("#8c564b"), QColor("#17becf"), QColor("#e377c2"), QColor("#7f7f7f")]
+plot_channel_colors = {'r': QColor("#d62728"), 'g': QColor("#2ca02c"), 'b': QColor("#1f77b4")}
+
+# Items read by each task of a temporal probe
+probe_chunk_size = 16
+
+# Items read by each task computing the per frame statistics shown as
+# tracks under the sequence controls, the height of each track and the
+# width of the slider while tracks are shown
+track_chunk_size = 16
+track_height = 20
+track_min_width = 320
+
+# Box selections slice the array directly, summed-area tables are built in
+# the background for an array queried this often
+region_tables_min_queries = 3
+
+# Larger images are colorized in parallel bands of rows
+parallel_rows_min_pixels = 2048 * 2048
+
 
 
 # Midlight  #cacaca
@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+
+### --------------------------------------------- ###
+### Part of iViz                                  ###
+### (C) 2022 Eddy ilg (me@eddy-ilg.net)           ###
+### Creative Commons                              ###
+### Attribution-NonCommercial-NoDerivatives       ###
+### 4.0 International License.                    ###
+### Commercial use an redistribution prohibited.  ###
+### See https://github.com/eddy-ilg/iviz          ###
+### --------------------------------------------- ###
+
+from .index import SequenceIndex
+from .index import sequence_index
+
+from .manifest import ManifestDataset
+from .manifest import ManifestVisualization
+from .manifest import write_manifest
+from .manifest import manifest_file_name
+from .manifest import viz_type
+from .manifest import read_frame
+
+from .frame_cache import FrameCache
+from .frame_cache import frame_cache
+
+from .probe import TemporalProbe
+from .probe import region_mean
+from .probe import channel_names
+
+from .tracks import ScalarTracks
+from .tracks import frame_statistics
+from .tracks import statistic_names
+
+from .scan import scan_file
+from .scan import index_directory
+
+from .commands import manifest_command
+from .commands import index_command
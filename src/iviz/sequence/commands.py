@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+
+### --------------------------------------------- ###
+### Part of iViz                                  ###
+### (C) 2022 Eddy ilg (me@eddy-ilg.net)           ###
+### Creative Commons                              ###
+### Attribution-NonCommercial-NoDerivatives       ###
+### 4.0 International License.                    ###
+### Commercial use an redistribution prohibited.  ###
+### See https://github.com/eddy-ilg/iviz          ###
+### --------------------------------------------- ###
+
+import argparse
+from itypes import File, Path
+from .manifest import write_manifest, manifest_file_name
+from .scan import index_directory
+
+
+def manifest_command(argv):
+    parser = argparse.ArgumentParser(prog="iviz manifest", description="Convert a sequence into a manifest that iviz opens lazily")
+    parser.add_argument("path", type=str, help="Path to a directory or a sequence file")
+    parser.add_argument("--output", type=str, default=None, help=f"Manifest file to write (default: {manifest_file_name} next to the sequence)")
+    parser.add_argument("--cols", type=int, default=5, help="Number of columns to use when converting directory content")
+    args = parser.parse_args(argv)
+
+    from ..viewers.dataset import load_dataset
+
+    path = Path(args.path)
+    directory = path if path.is_dir() else File(args.path).path()
+
+    # The source is what was read, i.e. the sequence file of a directory
+    # that has one
+    dataset, location = load_dataset(args.path, cols=args.cols, use_manifest=False)
+    output = File(args.output) if args.output is not None else directory.file(manifest_file_name)
+    write_manifest(dataset, output, source=location)
+    print(f"wrote {output} with {len(dataset.seq.full_item_list())} items")
+    return 0
+
+
+def index_command(argv):
+    parser = argparse.ArgumentParser(prog="iviz index", description="Scan a directory into a manifest that iviz uses on subsequent opens")
+    parser.add_argument("path", type=str, help="Path to a directory")
+    parser.add_argument("--cols", type=int, default=5, help="Number of columns to arrange the sequences in")
+    parser.add_argument("--workers", type=int, default=None, help="Number of parallel workers to scan files with")
+    args = parser.parse_args(argv)
+
+    path = Path(args.path)
+    if not path.is_dir():
+        raise Exception(f"\"{args.path}\" is not a directory")
+    if path.file('data.gridseq').exists() or path.file('data.json').exists():
+        raise Exception(f"\"{args.path}\" contains a sequence file, use \"iviz manifest\" to convert it")
+
+    output = index_directory(args.path, cols=args.cols, workers=args.workers)
+    print(f"wrote {output}")
+    return 0
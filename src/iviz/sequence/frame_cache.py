@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+
+### --------------------------------------------- ###
+### Part of iViz                                  ###
+### (C) 2022 Eddy ilg (me@eddy-ilg.net)           ###
+### Creative Commons                              ###
+### Attribution-NonCommercial-NoDerivatives       ###
+### 4.0 International License.                    ###
+### Commercial use an redistribution prohibited.  ###
+### See https://github.com/eddy-ilg/iviz          ###
+### --------------------------------------------- ###
+
+import zlib
+import threading
+import numpy as np
+from collections import OrderedDict
+from itypes import Struct, TraceLogger
+from ..utils import thread_pool
+from ..resources import frame_cache_max_bytes, frame_cache_max_compressed_bytes, frame_compress_max_pending
+
+
+def _compress(array, probe_size=65536, min_ratio=0.9):
+    # Bytes are shuffled into planes holding the same byte of all values.
+    # The high bytes of floats vary slowly and compress well even at the
+    # fastest zlib level, the low mantissa bytes are mostly noise. Planes
+    # whose beginning does not compress are stored as they are, which
+    # saves most of the time.
+    array = np.ascontiguousarray(array)
+    raw = array.reshape(-1).view(np.uint8).reshape(-1, array.dtype.itemsize).T
+    planes = []
+    for plane in raw:
+        plane = plane.tobytes()
+        probe = plane[:probe_size]
+        if len(zlib.compress(probe, 1)) > min_ratio * len(probe):
+            planes.append((False, plane))
+        else:
+            planes.append((True, zlib.compress(plane, 1)))
+    return planes, array.shape, array.dtype
+
+
+def _decompress(entry):
+    planes, shape, dtype = entry
+    raw = np.empty((len(planes), int(np.prod(shape))), dtype=np.uint8)
+    for row, (compressed, plane) in zip(raw, planes):
+        row[:] = np.frombuffer(zlib.decompress(plane) if compressed else plane, np.uint8)
+    return raw.T.copy().view(dtype).reshape(shape)
+
+
+def _entry_bytes(entry):
+    return sum(len(plane) for _, plane in entry[0])
+
+
+class FrameCache:
+    # Decoded frames by key in two tiers. The first tier holds arrays up to
+    # max_bytes, frames falling out of it are compressed in the background
+    # into the second tier, which holds up to max_compressed_bytes. Frames
+    # found in the second tier are decompressed and moved back to the first.
+    # Prefetching loads or decompresses frames on a worker thread before
+    # they are needed, compression runs on a separate one so that it does
+    # not delay prefetches. Frames waiting for compression count towards
+    # max_bytes until they are stored, frames that fall out while max_pending
+    # frames are waiting are dropped.
+
+    def __init__(self, max_bytes=frame_cache_max_bytes, max_compressed_bytes=frame_cache_max_compressed_bytes,
+                 max_pending=frame_compress_max_pending, pool='frames', compress_pool='frames_compress'):
+        self.__log = TraceLogger()
+        self._max_bytes = max_bytes
+        self._max_compressed_bytes = max_compressed_bytes
+        self._max_pending = max_pending
+        self._pool = pool
+        self._compress_pool = compress_pool
+        self._lock = threading.Lock()
+        self._frames = OrderedDict()
+        self._compressed = OrderedDict()
+        self._pending = {}
+        self._bytes = 0
+        self._pending_bytes = 0
+        self._compressed_bytes = 0
+        self._loading = {}
+
+    def max_bytes(self): return self._max_bytes
+    def max_compressed_bytes(self): return self._max_compressed_bytes
+
+    def set_budget(self, max_bytes, max_compressed_bytes):
+        with self._lock:
+            self._max_bytes = max_bytes
+            self._max_compressed_bytes = max_compressed_bytes
+            self._trim()
+            self._trim_compressed()
+
+    def stats(self):
+        with self._lock:
+            return Struct(
+                frames=len(self._frames),
+                bytes=self._bytes,
+                pending_frames=len(self._pending),
+                pending_bytes=self._pending_bytes,
+                compressed_frames=len(self._compressed),
+                compressed_bytes=self._compressed_bytes
+            )
+
+    def get(self, key, load):
+        with self._lock:
+            if key in self._frames:
+                self._frames.move_to_end(key)
+                return self._frames[key]
+            future = self._loading.get(key)
+            # A prefetch that did not start yet is replaced by loading here
+            if future is not None and future.cancel():
+                del self._loading[key]
+                future = None
+            # Compressed frames are decompressed on the worker
+            if future is None and key in self._compressed:
+                future = thread_pool(self._pool, workers=1).submit(self._prefetch, key, load)
+                self._loading[key] = future
+
+        # A frame being prefetched is waited for instead of loaded twice
+        if future is not None:
+            array = future.result()
+            if array is not None:
+                return array
+        return self._fetch(key, load)
+
+    def holds(self, array):
+        # Whether the array is one of the decoded frames
+        with self._lock:
+            return any(frame is array for frame in self._frames.values())
+
+    def peek(self, key):
+        # The frame if it is decoded in memory, without loading it
+        with self._lock:
+            return self._frames.get(key)
+
+    def prefetch(self, key, load):
+        with self._lock:
+            if key in self._frames or key in self._loading:
+                return
+            self._loading[key] = thread_pool(self._pool, workers=1).submit(self._prefetch, key, load)
+
+    def cancel_prefetches(self, keys):
+        # Drops prefetches of the keys that did not start yet
+        with self._lock:
+            for key in keys:
+                future = self._loading.get(key)
+                if future is not None and future.cancel():
+                    del self._loading[key]
+
+    def _prefetch(self, key, load):
+        try:
+            return self._fetch(key, load)
+        except Exception as e:
+            self.__log.debug(f"cannot prefetch {key}: {e}")
+            return None
+        finally:
+            with self._lock:
+                self._loading.pop(key, None)
+
+    def _fetch(self, key, load):
+        with self._lock:
+            # A frame waiting for compression is taken back as it is
+            array = self._pending.pop(key, None)
+            if array is not None:
+                self._pending_bytes -= array.nbytes
+            entry = self._compressed.pop(key, None)
+            if entry is not None:
+                self._compressed_bytes -= _entry_bytes(entry)
+        if array is None:
+            array = load() if entry is None else _decompress(entry)
+        if array is not None:
+            self.put(key, array)
+        return array
+
+    def put(self, key, array):
+        with self._lock:
+            if array.nbytes > self._max_bytes:
+                return
+            if key in self._frames:
+                self._bytes -= self._frames.pop(key).nbytes
+            self._frames[key] = array
+            self._bytes += array.nbytes
+            self._trim()
+
+    def discard(self, key):
+        with self._lock:
+            if key in self._frames:
+                self._bytes -= self._frames.pop(key).nbytes
+            if key in self._compressed:
+                self._compressed_bytes -= _entry_bytes(self._compressed.pop(key))
+            if key in self._pending:
+                self._pending_bytes -= self._pending.pop(key).nbytes
+
+    def memory(self):
+        with self._lock:
+            return self._bytes + self._pending_bytes + self._compressed_bytes
+
+    def release(self, nbytes):
+        # Frees at least nbytes if possible, compressed frames and frames
+        # waiting for compression go first, then the least recently used
+        # frames without compressing them. Returns the bytes freed.
+        freed = 0
+        with self._lock:
+            while freed < nbytes and len(self._pending):
+                _, array = self._pending.popitem()
+                self._pending_bytes -= array.nbytes
+                freed += array.nbytes
+            while freed < nbytes and len(self._compressed):
+                _, entry = self._compressed.popitem(last=False)
+                self._compressed_bytes -= _entry_bytes(entry)
+                freed += _entry_bytes(entry)
+            while freed < nbytes and len(self._frames):
+                _, array = self._frames.popitem(last=False)
+                self._bytes -= array.nbytes
+                freed += array.nbytes
+        return freed
+
+    def clear(self):
+        with self._lock:
+            self._frames.clear()
+            self._compressed.clear()
+            self._pending.clear()
+            self._bytes = 0
+            self._pending_bytes = 0
+            self._compressed_bytes = 0
+
+    def _trim(self):
+        while self._bytes + self._pending_bytes > self._max_bytes and len(self._frames):
+            key, array = self._frames.popitem(last=False)
+            self._bytes -= array.nbytes
+            if self._max_compressed_bytes > 0 and len(self._pending) < self._max_pending and key not in self._pending:
+                self._pending[key] = array
+                self._pending_bytes += array.nbytes
+                thread_pool(self._compress_pool, workers=1).submit(self._store_compressed, key, array)
+
+    def _store_compressed(self, key, array):
+        entry = _compress(array)
+        with self._lock:
+            # The frame may have been taken back, discarded or loaded again
+            # in the meantime
+            if self._pending.get(key) is not array:
+                return
+            del self._pending[key]
+            self._pending_bytes -= array.nbytes
+            if key in self._frames or key in self._compressed:
+                return
+            self._compressed[key] = entry
+            self._compressed_bytes += _entry_bytes(entry)
+            self._trim_compressed()
+
+    def _trim_compressed(self):
+        while self._compressed_bytes > self._max_compressed_bytes and len(self._compressed):
+            _, entry = self._compressed.popitem(last=False)
+            self._compressed_bytes -= _entry_bytes(entry)
+
+
+_frame_cache = None
+
+
+def frame_cache():
+    # Shared by all datasets
+    global _frame_cache
+    if _frame_cache is None:
+        _frame_cache = FrameCache()
+    return _frame_cache
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+
+### --------------------------------------------- ###
+### Part of iViz                                  ###
+### (C) 2022 Eddy ilg (me@eddy-ilg.net)           ###
+### Creative Commons                              ###
+### Attribution-NonCommercial-NoDerivatives       ###
+### 4.0 International License.                    ###
+### Commercial use an redistribution prohibited.  ###
+### See https://github.com/eddy-ilg/iviz          ###
+### --------------------------------------------- ###
+
+import numpy as np
+
+
+class SequenceIndex:
+    # Flat index over the items of a sequence, built once. Maps a global
+    # item index to its group and position within the group (and back) in
+    # constant time.
+
+    def __init__(self, seq=None):
+        self._group_ids = []
+        self._group_labels = []
+        self._item_ids = []
+        self._item_labels = []
+        self._group = np.zeros(0, dtype=np.int32)
+        self._order = np.zeros(0, dtype=np.int64)
+        self._row = np.zeros(0, dtype=np.int64)
+        self._offsets = np.zeros(1, dtype=np.int64)
+        if seq is not None:
+            self._build(seq.full_item_list())
+
+    def _build(self, items):
+        groups = {}
+        group = np.empty(len(items), dtype=np.int32)
+        for index, item in enumerate(items):
+            group_id = item['group_id']
+            if group_id not in groups:
+                groups[group_id] = len(self._group_ids)
+                self._group_ids.append(group_id)
+                self._group_labels.append(item['group_label'])
+            group[index] = groups[group_id]
+            self._item_ids.append(item['item_id'])
+            self._item_labels.append(item['item_label'])
+        self._set_groups(group)
+
+    def _set_groups(self, group):
+        # Items sorted by group (stable, so items keep their order within a
+        # group), the offset of each group in that order and the row of each
+        # item within its group
+        self._group = group
+        self._order = np.argsort(group, kind='stable')
+        self._offsets = np.searchsorted(group[self._order], np.arange(len(self._group_ids) + 1))
+        self._row = np.empty(len(group), dtype=np.int64)
+        self._row[self._order] = np.arange(len(group)) - self._offsets[group[self._order]]
+
+    def __len__(self):
+        return len(self._group)
+
+    def group_count(self):
+        return len(self._group_ids)
+
+    def group_id(self, group):
+        return self._group_ids[group]
+
+    def group_label(self, group):
+        return self._group_labels[group]
+
+    def group_size(self, group):
+        return int(self._offsets[group + 1] - self._offsets[group])
+
+    def group_start(self, group):
+        return int(self._order[self._offsets[group]])
+
+    def group(self, index):
+        return int(self._group[index])
+
+    def row(self, index):
+        return int(self._row[index])
+
+    def index(self, group, row):
+        return int(self._order[self._offsets[group] + row])
+
+    def item_id(self, index):
+        return self._item_ids[index]
+
+    def item_label(self, index):
+        return self._item_labels[index]
+
+    def item(self, index):
+        group = self.group(index)
+        return {
+            'group_id': self._group_ids[group],
+            'group_label': self._group_labels[group],
+            'item_id': self._item_ids[index],
+            'item_label': self._item_labels[index],
+        }
+
+
+def sequence_index(seq):
+    if isinstance(seq, SequenceIndex):
+        return seq
+    return SequenceIndex(seq)
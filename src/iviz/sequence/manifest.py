@@ -0,0 +1,522 @@
+#!/usr/bin/env python3
+
+### --------------------------------------------- ###
+### Part of iViz                                  ###
+### (C) 2022 Eddy ilg (me@eddy-ilg.net)           ###
+### Creative Commons                              ###
+### Attribution-NonCommercial-NoDerivatives       ###
+### 4.0 International License.                    ###
+### Commercial use an redistribution prohibited.  ###
+### See https://github.com/eddy-ilg/iviz          ###
+### --------------------------------------------- ###
+
+import os
+import json
+import sqlite3
+import importlib
+import threading
+from itypes import Dataset, File, TraceLogger
+from .index import SequenceIndex
+from .frame_cache import frame_cache
+from ..utils.parallel import thread_pool
+from ..resources import frame_prefetch_count
+
+manifest_version = 2
+manifest_file_name = 'data.manifest'
+manifest_types = ['image', 'flow', 'float', 'label', 'text']
+
+_schema = '''
+    CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+    CREATE TABLE vizs (
+        position INTEGER PRIMARY KEY, id TEXT UNIQUE, type TEXT,
+        col INTEGER, row INTEGER, colspan INTEGER, rowspan INTEGER, label TEXT,
+        settings TEXT, props INTEGER
+    );
+    CREATE TABLE groups (idx INTEGER PRIMARY KEY, id TEXT, label TEXT, start INTEGER, size INTEGER);
+    CREATE TABLE items (idx INTEGER PRIMARY KEY, grp INTEGER, row INTEGER, id TEXT, label TEXT);
+    CREATE TABLE refs (idx INTEGER, viz TEXT, path TEXT, text TEXT, PRIMARY KEY (idx, viz)) WITHOUT ROWID;
+    CREATE TABLE files (path TEXT PRIMARY KEY, type TEXT, shape TEXT, dtype TEXT, mtime REAL);
+    CREATE INDEX groups_by_id ON groups (id);
+    CREATE INDEX items_by_row ON items (grp, row);
+    CREATE INDEX items_by_id ON items (grp, id);
+'''
+
+
+def _viz_type(viz):
+    name = type(viz).__name__.lower()
+    for type_name in manifest_types:
+        if type_name in name:
+            return type_name
+    raise Exception(f"cannot store visualization of type {type(viz).__name__} in a manifest")
+
+
+def viz_type(viz):
+    # Type of a manifest or itypes visualization, None if it has none of the
+    # manifest types
+    if isinstance(viz, ManifestVisualization):
+        return viz.type()
+    try:
+        return _viz_type(viz)
+    except Exception:
+        return None
+
+
+def _plain(value):
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return True
+    if isinstance(value, (list, tuple)):
+        return all(_plain(v) for v in value)
+    if isinstance(value, dict):
+        return all(isinstance(k, str) and _plain(v) for k, v in value.items())
+    return False
+
+
+def _viz_settings(viz):
+    # The display settings of an itypes visualization are its plain
+    # attributes, references to the dataset are left out
+    attrs = {key: value for key, value in vars(viz).items() if _plain(value)}
+    return json.dumps({'class': f'{type(viz).__module__}.{type(viz).__qualname__}', 'attrs': attrs})
+
+
+def _settings_viz(settings):
+    # Visualization with the stored settings but without a dataset, only
+    # used to create its display
+    settings = json.loads(settings)
+    module, name = settings['class'].rsplit('.', 1)
+    if module.split('.')[0] != 'itypes':
+        raise Exception(f"visualization class {settings['class']} is not an itypes class")
+    cls = getattr(importlib.import_module(module), name)
+    viz = cls.__new__(cls)
+    viz.__dict__.update(settings['attrs'])
+    return viz
+
+
+def _has_props(data):
+    if data is None or not hasattr(data, 'props'):
+        return False
+    props = data.props()
+    return props is not None and props.data() is not None
+
+
+def _viz_ref(type, data):
+    if data is None:
+        return None, None
+    if type == 'text':
+        text = data.text()
+        return None, (None if text is None else text.data())
+    file = getattr(data, type)().file()
+    return (None if file is None else str(file.abs())), None
+
+
+def _write(file, vizs, groups, items, refs, source=None, files=()):
+    file = File(str(file))
+    tmp = File(str(file) + '.tmp')
+    if tmp.exists():
+        os.remove(str(tmp))
+
+    con = sqlite3.connect(str(tmp))
+    con.executescript(_schema)
+    con.executemany('INSERT INTO vizs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', vizs)
+    con.executemany('INSERT INTO groups VALUES (?, ?, ?, ?, ?)', groups)
+    con.executemany('INSERT INTO items VALUES (?, ?, ?, ?, ?)', items)
+    con.executemany('INSERT INTO refs VALUES (?, ?, ?, ?)', refs)
+    con.executemany('INSERT INTO files VALUES (?, ?, ?, ?, ?)', files)
+
+    meta = {
+        'version': manifest_version,
+        'items': len(items),
+        'groups': len(groups),
+        'source': '' if source is None else str(File(str(source)).abs()),
+        'source_mtime': '',
+    }
+    con.executemany('INSERT INTO meta VALUES (?, ?)', [(k, str(v)) for k, v in meta.items()])
+    con.commit()
+    con.close()
+
+    os.replace(str(tmp), str(file))
+
+    # The source mtime is only recorded now, since placing the manifest in a
+    # source directory changes its mtime. Updating in place without a
+    # journal file leaves the directory untouched.
+    if source is not None:
+        con = sqlite3.connect(str(file))
+        con.execute('PRAGMA journal_mode = MEMORY')
+        con.execute("UPDATE meta SET value = ? WHERE key = 'source_mtime'", (str(os.path.getmtime(str(source))),))
+        con.commit()
+        con.close()
+    return file
+
+
+def write_manifest(dataset, file, source=None):
+    # Flattens an itypes dataset into an SQLite manifest. The dataset is
+    # read fully once here so that viewers can open the manifest lazily.
+    ids = list(dataset.viz.ids())
+    types = {}
+    props = set()
+    for id in ids:
+        types[id] = _viz_type(dataset.viz[id])
+
+    groups = {}
+    items = []
+    refs = []
+    for index, item in enumerate(dataset.seq.full_item_list()):
+        group_id = item['group_id']
+        if group_id not in groups:
+            groups[group_id] = [len(groups), str(item['group_label']), index, 0]
+        group = groups[group_id]
+        items.append((index, group[0], group[3], str(item['item_id']), str(item['item_label'])))
+        group[3] += 1
+
+        for id in ids:
+            data = dataset.viz[id].data(group_id, item['item_id'])
+            path, text = _viz_ref(types[id], data)
+            if path is not None or text is not None:
+                refs.append((index, str(id), path, text))
+            if id not in props and _has_props(data):
+                props.add(id)
+
+    # Props hold objects that cannot be stored, vizs with props read them
+    # from the sequence file
+    vizs = []
+    for position, id in enumerate(ids):
+        viz = dataset.viz[id]
+        col, row = viz.index()
+        label = viz.label() if hasattr(viz, 'label') else None
+        vizs.append((position, str(id), types[id], col, row, viz.colspan(), viz.rowspan(), label, _viz_settings(viz), int(id in props)))
+
+    groups = [(g[0], str(id), g[1], g[2], g[3]) for id, g in groups.items()]
+    return _write(file, vizs, groups, items, refs, source=source)
+
+
+def read_frame(type, path):
+    if type == 'float':
+        return File(path).read()
+    return File(path).read(dims="hwc")
+
+
+class _ManifestVariable:
+    # Decoded arrays are shared through the frame cache, so that going back
+    # to a frame or prefetching it does not read the file again
+    def __init__(self, type, path):
+        self._type = type
+        self._path = path
+        self._data = None
+
+    def file(self):
+        return None if self._path is None else File(self._path)
+
+    def numpy(self):
+        if self._path is None:
+            return None
+        if self._data is None:
+            self._data = frame_cache().get(self._path, lambda: read_frame(self._type, self._path))
+        return self._data
+
+    def data(self):
+        return self.numpy()
+
+    def valid(self):
+        return self.numpy() is not None
+
+    def reload(self):
+        self._data = None
+        if self._path is not None:
+            frame_cache().discard(self._path)
+
+
+class _ManifestText:
+    def __init__(self, text):
+        self._text = text
+
+    def data(self):
+        return self._text
+
+
+class _ManifestProps:
+    def data(self):
+        return None
+
+
+class ManifestData:
+    def __init__(self, viz_id, type, path=None, text=None, props=None):
+        self._viz_id = viz_id
+        self._type = type
+        self._variable = _ManifestVariable(type, path)
+        self._text = _ManifestText(text)
+        self._props = _ManifestProps() if props is None else props
+
+    def var_id(self): return self._viz_id
+    def image(self): return self._variable
+    def float(self): return self._variable
+    def flow(self): return self._variable
+    def label(self): return self._variable
+    def text(self): return self._text
+    def props(self): return self._props
+
+    def reload(self):
+        self._variable.reload()
+
+    @property
+    def shape(self):
+        data = self._variable.numpy()
+        return None if data is None else data.shape
+
+
+class ManifestVisualization:
+    def __init__(self, manifest, id, type, col, row, colspan, rowspan, label, settings=None, props=0):
+        self.__log = TraceLogger()
+        self._manifest = manifest
+        self._id = id
+        self._type = type
+        self._index = (col, row)
+        self._colspan = colspan
+        self._rowspan = rowspan
+        self._label = label
+        self._settings = settings
+        self._props = bool(props)
+
+    def id(self): return self._id
+    def type(self): return self._type
+    def index(self): return self._index
+    def colspan(self): return self._colspan
+    def rowspan(self): return self._rowspan
+    def label(self): return self._label
+    def has_props(self): return self._props
+
+    def create_display(self, manager):
+        # Visualizations of a sequence file keep the display settings of
+        # their definition in it
+        if self._settings is not None:
+            try:
+                return _settings_viz(self._settings).create_display(manager)
+            except Exception as e:
+                self.__log.debug(f"cannot create display of {self._id} from its settings: {e}")
+
+        from ..widgets.displays import ImageDisplay, FlowDisplay, FloatDisplay, LabelDisplay, TextDisplay
+        from ..renderers.pixviz import ImagePixmapVisualization, FlowPixmapVisualization, FloatPixmapVisualization, LabelPixmapVisualization
+
+        if self._type == 'text':
+            return TextDisplay(manager, id=self._id, label=self._label)
+
+        displays = {
+            'image': (ImageDisplay, ImagePixmapVisualization),
+            'flow': (FlowDisplay, FlowPixmapVisualization),
+            'float': (FloatDisplay, FloatPixmapVisualization),
+            'label': (LabelDisplay, LabelPixmapVisualization),
+        }
+        if self._type not in displays:
+            raise Exception(f"invalid visualization type \"{self._type}\" in manifest")
+        display_class, pixviz_class = displays[self._type]
+        return display_class(manager, pixviz=pixviz_class(), id=self._id, label=self._label)
+
+    def data(self, group_id, item_id):
+        row = self._manifest.query_one(
+            'SELECT r.path, r.text FROM groups g '
+            'JOIN items i ON i.grp = g.idx '
+            'JOIN refs r ON r.idx = i.idx AND r.viz = ? '
+            'WHERE g.id = ? AND i.id = ?',
+            (self._id, str(group_id), str(item_id))
+        )
+        if row is None:
+            return None
+
+        # Props (e.g. annotations) hold objects that are not stored in the
+        # manifest, they come from the sequence file once it is read
+        props = None
+        source = self._manifest.source_viz(self._id) if self._props else None
+        if source is not None:
+            source_data = source.data(group_id, item_id)
+            props = None if source_data is None else source_data.props()
+        return ManifestData(self._id, self._type, path=row[0], text=row[1], props=props)
+
+    def paths(self):
+        # File of each item by global index, in one query
+        return dict(self._manifest.query_all('SELECT idx, path FROM refs WHERE viz = ? AND path IS NOT NULL', (self._id,)))
+
+
+class ManifestVisualizations:
+    def __init__(self, vizs):
+        self._vizs = vizs
+
+    def ids(self): return list(self._vizs.keys())
+    def __getitem__(self, id): return self._vizs[id]
+    def __contains__(self, id): return id in self._vizs
+    def __iter__(self): return iter(self._vizs.values())
+    def __len__(self): return len(self._vizs)
+
+
+class ManifestSequenceIndex(SequenceIndex):
+    # Same interface as SequenceIndex, but queries the manifest on demand
+    # instead of holding the whole sequence in memory
+    def __init__(self, manifest):
+        super().__init__()
+        self._manifest = manifest
+        self._len = int(manifest.meta('items'))
+        self._group_count = int(manifest.meta('groups'))
+        self._last_item = (None, None)
+
+    def _item_row(self, index):
+        # The last row is read and replaced as one tuple, so concurrent
+        # callers never see the row of another index
+        last_index, row = self._last_item
+        if last_index != index:
+            row = self._manifest.query_one('SELECT grp, row, id, label FROM items WHERE idx = ?', (index,))
+            if row is None:
+                raise IndexError(f"index {index} out of range")
+            self._last_item = (index, row)
+        return row
+
+    def _group_row(self, group):
+        row = self._manifest.query_one('SELECT id, label, start, size FROM groups WHERE idx = ?', (group,))
+        if row is None:
+            raise IndexError(f"group {group} out of range")
+        return row
+
+    def __len__(self): return self._len
+    def group_count(self): return self._group_count
+
+    def group_id(self, group): return self._group_row(group)[0]
+    def group_label(self, group): return self._group_row(group)[1]
+    def group_start(self, group): return self._group_row(group)[2]
+    def group_size(self, group): return self._group_row(group)[3]
+
+    def group(self, index): return self._item_row(index)[0]
+    def row(self, index): return self._item_row(index)[1]
+    def item_id(self, index): return self._item_row(index)[2]
+    def item_label(self, index): return self._item_row(index)[3]
+
+    def index(self, group, row):
+        result = self._manifest.query_one('SELECT idx FROM items WHERE grp = ? AND row = ?', (group, row))
+        if result is None:
+            raise IndexError(f"row {row} out of range for group {group}")
+        return result[0]
+
+    def item(self, index):
+        group = self.group(index)
+        return {
+            'group_id': self.group_id(group),
+            'group_label': self.group_label(group),
+            'item_id': self.item_id(index),
+            'item_label': self.item_label(index),
+        }
+
+
+class ManifestDataset:
+    def __init__(self, file):
+        self.__log = TraceLogger()
+        self._file = File(str(file))
+        if not self._file.exists():
+            raise Exception(f"manifest \"{self._file}\" does not exist")
+
+        # Each thread queries through its own connection
+        self._local = threading.local()
+        self._meta = dict(self.query_all('SELECT key, value FROM meta'))
+        if int(self._meta.get('version', 0)) != manifest_version:
+            raise Exception(f"manifest \"{self._file}\" has unsupported version {self._meta.get('version')}")
+        self._source_lock = threading.Lock()
+        self._source = None
+
+        vizs = {}
+        for row in self.query_all('SELECT id, type, col, row, colspan, rowspan, label, settings, props FROM vizs ORDER BY position'):
+            vizs[row[0]] = ManifestVisualization(self, *row)
+        self.viz = ManifestVisualizations(vizs)
+        self.seq = ManifestSequenceIndex(self)
+        self._prefetched = set()
+        self.__log.debug(f"opened manifest {self._file} with {len(self.seq)} items")
+
+    def file(self): return self._file
+    def meta(self, key): return self._meta.get(key)
+
+    def _connection(self):
+        con = getattr(self._local, 'con', None)
+        if con is None:
+            con = sqlite3.connect(f'file:{self._file.abs()}?mode=ro', uri=True)
+            self._local.con = con
+        return con
+
+    def query_one(self, sql, args=()):
+        return self._connection().execute(sql, args).fetchone()
+
+    def query_all(self, sql, args=()):
+        return self._connection().execute(sql, args).fetchall()
+
+    def read_props(self, callback=None):
+        # Reads the sequence file the manifest was converted from on a worker
+        # if any visualization has props, callback is called once they are
+        # available. Returns the ids of these visualizations.
+        ids = [viz.id() for viz in self.viz if viz.has_props()]
+        source = self._meta.get('source')
+        if not len(ids) or not source or not os.path.isfile(source):
+            return []
+        with self._source_lock:
+            if self._source is None:
+                self._source = thread_pool('manifest_source', workers=1).submit(self._read_source, source)
+            future = self._source
+        if callback is not None:
+            future.add_done_callback(lambda future: callback())
+        return ids
+
+    def _read_source(self, source):
+        self.__log.debug(f"reading props from {source}")
+        try:
+            return Dataset(source).read()
+        except Exception as e:
+            self.__log.debug(f"cannot read {source}: {e}")
+            return None
+
+    def source_viz(self, id):
+        # Visualization of the sequence file, None until read_props() read it
+        with self._source_lock:
+            future = self._source
+        if future is None or not future.done():
+            return None
+        source = future.result()
+        if source is None or id not in source.viz.ids():
+            return None
+        return source.viz[id]
+
+    def __len__(self):
+        return len(self.seq)
+
+    def prefetch(self, index, count=frame_prefetch_count):
+        # Reads the files of the next frames in the background. Prefetches
+        # for the previous index that did not start yet are dropped.
+        types = {viz.id(): viz.type() for viz in self.viz}
+        prefetched = set()
+        for next_index in range(index + 1, min(len(self.seq), index + 1 + count)):
+            for viz, path in self.query_all('SELECT viz, path FROM refs WHERE idx = ? AND path IS NOT NULL', (next_index,)):
+                type = types.get(viz)
+                if type is None or type == 'text':
+                    continue
+                frame_cache().prefetch(path, lambda type=type, path=path: read_frame(type, path))
+                prefetched.add(path)
+        frame_cache().cancel_prefetches(self._prefetched - prefetched)
+        self._prefetched = prefetched
+
+    def files(self):
+        # Scanned files of an indexed directory by path, with the type,
+        # shape, dtype and mtime read by the scan
+        files = {}
+        for path, type, shape, dtype, mtime in self.query_all('SELECT path, type, shape, dtype, mtime FROM files'):
+            files[path] = {
+                'path': path,
+                'type': type,
+                'shape': None if shape is None else tuple(int(x) for x in shape.split()),
+                'dtype': dtype,
+                'mtime': mtime,
+            }
+        return files
+
+    def up_to_date(self):
+        # A manifest is stale once its sequence file or indexed directory
+        # changes. Adding, removing or renaming files changes the directory
+        # mtime. Files rewritten in place are not checked here, since that
+        # would stat every file on each open. Frames are always read from
+        # the files, and "iviz index" rescans only the files whose mtime
+        # changed.
+        source = self._meta.get('source')
+        if not source:
+            return True
+        if not os.path.exists(source):
+            return False
+        return str(os.path.getmtime(source)) == self._meta.get('source_mtime')
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+
+### --------------------------------------------- ###
+### Part of iViz                                  ###
+### (C) 2022 Eddy ilg (me@eddy-ilg.net)           ###
+### Creative Commons                              ###
+### Attribution-NonCommercial-NoDerivatives       ###
+### 4.0 International License.                    ###
+### Commercial use an redistribution prohibited.  ###
+### See https://github.com/eddy-ilg/iviz          ###
+### --------------------------------------------- ###
+
+import threading
+import numpy as np
+from itypes import TraceLogger
+from PyQt5.QtCore import QObject, QRect, QPoint, pyqtSignal
+from PyQt5.QtGui import QImageReader
+from ..utils import thread_pool, qimage_to_numpy
+from ..resources import probe_chunk_size
+from .frame_cache import frame_cache
+from .manifest import viz_type, read_frame
+
+
+_channel_names = {
+    'image': ['r', 'g', 'b', 'a'],
+    'flow': ['u', 'v'],
+}
+
+
+def channel_names(type, count):
+    names = _channel_names.get(type, [])
+    if count == 1:
+        return ['value']
+    if count <= len(names):
+        return names[:count]
+    return [str(i) for i in range(count)]
+
+
+def region_mean(data, region):
+    # Mean of each channel over the region (x, y, width, height), ignoring
+    # non-finite values. None if the region is outside of the array.
+    x, y, width, height = region
+    if data is None or x < 0 or y < 0 or x + width > data.shape[1] or y + height > data.shape[0]:
+        return None
+    values = np.asarray(data[y:y + height, x:x + width], dtype=np.float64)
+    values = values.reshape(width * height, -1)
+    finite = np.isfinite(values)
+    count = finite.sum(axis=0)
+    total = np.where(finite, values, 0).sum(axis=0)
+    return np.divide(total, count, out=np.full(total.shape, np.nan), where=count > 0)
+
+
+class TemporalProbe(QObject):
+    # Values of a pixel (or the mean over a small region) of one
+    # visualization across all items of a sequence, extracted on a thread
+    # pool in chunks of consecutive items. Only the region is read where
+    # possible: numpy files are memory mapped and JPEGs are decoded only up
+    # to the last row of the region. Frames in the frame cache are used as
+    # they are, other files are decoded in parallel without being cached.
+
+    values_changed = pyqtSignal()
+    finished = pyqtSignal()
+    _chunk_done = pyqtSignal(int, int, object)
+
+    def __init__(self, dataset, index, viz_id, region, pool='probe'):
+        self.__log = TraceLogger()
+        super().__init__()
+        self._ds = dataset
+        self._seq = index
+        self._viz_id = viz_id
+        self._type = viz_type(dataset.viz[viz_id])
+        self._region = QRect(region)
+        self._pool = pool
+        self._lock = threading.Lock()
+        self._cancelled = False
+        self._values = None
+        self._done = 0
+        self._chunk_done.connect(self._store_chunk)
+
+    def viz_id(self): return self._viz_id
+    def type(self): return self._type
+    def region(self): return QRect(self._region)
+    def values(self): return self._values
+    def done(self): return self._done
+    def total(self): return len(self._seq)
+    def complete(self): return self._done >= len(self._seq)
+
+    def channel_names(self):
+        if self._values is None:
+            return []
+        return channel_names(self._type, self._values.shape[1])
+
+    def start(self):
+        self.__log.debug(f"probing {self._viz_id} at {self._region} over {len(self._seq)} items")
+
+        # The paths of a manifest are read in a single query, other datasets
+        # are queried for each item on the worker threads
+        viz = self._ds.viz[self._viz_id]
+        paths = viz.paths() if hasattr(viz, 'paths') else None
+
+        pool = thread_pool(self._pool)
+        for first in range(0, len(self._seq), probe_chunk_size):
+            last = min(len(self._seq), first + probe_chunk_size)
+            pool.submit(self._run, first, last, paths)
+
+    def cancel(self):
+        with self._lock:
+            self._cancelled = True
+
+    def cancelled(self):
+        with self._lock:
+            return self._cancelled
+
+    def _run(self, first, last, paths):
+        values = {}
+        for index in range(first, last):
+            if self.cancelled():
+                return
+            try:
+                if paths is not None:
+                    path = paths.get(index)
+                    value = None if path is None else self._read_path(path)
+                else:
+                    value = self._read_item(index)
+            except Exception as e:
+                self.__log.debug(f"cannot probe item {index}: {e}")
+                value = None
+            if value is not None:
+                values[index] = value
+        self._chunk_done.emit(first, last, values)
+
+    def _bounds(self):
+        r = self._region
+        return r.x(), r.y(), r.width(), r.height()
+
+    def _read_item(self, index):
+        group_id = self._seq.group_id(self._seq.group(index))
+        item_id = self._seq.item_id(index)
+        data = self._ds.viz[self._viz_id].data(group_id, item_id)
+        if data is None:
+            return None
+        variable = getattr(data, self._type)()
+        file = variable.file()
+        if file is not None:
+            return self._read_path(str(file))
+        return region_mean(variable.numpy(), self._bounds())
+
+    def _read_path(self, path):
+        bounds = self._bounds()
+
+        cached = frame_cache().peek(path)
+        if cached is not None:
+            return region_mean(cached, bounds)
+
+        if path.endswith('.npy'):
+            return region_mean(np.load(path, mmap_mode='r'), bounds)
+
+        if self._type == 'image':
+            reader = QImageReader(path)
+            if reader.canRead() and bytes(reader.format()) in (b'jpeg', b'jpg'):
+                if not QRect(QPoint(0, 0), reader.size()).contains(self._region):
+                    return None
+                reader.setClipRect(self._region)
+                image = reader.read()
+                if not image.isNull():
+                    return region_mean(qimage_to_numpy(image, keep_grayscale=True), (0, 0, image.width(), image.height()))
+
+        return region_mean(read_frame(self._type, path), bounds)
+
+    def _store_chunk(self, first, last, values):
+        if self.cancelled():
+            return
+        if len(values) and self._values is None:
+            channels = len(next(iter(values.values())))
+            self._values = np.full((len(self._seq), channels), np.nan)
+        for index, value in values.items():
+            if len(value) == self._values.shape[1]:
+                self._values[index] = value
+        self._done += last - first
+        self.values_changed.emit()
+        if self._done >= len(self._seq):
+            self.__log.debug(f"probe of {self._viz_id} finished")
+            self.finished.emit()
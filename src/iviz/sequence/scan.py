@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+
+### --------------------------------------------- ###
+### Part of iViz                                  ###
+### (C) 2022 Eddy ilg (me@eddy-ilg.net)           ###
+### Creative Commons                              ###
+### Attribution-NonCommercial-NoDerivatives       ###
+### 4.0 International License.                    ###
+### Commercial use an redistribution prohibited.  ###
+### See https://github.com/eddy-ilg/iviz          ###
+### --------------------------------------------- ###
+
+import os
+import re
+import struct
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from itypes import TraceLogger
+from .manifest import _write, manifest_file_name, ManifestDataset
+
+file_types = {
+    "image":  ["png", "exr", "jpg", "tif"],
+    "flow": ["flo"],
+    "float": ["blob", "np", "npz", "npy"],
+}
+
+_extension_types = {ext: type for type, exts in file_types.items() for ext in exts}
+
+# Single channel 8 bit images are label maps if their name says so, integer
+# numpy arrays always are
+_label_names = re.compile(r'label|seg|mask|instance|class', re.IGNORECASE)
+_frame_number = re.compile(r'^(.*?)(\d+)$')
+
+
+def _image_header(path):
+    from PyQt5.QtGui import QImageReader, QImage
+    reader = QImageReader(path)
+    size = reader.size()
+    if not size.isValid():
+        return None, None
+    format = reader.imageFormat()
+    shape = (size.height(), size.width())
+    if format == QImage.Format_Grayscale16:
+        return shape + (1,), 'uint16'
+    if format == QImage.Format_RGBA64:
+        return shape + (4,), 'uint16'
+    if format in (QImage.Format_Grayscale8, QImage.Format_Indexed8, QImage.Format_Mono):
+        return shape + (1,), 'uint8'
+    if format in (QImage.Format_ARGB32, QImage.Format_RGBA8888):
+        return shape + (4,), 'uint8'
+    return shape + (3,), 'uint8'
+
+
+def _flo_header(path):
+    with open(path, 'rb') as f:
+        header = f.read(12)
+    if len(header) < 12:
+        return None, None
+    magic, width, height = struct.unpack('<fii', header)
+    if magic != 202021.25:
+        return None, None
+    return (height, width, 2), 'float32'
+
+
+def _npy_header(path):
+    with open(path, 'rb') as f:
+        version = np.lib.format.read_magic(f)
+        if version == (1, 0):
+            shape, fortran, dtype = np.lib.format.read_array_header_1_0(f)
+        else:
+            shape, fortran, dtype = np.lib.format.read_array_header_2_0(f)
+    return tuple(shape), str(dtype)
+
+
+def _is_label(path, ext, shape, dtype):
+    if shape is None or dtype is None:
+        return False
+    single_channel = len(shape) == 2 or (len(shape) == 3 and shape[2] == 1)
+    if not single_channel:
+        return False
+    if ext in ('npy', 'np'):
+        return np.issubdtype(np.dtype(dtype), np.integer)
+    return ext == 'png' and dtype == 'uint8' and _label_names.search(os.path.basename(path)) is not None
+
+
+def scan_file(path, mtime=None):
+    # Reads only the file header to determine shape and dtype. Formats
+    # without a cheap header are recorded without them.
+    ext = path.rsplit('.', 1)[-1].lower() if '.' in path else ''
+    type = _extension_types.get(ext)
+    if type is None:
+        return None
+    if mtime is None:
+        mtime = os.path.getmtime(path)
+
+    shape, dtype = None, None
+    try:
+        if ext in ('png', 'jpg', 'tif'):
+            shape, dtype = _image_header(path)
+        elif ext == 'flo':
+            shape, dtype = _flo_header(path)
+        elif ext in ('npy', 'np'):
+            shape, dtype = _npy_header(path)
+    except (OSError, ValueError, struct.error):
+        pass
+
+    if _is_label(path, ext, shape, dtype):
+        type = 'label'
+
+    return {
+        'path': path,
+        'type': type,
+        'shape': shape,
+        'dtype': dtype,
+        'mtime': mtime,
+    }
+
+
+def _sequence_key(path):
+    # Files named like "<prefix><number>.<ext>" form a sequence, all other
+    # files are shown as a single cell for every item
+    name = os.path.basename(path)
+    stem, ext = name.rsplit('.', 1) if '.' in name else (name, '')
+    match = _frame_number.match(stem)
+    if match is None:
+        return name, None
+    return f'{match.group(1)}*.{ext}', int(match.group(2))
+
+
+def _scan_entry(path, mtime, known):
+    # Files with the mtime of a previous scan keep its record
+    file = known.get(path)
+    if file is not None and file['mtime'] == mtime:
+        return file
+    return scan_file(path, mtime)
+
+
+def _known_files(file):
+    # Records of the previous scan, if there is a readable manifest
+    if not os.path.exists(file):
+        return {}
+    try:
+        return ManifestDataset(file).files()
+    except Exception as e:
+        TraceLogger().debug(f"not reusing scan of {file}: {e}")
+        return {}
+
+
+def scan_directory(path, workers=None, known=None):
+    known = {} if known is None else known
+    entries = [(entry.path, entry.stat().st_mtime) for entry in os.scandir(path) if entry.is_file()]
+    entries.sort()
+    if workers is None:
+        workers = min(32, (os.cpu_count() or 1) * 4)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        files = pool.map(lambda entry: _scan_entry(*entry, known), entries, chunksize=64)
+        return [file for file in files if file is not None]
+
+
+def group_sequences(files):
+    sequences = {}
+    for file in files:
+        key, number = _sequence_key(file['path'])
+        if key not in sequences:
+            sequences[key] = {'type': file['type'], 'frames': {}}
+        sequences[key]['frames'][number] = file
+
+    # A directory of unrelated files stays a single item, matching how
+    # directories are shown without a manifest
+    numbers = sorted({n for seq in sequences.values() for n in seq['frames'] if n is not None})
+    if len(numbers) <= 1:
+        numbers = [None]
+    return sequences, numbers
+
+
+def index_directory(path, cols=5, workers=None, file=None):
+    log = TraceLogger()
+    path = os.path.abspath(str(path))
+    if file is None:
+        file = os.path.join(path, manifest_file_name)
+    known = _known_files(str(file))
+    files = scan_directory(path, workers, known)
+    if not len(files):
+        raise Exception(f"no supported files found in \"{path}\"")
+    sequences, numbers = group_sequences(files)
+    reused = sum(1 for f in files if known.get(f['path']) is f)
+    log.debug(f"found {len(files)} files ({reused} unchanged) in {len(sequences)} sequences with {len(numbers)} items")
+
+    vizs = []
+    for position, (key, seq) in enumerate(sequences.items()):
+        vizs.append((position, key, seq['type'], position % cols, position // cols, 1, 1, key, None, 0))
+
+    group = os.path.basename(path)
+    groups = [(0, group, group, 0, len(numbers))]
+    items = [(index, 0, index, str(n if n is not None else 0), str(n if n is not None else group)) for index, n in enumerate(numbers)]
+
+    refs = []
+    for index, n in enumerate(numbers):
+        for key, seq in sequences.items():
+            frames = seq['frames']
+            if n is None:
+                frame = next(iter(frames.values()))
+            else:
+                frame = frames.get(n, frames.get(None))
+            if frame is not None:
+                refs.append((index, key, frame['path'], None))
+
+    records = [(
+        f['path'], f['type'],
+        None if f['shape'] is None else ' '.join(str(x) for x in f['shape']),
+        f['dtype'], f['mtime']
+    ) for f in files]
+
+    return _write(file, vizs, groups, items, refs, source=path, files=records)
@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+
+### --------------------------------------------- ###
+### Part of iViz                                  ###
+### (C) 2022 Eddy ilg (me@eddy-ilg.net)           ###
+### Creative Commons                              ###
+### Attribution-NonCommercial-NoDerivatives       ###
+### 4.0 International License.                    ###
+### Commercial use an redistribution prohibited.  ###
+### See https://github.com/eddy-ilg/iviz          ###
+### --------------------------------------------- ###
+
+import os
+import hashlib
+import threading
+import numpy as np
+from collections import OrderedDict
+from itypes import TraceLogger
+from PyQt5.QtCore import QObject, pyqtSignal
+from ..utils import thread_pool, disk_cache
+from ..resources import track_chunk_size
+from .frame_cache import frame_cache
+from .manifest import viz_type, read_frame
+
+
+def _magnitude(data):
+    # Length of the vectors of a flow (or of the first two channels), the
+    # absolute value otherwise
+    if data.ndim == 3 and data.shape[2] >= 2:
+        return np.hypot(data[:, :, 0], data[:, :, 1])
+    return np.abs(data)
+
+
+def _finite(data):
+    data = np.asarray(data)
+    if np.issubdtype(data.dtype, np.inexact):
+        return data[np.isfinite(data)]
+    return data.ravel()
+
+
+def _reduce(reduce, magnitude=False):
+    def statistic(data):
+        values = _finite(_magnitude(data) if magnitude else data)
+        return float(reduce(values)) if len(values) else np.nan
+    return statistic
+
+
+def _nan_fraction(data):
+    data = np.asarray(data)
+    if not data.size or not np.issubdtype(data.dtype, np.inexact):
+        return 0.0
+    return float(np.count_nonzero(~np.isfinite(data)) / data.size)
+
+
+frame_statistics = OrderedDict([
+    ('mean', _reduce(np.mean)),
+    ('min', _reduce(np.min)),
+    ('max', _reduce(np.max)),
+    ('std', _reduce(np.std)),
+    ('mean magnitude', _reduce(np.mean, magnitude=True)),
+    ('max magnitude', _reduce(np.max, magnitude=True)),
+    ('nan fraction', _nan_fraction),
+])
+
+
+def statistic_names():
+    return list(frame_statistics.keys())
+
+
+class _Job:
+    # Statistics of one visualization computed in one pass over the frames
+    def __init__(self, viz_id, statistics, key=None):
+        self.viz_id = viz_id
+        self.statistics = list(statistics)
+        self.key = key
+        self.remaining = 0
+        self.cancelled = False
+        self.failed = False
+
+
+class ScalarTracks(QObject):
+    # Per frame statistics of visualizations over the whole sequence, like
+    # the mean depth or the largest flow magnitude, for spotting outlier
+    # frames. Each frame is read once for all statistics of its
+    # visualization, chunks of frames are processed on a thread pool.
+    # Finished tracks are stored in the on disk cache, keyed by the files
+    # of the frames and their mtimes. The key is computed on the pool too,
+    # since it resolves and stats every frame.
+
+    values_changed = pyqtSignal()
+    tracks_changed = pyqtSignal()
+    _cache_checked = pyqtSignal(object, object)
+    _chunk_done = pyqtSignal(object, int, int, object)
+
+    def __init__(self, dataset, index, pool='tracks'):
+        self.__log = TraceLogger()
+        super().__init__()
+        self._ds = dataset
+        self._seq = index
+        self._pool = pool
+        self._lock = threading.Lock()
+        self._tracks = OrderedDict()
+        self._done = {}
+        self._jobs = []
+        self._cache = disk_cache('tracks')
+        self._cache_checked.connect(self._apply_cached)
+        self._chunk_done.connect(self._store_chunk)
+
+    def tracks(self): return list(self._tracks.keys())
+    def values(self, track): return self._tracks.get(track)
+    def done(self, track): return self._done.get(track, 0)
+    def total(self): return len(self._seq)
+    def complete(self, track): return self.done(track) >= len(self._seq)
+
+    def viz_ids(self):
+        # Visualizations with arrays to compute statistics of
+        return [id for id in self._ds.viz.ids() if viz_type(self._ds.viz[id]) in ('image', 'flow', 'float', 'label')]
+
+    def _frame_files(self, viz_id):
+        # File of each item, None for items without data. None if an item
+        # has data without a file.
+        viz = self._ds.viz[viz_id]
+        if hasattr(viz, 'paths'):
+            paths = viz.paths()
+            return [paths.get(index) for index in range(len(self._seq))]
+
+        type = viz_type(viz)
+        files = []
+        for index in range(len(self._seq)):
+            data = viz.data(self._seq.group_id(self._seq.group(index)), self._seq.item_id(index))
+            file = None if data is None else getattr(data, type)().file()
+            if data is not None and file is None:
+                return None
+            files.append(None if file is None else str(file))
+        return files
+
+    def _files_key(self, viz_id):
+        # Changes when a frame file is rewritten, None if there are frames
+        # without a file to key on
+        files = self._frame_files(viz_id)
+        if files is None:
+            return None
+        digest = hashlib.sha1()
+        for path in files:
+            try:
+                digest.update(b'-\n' if path is None else f'{path}:{os.path.getmtime(path)}\n'.encode())
+            except OSError:
+                return None
+        return digest.hexdigest()
+
+    def _key(self, files_key, track):
+        if files_key is None:
+            return None
+        return ':'.join([files_key, *track, str(len(self._seq))])
+
+    def add_track(self, viz_id, statistic):
+        self.add_tracks([(viz_id, statistic)])
+
+    def add_tracks(self, tracks):
+        # Tracks are looked up in the cache and those that are not cached
+        # are computed together, one pass per visualization
+        jobs = OrderedDict()
+        for track in tracks:
+            viz_id, statistic = track
+            if track in self._tracks:
+                continue
+            if viz_id not in self._ds.viz:
+                raise Exception(f"unknown visualization \"{viz_id}\"")
+            if statistic not in frame_statistics:
+                raise Exception(f"unknown statistic \"{statistic}\", available are {', '.join(statistic_names())}")
+
+            self._tracks[track] = np.full(len(self._seq), np.nan)
+            self._done[track] = 0
+            jobs.setdefault(viz_id, _Job(viz_id, [])).statistics.append(statistic)
+
+        pool = thread_pool(self._pool)
+        for job in jobs.values():
+            with self._lock:
+                self._jobs.append(job)
+            pool.submit(self._lookup, job)
+        self.tracks_changed.emit()
+
+    def _lookup(self, job):
+        try:
+            key = self._files_key(job.viz_id)
+        except Exception as e:
+            self.__log.debug(f"cannot key the frames of {job.viz_id}: {e}")
+            key = None
+        with self._lock:
+            statistics = list(job.statistics)
+        cached = {}
+        for statistic in statistics:
+            values = self._cache.get_array(self._key(key, (job.viz_id, statistic)))
+            if values is not None and len(values) == len(self._seq):
+                cached[statistic] = values
+        job.key = key
+        self._cache_checked.emit(job, cached)
+
+    def _apply_cached(self, job, cached):
+        with self._lock:
+            for statistic in cached:
+                if statistic in job.statistics:
+                    job.statistics.remove(statistic)
+            start = len(job.statistics) and not job.cancelled
+            if not start:
+                self._jobs.remove(job)
+
+        for statistic, values in cached.items():
+            track = (job.viz_id, statistic)
+            if track in self._tracks:
+                self._tracks[track] = values
+                self._done[track] = len(self._seq)
+        if start:
+            self._start(job)
+        self.values_changed.emit()
+
+    def remove_track(self, viz_id, statistic):
+        track = (viz_id, statistic)
+        if track not in self._tracks:
+            return
+        del self._tracks[track]
+        del self._done[track]
+        with self._lock:
+            for job in self._jobs:
+                if job.viz_id == viz_id and statistic in job.statistics:
+                    job.statistics.remove(statistic)
+                    job.cancelled = not len(job.statistics)
+        self.tracks_changed.emit()
+
+    def clear(self):
+        for viz_id, statistic in self.tracks():
+            self.remove_track(viz_id, statistic)
+
+    def _start(self, job):
+        self.__log.debug(f"computing {job.statistics} of {job.viz_id} over {len(self._seq)} items")
+        viz = self._ds.viz[job.viz_id]
+        paths = viz.paths() if hasattr(viz, 'paths') else None
+        type = viz_type(viz)
+
+        pool = thread_pool(self._pool)
+        with self._lock:
+            job.remaining = (len(self._seq) + track_chunk_size - 1) // track_chunk_size
+        for first in range(0, len(self._seq), track_chunk_size):
+            last = min(len(self._seq), first + track_chunk_size)
+            pool.submit(self._run, job, type, first, last, paths)
+
+    def _frame(self, job, type, index, paths):
+        if paths is not None:
+            path = paths.get(index)
+            if path is None:
+                return None
+        else:
+            group_id = self._seq.group_id(self._seq.group(index))
+            data = self._ds.viz[job.viz_id].data(group_id, self._seq.item_id(index))
+            if data is None:
+                return None
+            variable = getattr(data, type)()
+            file = variable.file()
+            if file is None:
+                return variable.numpy()
+            path = str(file)
+
+        # Frames are not added to the frame cache, a pass over the sequence
+        # would only evict the ones being viewed
+        cached = frame_cache().peek(path)
+        if cached is not None:
+            return cached
+        if path.endswith('.npy'):
+            return np.load(path, mmap_mode='r')
+        return read_frame(type, path)
+
+    def _run(self, job, type, first, last, paths):
+        values = {}
+        for index in range(first, last):
+            with self._lock:
+                if job.cancelled:
+                    break
+                statistics = list(job.statistics)
+            try:
+                data = self._frame(job, type, index, paths)
+            except Exception as e:
+                self.__log.debug(f"cannot read item {index} of {job.viz_id}: {e}")
+                with self._lock:
+                    job.failed = True
+                continue
+            if data is None:
+                continue
+            for statistic in statistics:
+                values.setdefault(statistic, {})[index] = frame_statistics[statistic](data)
+        self._chunk_done.emit(job, first, last, values)
+
+    def _store_chunk(self, job, first, last, values):
+        with self._lock:
+            job.remaining -= 1
+            finished = job.remaining == 0
+            if finished:
+                self._jobs.remove(job)
+            statistics = list(job.statistics)
+            failed = job.failed
+
+        for statistic in statistics:
+            track = (job.viz_id, statistic)
+            if track not in self._tracks:
+                continue
+            for index, value in values.get(statistic, {}).items():
+                self._tracks[track][index] = value
+            self._done[track] += last - first
+            # Tracks with frames that could not be read are not stored, so
+            # that they are computed again next time
+            if finished and not failed:
+                self.__log.debug(f"track {track} finished")
+                self._cache.put_array(self._key(job.key, track), self._tracks[track])
+        self.values_changed.emit()
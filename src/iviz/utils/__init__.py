@@ -15,5 +15,24 @@ from .debug import print_qtransform
 from .conversion import to_qimage
 from .conversion import to_qpixmap
 from .conversion import qpixmap_to_numpy
+from .conversion import qimage_to_numpy
 
 from .helper import clamp
+
+from .region_stats import RegionStatistics
+from .region_stats import region_statistics
+from .region_stats import region_query
+from .region_stats import region_statistics_memory
+from .region_stats import release_region_statistics
+
+from .line_profile import LineSampler
+from .line_profile import line_sampler
+
+from .parallel import thread_pool
+from .parallel import process_rows
+
+from .buffer_pool import BufferPool
+
+from .disk_cache import DiskCache
+from .disk_cache import disk_cache
+from .disk_cache import file_key
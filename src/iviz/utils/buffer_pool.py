@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+
+### --------------------------------------------- ###
+### Part of iViz                                  ###
+### (C) 2022 Eddy ilg (me@eddy-ilg.net)           ###
+### Creative Commons                              ###
+### Attribution-NonCommercial-NoDerivatives       ###
+### 4.0 International License.                    ###
+### Commercial use an redistribution prohibited.  ###
+### See https://github.com/eddy-ilg/iviz          ###
+### --------------------------------------------- ###
+
+import threading
+import weakref
+import numpy as np
+from collections import OrderedDict
+
+
+class BufferPool:
+    # Hands out arrays by shape and dtype and takes them back once they are
+    # no longer used, so that rendering the same kind of data over and over
+    # does not allocate. Only arrays acquired from the pool are taken back.
+    # The least recently used shapes are dropped beyond max_shapes.
+
+    def __init__(self, max_per_shape=2, max_shapes=4):
+        self._max_per_shape = max_per_shape
+        self._max_shapes = max_shapes
+        self._free = OrderedDict()
+        self._issued = {}
+        self._lock = threading.Lock()
+
+    def _key(self, shape, dtype):
+        return tuple(shape), np.dtype(dtype).str
+
+    def acquire(self, shape, dtype=np.uint8):
+        key = self._key(shape, dtype)
+        with self._lock:
+            free = self._free.get(key)
+            if free:
+                self._free.move_to_end(key)
+                array = free.pop()
+            else:
+                array = np.empty(shape, dtype=dtype)
+            self._issued[id(array)] = weakref.ref(array)
+        return array
+
+    def release(self, array):
+        if array is None:
+            return
+        with self._lock:
+            ref = self._issued.get(id(array))
+            if ref is None or ref() is not array:
+                return
+            del self._issued[id(array)]
+
+            key = self._key(array.shape, array.dtype)
+            free = self._free.setdefault(key, [])
+            self._free.move_to_end(key)
+            if len(free) < self._max_per_shape:
+                free.append(array)
+            while len(self._free) > self._max_shapes:
+                self._free.popitem(last=False)
+
+            # Forget arrays that were dropped without being released
+            for stale in [id for id, ref in self._issued.items() if ref() is None]:
+                del self._issued[stale]
+
+    def memory(self):
+        # Bytes held by spare arrays
+        with self._lock:
+            return sum(array.nbytes for free in self._free.values() for array in free)
+
+    def clear(self):
+        with self._lock:
+            self._free.clear()
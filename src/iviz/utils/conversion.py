@@ -16,28 +16,23 @@ from PyQt5.QtGui import QImage, qRgb, QPixmap
 
 gray_color_table = [qRgb(i, i, i) for i in range(256)]
 
-def to_qimage(data, copy=True):
-    if data is None:
-        return QImage()
-
-    data = data.copy()
-
+def _wrap_qimage(data):
     if data.dtype == np.uint8:
         if len(data.shape) == 2:
             qim = QImage(data.data, data.shape[1], data.shape[0], data.strides[0], QImage.Format_Indexed8)
             qim.setColorTable(gray_color_table)
-            return qim.copy() if copy else qim
+            return qim, False
 
         elif len(data.shape) == 3:
             if data.shape[2] == 1:
                 qim = QImage(data.data, data.shape[1], data.shape[0], data.strides[0], QImage.Format_Grayscale8)
-                return qim.copy() if copy else qim
+                return qim, False
             if data.shape[2] == 3:
                 qim = QImage(data.data, data.shape[1], data.shape[0], data.strides[0], QImage.Format_RGB888)
-                return qim.copy() if copy else qim
+                return qim, False
             elif data.shape[2] == 4:
                 qim = QImage(data.data, data.shape[1], data.shape[0], data.strides[0], QImage.Format_ARGB32)
-                return qim.copy() if copy else qim
+                return qim, False
             else:
                 raise Exception("Conversion of %d channel array to QImage not implemented" % data.shape[2])
 
@@ -46,7 +41,7 @@ def to_qimage(data, copy=True):
             if len(data.shape) == 3:
                 data = data[:, :, 0]
             qim = QImage(data, data.shape[1], data.shape[0], data.strides[0], QImage.Format_Grayscale16)
-            return qim.copy() if copy else qim
+            return qim, False
         else:
             if len(data.shape) == 3:
                 raise Exception("Conversion of %d channel array to QImage not implemented" % data.shape[2])
@@ -56,19 +51,44 @@ def to_qimage(data, copy=True):
     elif data.dtype == np.float32:
         if len(data.shape) == 3:
             data = (data * 255).astype(np.uint8)
-            return to_qimage(data)
+            return to_qimage(data), True
         elif len(data.shape) == 2:
             data = (data * 65535).astype(np.uint8)
-            return to_qimage(data)
+            return to_qimage(data), True
         else:
             raise Exception(f"Invalid shape for float32 image: {data.shape}")
 
     raise Exception("Conversion of %d dimension array to QImage not implemented" % len(data.shape))
 
+def to_qimage(data, copy=True, buffers=None):
+    # Without copy the QImage references the array, which then has to stay
+    # alive and unchanged as long as the QImage is used. Non contiguous
+    # arrays are made contiguous in a buffer from the given pool and always
+    # copied.
+    if data is None:
+        return QImage()
+
+    contiguous = data
+    if not data.flags.c_contiguous:
+        if buffers is None:
+            contiguous = np.ascontiguousarray(data)
+        else:
+            contiguous = buffers.acquire(data.shape, data.dtype)
+            np.copyto(contiguous, data)
+        copy = True
+
+    qim, copied = _wrap_qimage(contiguous)
+    if copy and not copied:
+        qim = qim.copy()
+
+    if contiguous is not data and buffers is not None:
+        buffers.release(contiguous)
+    return qim
+
 def to_qpixmap(data):
     if data is None: return QPixmap()
     elif isinstance(data, QPixmap):  return data
-    elif isinstance(data, QImage):  QPixmap.fromImage(data)
+    elif isinstance(data, QImage):  return QPixmap.fromImage(data)
     elif hasattr(data, 'pixmap'): return data.pixmap()
     else: return QPixmap.fromImage(to_qimage(data))
 
@@ -83,3 +103,17 @@ def qpixmap_to_numpy(pixmap):
     ptr.setsize(height * width * 4)
     arr = np.frombuffer(ptr, np.uint8).reshape((height, width, 4))
     return arr[:, :, 0:3][:,:,::-1].copy()
+
+def qimage_to_numpy(image, keep_grayscale=False):
+    # RGB array of a QImage, grayscale images give a single channel if
+    # keep_grayscale is set
+    if keep_grayscale and image.isGrayscale():
+        image = image.convertToFormat(QImage.Format_Grayscale8)
+        channels = 1
+    else:
+        image = image.convertToFormat(QImage.Format_RGB888)
+        channels = 3
+    ptr = image.bits()
+    ptr.setsize(image.bytesPerLine() * image.height())
+    rows = np.frombuffer(ptr, np.uint8).reshape(image.height(), image.bytesPerLine())
+    return rows[:, :image.width() * channels].reshape(image.height(), image.width(), channels).copy()
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+
+### --------------------------------------------- ###
+### Part of iViz                                  ###
+### (C) 2022 Eddy ilg (me@eddy-ilg.net)           ###
+### Creative Commons                              ###
+### Attribution-NonCommercial-NoDerivatives       ###
+### 4.0 International License.                    ###
+### Commercial use an redistribution prohibited.  ###
+### See https://github.com/eddy-ilg/iviz          ###
+### --------------------------------------------- ###
+
+import os
+import hashlib
+import threading
+import numpy as np
+from PyQt5.QtGui import QImage
+from ..resources import cache_root, disk_cache_max_bytes
+
+
+def file_key(file, *params):
+    # Key for data derived from a file, changes when the file is modified.
+    # None if there is no file to key on.
+    if file is None or not os.path.isfile(str(file)):
+        return None
+    path = os.path.abspath(str(file))
+    return ':'.join([path, str(os.path.getmtime(path))] + [str(param) for param in params])
+
+
+class DiskCache:
+    # Images stored as PNG files (and arrays as numpy files) in a directory,
+    # named by the hash of their key. Reading an entry refreshes its
+    # modification time, once the directory grows beyond max_bytes the
+    # least recently used entries are removed until it is down to the low
+    # water mark. Safe to use from several threads.
+
+    def __init__(self, path, max_bytes=disk_cache_max_bytes, low_water=0.8):
+        self._path = str(path)
+        self._max_bytes = max_bytes
+        self._low_water = low_water
+        self._lock = threading.Lock()
+        self._size = None
+
+    def path(self): return self._path
+    def max_bytes(self): return self._max_bytes
+
+    def _file(self, key, extension='.png'):
+        return os.path.join(self._path, hashlib.sha1(key.encode()).hexdigest() + extension)
+
+    def contains(self, key, extension='.png'):
+        return key is not None and os.path.exists(self._file(key, extension))
+
+    def _touch(self, file):
+        try:
+            os.utime(file)
+        except OSError:
+            pass
+
+    def get_image(self, key):
+        if key is None:
+            return None
+        file = self._file(key)
+        if not os.path.exists(file):
+            return None
+        image = QImage(file)
+        if image.isNull():
+            return None
+        self._touch(file)
+        return image
+
+    def get_array(self, key):
+        if key is None:
+            return None
+        file = self._file(key, '.npy')
+        if not os.path.exists(file):
+            return None
+        try:
+            array = np.load(file)
+        except (OSError, ValueError):
+            return None
+        self._touch(file)
+        return array
+
+    def put_image(self, key, image):
+        if key is None or image is None or image.isNull():
+            return False
+        os.makedirs(self._path, exist_ok=True)
+
+        file = self._file(key)
+        return self._store(file, lambda tmp: image.save(tmp, 'PNG'))
+
+    def put_array(self, key, array):
+        if key is None or array is None:
+            return False
+        os.makedirs(self._path, exist_ok=True)
+
+        def save(tmp):
+            with open(tmp, 'wb') as f:
+                np.save(f, array)
+            return True
+        return self._store(self._file(key, '.npy'), save)
+
+    def _store(self, file, save):
+        # Written under a temporary name and moved into place, so readers
+        # never see partial files
+        tmp = f'{file}.{threading.get_ident()}.tmp'
+        if not save(tmp):
+            return False
+        os.replace(tmp, file)
+
+        with self._lock:
+            if self._size is None:
+                self._size = self._scan_size()
+            else:
+                self._size += os.path.getsize(file)
+            if self._size > self._max_bytes:
+                self._trim()
+        return True
+
+    def _entries(self):
+        entries = []
+        with os.scandir(self._path) as it:
+            for entry in it:
+                if entry.name.endswith(('.png', '.npy')):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def _scan_size(self):
+        return sum(size for _, size, _ in self._entries())
+
+    def _trim(self):
+        entries = sorted(self._entries())
+        size = sum(size for _, size, _ in entries)
+        for _, entry_size, file in entries:
+            if size <= self._max_bytes * self._low_water:
+                break
+            try:
+                os.remove(file)
+                size -= entry_size
+            except OSError:
+                pass
+        self._size = size
+
+    def clear(self):
+        with self._lock:
+            if os.path.isdir(self._path):
+                for _, _, file in self._entries():
+                    os.remove(file)
+            self._size = 0
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def disk_cache(name):
+    # Caches are shared by name, each in its own directory under the cache
+    # root
+    with _caches_lock:
+        if name not in _caches:
+            _caches[name] = DiskCache(os.path.join(str(cache_root), name))
+        return _caches[name]
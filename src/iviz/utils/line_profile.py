@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+
+### --------------------------------------------- ###
+### Part of iViz                                  ###
+### (C) 2022 Eddy ilg (me@eddy-ilg.net)           ###
+### Creative Commons                              ###
+### Attribution-NonCommercial-NoDerivatives       ###
+### 4.0 International License.                    ###
+### Commercial use an redistribution prohibited.  ###
+### See https://github.com/eddy-ilg/iviz          ###
+### --------------------------------------------- ###
+
+import math
+import numpy as np
+from collections import OrderedDict
+
+
+class LineSampler:
+    # Bilinear sampling along a segment in image coordinates (pixel centers
+    # are at +0.5), about one sample per pixel of length. The indices and
+    # weights only depend on the segment and the image size, so they are
+    # computed once and applied to any array of that size as four gathers.
+    # Samples outside of the image are NaN.
+
+    def __init__(self, x1, y1, x2, y2, width, height):
+        self._shape = (height, width)
+        self._length = math.hypot(x2 - x1, y2 - y1)
+        count = max(2, int(math.ceil(self._length)) + 1)
+        t = np.linspace(0.0, 1.0, count)
+        xs = x1 + t * (x2 - x1) - 0.5
+        ys = y1 + t * (y2 - y1) - 0.5
+
+        self._valid = (xs >= -0.5) & (xs <= width - 0.5) & (ys >= -0.5) & (ys <= height - 0.5)
+        xs = np.clip(xs, 0, width - 1)
+        ys = np.clip(ys, 0, height - 1)
+        self._x0 = np.minimum(xs.astype(np.intp), max(0, width - 2))
+        self._y0 = np.minimum(ys.astype(np.intp), max(0, height - 2))
+        self._x1 = np.minimum(self._x0 + 1, width - 1)
+        self._y1 = np.minimum(self._y0 + 1, height - 1)
+        wx = (xs - self._x0)[:, None]
+        wy = (ys - self._y0)[:, None]
+        self._w00 = (1 - wx) * (1 - wy)
+        self._w01 = wx * (1 - wy)
+        self._w10 = (1 - wx) * wy
+        self._w11 = wx * wy
+
+    def length(self): return self._length
+    def count(self): return len(self._valid)
+    def shape(self): return self._shape
+
+    def sample(self, data):
+        # Values along the segment as (count, channels) float64
+        if data.ndim == 2:
+            data = data[:, :, None]
+        if data.shape[:2] != self._shape:
+            raise Exception(f"cannot sample array of shape {data.shape} with sampler for {self._shape}")
+        values = data[self._y0, self._x0] * self._w00
+        values += data[self._y0, self._x1] * self._w01
+        values += data[self._y1, self._x0] * self._w10
+        values += data[self._y1, self._x1] * self._w11
+        values[~self._valid] = np.nan
+        return values
+
+
+_cache = OrderedDict()
+_max_cached = 16
+
+
+def line_sampler(line, width, height):
+    # Samplers are shared between all displays with the same image size, so
+    # a line over several linked displays is set up once
+    key = (line.x1(), line.y1(), line.x2(), line.y2(), width, height)
+    sampler = _cache.get(key)
+    if sampler is not None:
+        _cache.move_to_end(key)
+        return sampler
+
+    sampler = LineSampler(*key)
+    _cache[key] = sampler
+    while len(_cache) > _max_cached:
+        _cache.popitem(last=False)
+    return sampler
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+
+### --------------------------------------------- ###
+### Part of iViz                                  ###
+### (C) 2022 Eddy ilg (me@eddy-ilg.net)           ###
+### Creative Commons                              ###
+### Attribution-NonCommercial-NoDerivatives       ###
+### 4.0 International License.                    ###
+### Commercial use an redistribution prohibited.  ###
+### See https://github.com/eddy-ilg/iviz          ###
+### --------------------------------------------- ###
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from ..resources import parallel_rows_min_pixels
+
+
+_pools = {}
+_lock = threading.Lock()
+
+
+def thread_pool(name='default', workers=None):
+    # Pools are shared by name for the lifetime of the application, so that
+    # submitting work does not pay for starting threads
+    with _lock:
+        if name not in _pools:
+            if workers is None:
+                workers = os.cpu_count() or 1
+            _pools[name] = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f'iviz-{name}')
+        return _pools[name]
+
+
+def process_rows(func, data, *outs, min_pixels=parallel_rows_min_pixels, min_rows=64, pool='rows'):
+    # Calls func(data[rows], *[out[rows] for out in outs]) for bands of rows
+    # on a thread pool, each band writing into its part of the preallocated
+    # outputs (or scratch buffers). Returns the first output. Arrays
+    # smaller than min_pixels are processed in one call on the calling
+    # thread. The pool must differ from the one the caller runs on.
+    height = data.shape[0]
+    width = data.shape[1] if data.ndim > 1 else 1
+    bands = min(os.cpu_count() or 1, height // min_rows)
+    if height * width < min_pixels or bands <= 1:
+        func(data, *outs)
+        return outs[0]
+
+    bounds = [height * i // bands for i in range(bands + 1)]
+    executor = thread_pool(pool)
+    futures = []
+    for y1, y2 in zip(bounds[:-1], bounds[1:]):
+        futures.append(executor.submit(func, data[y1:y2], *[out[y1:y2] for out in outs]))
+    for future in futures:
+        future.result()
+    return outs[0]
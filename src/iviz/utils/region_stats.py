@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+
+### --------------------------------------------- ###
+### Part of iViz                                  ###
+### (C) 2022 Eddy ilg (me@eddy-ilg.net)           ###
+### Creative Commons                              ###
+### Attribution-NonCommercial-NoDerivatives       ###
+### 4.0 International License.                    ###
+### Commercial use an redistribution prohibited.  ###
+### See https://github.com/eddy-ilg/iviz          ###
+### --------------------------------------------- ###
+
+import math
+import weakref
+import threading
+import numpy as np
+from collections import OrderedDict
+from itypes import Struct, TraceLogger
+from .parallel import thread_pool
+from ..resources import region_tables_min_queries
+
+
+def _integral(values):
+    # Summed-area table with a leading row and column of zeros, so that the
+    # sum over [y1:y2, x1:x2] is I[y2, x2] - I[y1, x2] - I[y2, x1] + I[y1, x1]
+    table = np.zeros((values.shape[0] + 1, values.shape[1] + 1), dtype=np.float64)
+    np.cumsum(values, axis=0, dtype=np.float64, out=table[1:, 1:])
+    np.cumsum(table[1:, 1:], axis=1, out=table[1:, 1:])
+    return table
+
+
+def _box(table, x1, y1, x2, y2):
+    return table[y2, x2] - table[y1, x2] - table[y2, x1] + table[y1, x1]
+
+
+def _blocks(values, block_size, reduce, fill):
+    height, width = values.shape
+    bh = math.ceil(height / block_size)
+    bw = math.ceil(width / block_size)
+    padded = np.full((bh * block_size, bw * block_size), fill, dtype=np.float64)
+    padded[:height, :width] = values
+    return reduce(padded.reshape(bh, block_size, bw, block_size), axis=(1, 3))
+
+
+def _hwc(data):
+    if data.ndim == 1:
+        return data[None, :, None]
+    if data.ndim == 2:
+        return data[:, :, None]
+    return data
+
+
+def _clip(shape, x1, y1, x2, y2):
+    height, width = shape[0], shape[1]
+    x1, x2 = max(0, x1), min(width, x2)
+    y1, y2 = max(0, y1), min(height, y2)
+    if x1 >= x2 or y1 >= y2:
+        return None
+    return x1, y1, x2, y2
+
+
+def _empty_stats():
+    stats = Struct()
+    stats.count = 0
+    stats.min = stats.max = stats.mean = stats.std = np.nan
+    return stats
+
+
+def region_query(data, x1, y1, x2, y2):
+    # Statistics of a rectangle of an array from a slice of it, the cost
+    # only depends on the size of the rectangle. Non-finite values are
+    # ignored.
+    data = _hwc(data)
+    bounds = _clip(data.shape, x1, y1, x2, y2)
+    if bounds is None:
+        return None
+    x1, y1, x2, y2 = bounds
+
+    region = data[y1:y2, x1:x2]
+    values = region[np.isfinite(region)] if np.issubdtype(data.dtype, np.inexact) else region.ravel()
+    if not len(values):
+        return _empty_stats()
+
+    stats = Struct()
+    stats.count = len(values)
+    stats.mean = float(values.mean(dtype=np.float64))
+    stats.std = float(values.std(dtype=np.float64))
+    stats.min = values.min()
+    stats.max = values.max()
+    return stats
+
+
+class RegionStatistics:
+    # Statistics over rectangles of a HWC array in constant (sum, mean, std)
+    # or near-constant (min, max) time. All channels of a pixel contribute,
+    # non-finite values are ignored. Values are summed relative to the mean
+    # of the array, so that the variance does not come from the difference
+    # of two large sums.
+
+    def __init__(self, data, block_size=16):
+        data = _hwc(data)
+
+        self._dtype = data.dtype
+        self._shape = data.shape
+        self._block_size = block_size
+
+        if np.issubdtype(data.dtype, np.inexact):
+            finite = np.isfinite(data)
+            self._shift = float(data[finite].mean(dtype=np.float64)) if finite.any() else 0.0
+            values = np.where(finite, data - self._shift, 0)
+            self._count = _integral(finite.sum(axis=2))
+            self._min = np.where(finite, data, np.inf).min(axis=2)
+            self._max = np.where(finite, data, -np.inf).max(axis=2)
+        else:
+            self._shift = float(data.mean(dtype=np.float64)) if data.size else 0.0
+            values = data - self._shift
+            self._count = _integral(np.full(data.shape[:2], data.shape[2]))
+            self._min = data.min(axis=2)
+            self._max = data.max(axis=2)
+
+        values = values.astype(np.float64, copy=False)
+        self._sum = _integral(values.sum(axis=2))
+        self._sum_sq = _integral(np.einsum('ijk,ijk->ij', values, values))
+
+        self._block_min = _blocks(self._min, block_size, np.min, np.inf)
+        self._block_max = _blocks(self._max, block_size, np.max, -np.inf)
+
+    def shape(self): return self._shape
+
+    def memory(self):
+        tables = [self._count, self._sum, self._sum_sq, self._min, self._max, self._block_min, self._block_max]
+        return sum(table.nbytes for table in tables)
+
+    def _range(self, x1, y1, x2, y2):
+        # Blocks fully inside the rectangle come from the block tables, the
+        # remaining border strips are reduced directly
+        b = self._block_size
+        bx1, by1 = -(-x1 // b), -(-y1 // b)
+        bx2, by2 = x2 // b, y2 // b
+        if bx1 >= bx2 or by1 >= by2:
+            return self._min[y1:y2, x1:x2].min(), self._max[y1:y2, x1:x2].max()
+
+        mins = [self._block_min[by1:by2, bx1:bx2].min()]
+        maxs = [self._block_max[by1:by2, bx1:bx2].max()]
+        strips = [
+            (slice(y1, by1 * b), slice(x1, x2)),
+            (slice(by2 * b, y2), slice(x1, x2)),
+            (slice(by1 * b, by2 * b), slice(x1, bx1 * b)),
+            (slice(by1 * b, by2 * b), slice(bx2 * b, x2)),
+        ]
+        for rows, cols in strips:
+            if rows.start < rows.stop and cols.start < cols.stop:
+                mins.append(self._min[rows, cols].min())
+                maxs.append(self._max[rows, cols].max())
+        return min(mins), max(maxs)
+
+    def query(self, x1, y1, x2, y2):
+        bounds = _clip(self._shape, x1, y1, x2, y2)
+        if bounds is None:
+            return None
+        x1, y1, x2, y2 = bounds
+
+        count = int(_box(self._count, x1, y1, x2, y2))
+        if count == 0:
+            return _empty_stats()
+
+        stats = Struct()
+        stats.count = count
+        shifted_mean = _box(self._sum, x1, y1, x2, y2) / count
+        stats.mean = shifted_mean + self._shift
+        stats.std = math.sqrt(max(0.0, _box(self._sum_sq, x1, y1, x2, y2) / count - shifted_mean ** 2))
+
+        min_value, max_value = self._range(x1, y1, x2, y2)
+        stats.min = self._dtype.type(min_value)
+        stats.max = self._dtype.type(max_value)
+        return stats
+
+
+class _ArrayStatistics:
+    # Region statistics of one array. Regions are sliced directly; once the
+    # array has been queried repeatedly (dragging a box over a frame) the
+    # tables are built on a background thread and answer the queries from
+    # then on. Frames that are queried once or twice while playing never
+    # pay for the tables.
+
+    def __init__(self, data, key):
+        self.__log = TraceLogger()
+        self._key = key
+        self._ref = weakref.ref(data, self._released)
+        self._queries = 0
+        self._tables = None
+        self._pending = False
+
+    def tables(self): return self._tables
+
+    def _released(self, ref):
+        _forget(self._key, self)
+
+    def memory(self):
+        tables = self._tables
+        return 0 if tables is None else tables.memory()
+
+    def release(self):
+        self._tables = None
+        self._queries = 0
+
+    def _build(self):
+        data = self._ref()
+        try:
+            if data is not None:
+                self._tables = RegionStatistics(data)
+        except Exception as e:
+            self.__log.debug(f"cannot build region statistics: {e}")
+        finally:
+            self._pending = False
+
+    def query(self, x1, y1, x2, y2):
+        tables = self._tables
+        if tables is not None:
+            return tables.query(x1, y1, x2, y2)
+        data = self._ref()
+        if data is None:
+            return None
+
+        self._queries += 1
+        if self._queries >= region_tables_min_queries and not self._pending:
+            self._pending = True
+            thread_pool('region_stats', workers=1).submit(self._build)
+        return region_query(data, x1, y1, x2, y2)
+
+
+_cache = OrderedDict()
+_max_cached = 8
+_lock = threading.Lock()
+
+
+def _forget(key, entry):
+    with _lock:
+        if _cache.get(key) is entry:
+            del _cache[key]
+
+
+def region_statistics_memory():
+    with _lock:
+        entries = list(_cache.values())
+    return sum(entry.memory() for entry in entries)
+
+
+def release_region_statistics(nbytes):
+    # Drops the tables of the least recently queried arrays until nbytes are
+    # freed, returns the bytes freed
+    with _lock:
+        entries = list(_cache.values())
+    freed = 0
+    for entry in entries:
+        if freed >= nbytes:
+            break
+        memory = entry.memory()
+        if memory > 0:
+            entry.release()
+            freed += memory
+    return freed
+
+
+def region_statistics(data):
+    # Statistics are shared between all displays showing the same array.
+    # Entries are dropped as soon as their array is freed.
+    if data is None:
+        return None
+
+    key = id(data)
+    with _lock:
+        entry = _cache.get(key)
+        if entry is not None and entry._ref() is data:
+            _cache.move_to_end(key)
+            return entry
+
+        entry = _ArrayStatistics(data, key)
+        _cache[key] = entry
+        while len(_cache) > _max_cached:
+            _cache.popitem(last=False)
+    return entry
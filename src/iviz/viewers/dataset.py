@@ -15,8 +15,14 @@ from itypes import Dataset, Path, File, TraceLogger, is_list
 from ..widgets.containers import IVizArea, DisplayGrid
 from .. import Manager
 from ..widgets.controls import SequenceControls
+from ..widgets.displays import VirtualDisplay
+from ..renderers import RenderPipeline
+from ..resources import virtual_grid_threshold
+from ..sequence import sequence_index, ManifestDataset, ManifestVisualization, manifest_file_name, TemporalProbe
+from ..widgets.plots import PlotPanel, curve_colors
 from PyQt5.QtWidgets import QScrollArea, QAbstractScrollArea, QFrame
 from PyQt5.QtGui import QResizeEvent
+from PyQt5.QtCore import QTimer, pyqtSignal
 from PyQt5.Qt import QApplication
 
 
@@ -44,15 +50,34 @@ class _OversizeScrollArea(QScrollArea):
 
         return super().viewportEvent(event)
 
-def load_dataset(location, cols=5):
+def _find_manifest(path, source=None):
+    log = TraceLogger()
+    file = path.file(manifest_file_name)
+    if not file.exists():
+        return None
+    try:
+        dataset = ManifestDataset(file)
+    except Exception as e:
+        log.debug(f"ignoring manifest {file}: {e}")
+        return None
+    if source is not None and dataset.meta('source') != str(File(str(source)).abs()):
+        return None
+    if not dataset.up_to_date():
+        log.debug(f"ignoring outdated manifest {file}")
+        return None
+    return dataset
+
+def load_dataset(location, cols=5, use_manifest=True):
     if isinstance(location, File):
+        if location.extension() == "manifest":
+            return ManifestDataset(location), location
         dataset = Dataset(location).read()
         return dataset, str(location)
 
     types = {
         "image":  ["png", "exr", "jpg", "tif"],
         "flow": ["flo"],
-        "float": ["blob", "np", "npz"]
+        "float": ["blob", "np", "npz", "npy"]
     }
 
     path = Path(str(location))
@@ -61,7 +86,13 @@ def load_dataset(location, cols=5):
         if not file.exists:
             raise Exception(f"don't know how to read dataset \"{location}>\"")
 
+        if file.extension() == "manifest":
+            return ManifestDataset(file), file
+
         if file.extension() in ["json", "gridseq"]:
+            dataset = _find_manifest(file.path(), source=file) if use_manifest else None
+            if dataset is not None:
+                return dataset, dataset.file()
             dataset = Dataset(location).read()
             return dataset, dataset.file()
 
@@ -72,6 +103,10 @@ def load_dataset(location, cols=5):
                 return dataset, file
 
     else:
+        dataset = _find_manifest(path) if use_manifest else None
+        if dataset is not None:
+            return dataset, dataset.file()
+
         file = path.file('data.gridseq')
         if file.exists():
             dataset = Dataset(file).read()
@@ -115,6 +150,8 @@ def load_dataset(location, cols=5):
     raise Exception(f"don't know how to read dataset \"{location}\"")
 
 class DatasetViewer(QWidget):
+    _props_read = pyqtSignal()
+
     def __init__(self, dataset, parent=None, cols=5):
         self.__log = TraceLogger()
         super().__init__(parent)
@@ -127,7 +164,7 @@ class DatasetViewer(QWidget):
                     if entry == ",":
                         dataset.new_merge_row()
                         continue
-                    entry_ds, entry_loc = load_dataset(entry, cols=cols)
+                    entry_ds, entry_loc = load_dataset(entry, cols=cols, use_manifest=False)
                     dataset.merge(entry_ds, include_label=True)
                 self.setWindowTitle('iviz')
             else:
@@ -135,17 +172,37 @@ class DatasetViewer(QWidget):
                 self.setWindowTitle('iviz: ' + str(location.abs()))
 
         self._ds = dataset
+        self._seq = sequence_index(self._ds.seq)
         self._index = None
         self._displays = {}
+        self._pipeline = RenderPipeline()
+        self._first_paint_pending = False
+        self._probe = None
+        self._probe_panel = None
         self.initUI()
 
+        # Props of manifests are read from their sequence file in the
+        # background and shown once available
+        self._props_vizs = []
+        if hasattr(self._ds, 'read_props'):
+            self._props_read.connect(self._update_props)
+            self._props_vizs = self._ds.read_props(self._props_read.emit)
+
     def initUI(self):
         self._manager = Manager()
 
         self._grid = DisplayGrid()
-        for viz in self._ds.viz:
+        vizs = [(None, viz) for viz in self._ds.viz]
+        virtual = len(vizs) > virtual_grid_threshold
+        if virtual:
+            vizs = [(id, self._ds.viz[id]) for id in self._ds.viz.ids()]
+        for id, viz in vizs:
             col, row = viz.index()
-            display = viz.create_display(self._manager)
+            if virtual and not self._is_text(viz):
+                display = VirtualDisplay(self._manager, viz.create_display, id=id)
+                display.materialized.connect(self._display_materialized)
+            else:
+                display = viz.create_display(self._manager)
             self._grid.set_widget(
                 display,
                 col,
@@ -155,15 +212,21 @@ class DatasetViewer(QWidget):
             )
             self._displays[display.id()] = display
 
-        self._controls = SequenceControls(self._ds)
+        self._controls = SequenceControls(self._ds, self._seq)
         self._controls.index_changed.connect(self.change_index)
+        filmstrip = self._controls.filmstrip()
+        self._manager.memory().add_cache("Thumbnails", filmstrip.memory, filmstrip.release)
 
         self._grid_scroll = _OversizeScrollArea(self._grid)
+        self._grid_scroll.horizontalScrollBar().valueChanged.connect(self._grid.schedule_visibility_update)
+        self._grid_scroll.verticalScrollBar().valueChanged.connect(self._grid.schedule_visibility_update)
 
         self._area = IVizArea(self._manager)
         self._area.set_main_widget(self._grid_scroll)
         self._area.set_controls(self._controls)
 
+        self._manager.probe_requested.connect(self._start_probe)
+
         if False:#len(self._ds.viz.ids()) == 1:
             self._grid.set_show_drag_and_drop_areas(False)
             self._grid.set_show_viz_controls(False)
@@ -173,21 +236,118 @@ class DatasetViewer(QWidget):
         self._layout.addWidget(self._area)
         self.setLayout(self._layout)
 
+        # With previews from a previous run the window is painted with them
+        # first and the data is loaded right after
+        if self._show_previews(0):
+            self._first_paint_pending = True
+        else:
+            self._load_first_index()
+
+    def _load_first_index(self):
         self._controls.goto_index(0)
         self.change_index(0)
 
+    def _show_previews(self, index):
+        group_id = self._seq.group_id(self._seq.group(index))
+        item_id = self._seq.item_id(index)
+        shown = False
+        for id, display in self._displays.items():
+            if not hasattr(display, 'show_preview') or id not in self._ds.viz:
+                continue
+            if display.show_preview(self._ds.viz[id].data(group_id, item_id)):
+                shown = True
+        return shown
+
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if self._first_paint_pending:
+            self._first_paint_pending = False
+            QTimer.singleShot(0, self._load_first_index)
+
+    def manager(self): return self._manager
+    def controls(self): return self._controls
+
+    def _start_probe(self, display, region):
+        if display.id() not in self._ds.viz:
+            return
+        self._stop_probe()
+        self._probe = TemporalProbe(self._ds, self._seq, display.id(), region)
+        self._probe.values_changed.connect(self._update_probe)
+
+        if self._probe_panel is None:
+            self._probe_panel = PlotPanel()
+            self._probe_panel.plot().index_clicked.connect(self._controls.goto_index)
+            self._probe_panel.closed.connect(self._close_probe)
+        self._area.add_panel(self._probe_panel)
+        self._update_probe()
+        self._probe.start()
+
+    def _stop_probe(self):
+        if self._probe is not None:
+            self._probe.cancel()
+            self._probe.values_changed.disconnect(self._update_probe)
+            self._probe = None
+
+    def _close_probe(self):
+        self._stop_probe()
+        self._area.remove_panel(self._probe_panel)
+
+    def _update_probe(self):
+        probe = self._probe
+        region = probe.region()
+        title = f"{probe.viz_id()}: x = {region.x()}, y = {region.y()}"
+        if region.width() > 1 or region.height() > 1:
+            title += f", width = {region.width()}, height = {region.height()} (mean)"
+        if not probe.complete():
+            title += f" - reading {probe.done()} / {probe.total()}"
+        self._probe_panel.set_title(title)
+
+        values = probe.values()
+        names = probe.channel_names()
+        curves = []
+        if values is not None:
+            curves = [(name, values[:, c], color) for c, (name, color) in enumerate(zip(names, curve_colors(names)))]
+        self._probe_panel.plot().set_curves(curves)
+        self._probe_panel.plot().set_marker(self._index)
+
+    def _is_text(self, viz):
+        # Text displays size themselves to their contents, so they are
+        # always created upfront
+        if isinstance(viz, ManifestVisualization):
+            return viz.type() == 'text'
+        return 'text' in type(viz).__name__.lower()
+
+    def _display_materialized(self, display):
+        self._displays[display.id()] = display
+
+    def _update_props(self):
+        if self._index is None:
+            return
+        group_id = self._seq.group_id(self._seq.group(self._index))
+        item_id = self._seq.item_id(self._index)
+        updates = [(self._displays[id], self._ds.viz[id].data(group_id, item_id)) for id in self._props_vizs if id in self._displays]
+        self._pipeline.set_data(updates)
+
     def change_index(self, index):
         if self._index == index: return
         self.__log.debug(f"goto index {index} (old = {self._index})")
 
         self._index = index
-        item = self._ds.seq.full_item_list()[index]
-        group_id = item['group_id']
-        item_id = item['item_id']
+        group_id = self._seq.group_id(self._seq.group(index))
+        item_id = self._seq.item_id(index)
 
+        updates = []
         for id in self._displays:
             if id in self._ds.viz:
-                self._displays[id].set_data(self._ds.viz[id].data(group_id, item_id))
+                updates.append((self._displays[id], self._ds.viz[id].data(group_id, item_id)))
             else:
-                self._displays[id].set_data(None)
+                updates.append((self._displays[id], None))
+        self._pipeline.set_data(updates)
+
+        if self._probe_panel is not None:
+            self._probe_panel.plot().set_marker(index)
+
+        # The next frames are read while this one is shown
+        if hasattr(self._ds, 'prefetch'):
+            self._ds.prefetch(index)
 
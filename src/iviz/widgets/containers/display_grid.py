@@ -12,6 +12,7 @@
 
 from itypes import TraceLogger, Grid2D, Struct
 from PyQt5.QtWidgets import QGridLayout, QWidget, QPushButton, QLayout, QWidgetItem
+from PyQt5.QtCore import QTimer
 from .grid import DisplayGridLayout
 
 
@@ -43,6 +44,9 @@ class DisplayGrid(QWidget):
         self.__log = TraceLogger()
         self._row = 0
         self._displays = []
+        self._visibility_timer = QTimer()
+        self._visibility_timer.setSingleShot(True)
+        self._visibility_timer.timeout.connect(self.update_visibility)
         self.initUI()
 
     def initUI(self):
@@ -50,7 +54,22 @@ class DisplayGrid(QWidget):
          self.setLayout(self._lay)
 
     def displays(self):
-        return self._displays
+        # Virtual displays are replaced in their containers once created
+        return [container.display() for container in self._lay.containers()]
+
+    def schedule_visibility_update(self):
+        self._visibility_timer.start(0)
+
+    def update_visibility(self):
+        # Suspend displays scrolled out of view, they catch up on the latest
+        # data once they are visible again
+        visible = self.visibleRegion()
+        for container in self._lay.containers():
+            container.display().set_suspended(not visible.intersects(container.geometry()), "offscreen")
+
+    def resizeEvent(self, e):
+        super().resizeEvent(e)
+        self.schedule_visibility_update()
 
     def set_show_viz_controls(self, value):
         self._lay.set_show_viz_controls(value)
@@ -128,6 +128,9 @@ class DisplayContainer(QWidget):
             self._display.show()
             self._hidden_id_label.hide()
 
+        # Hidden displays only keep their latest data and render when shown
+        self._display.set_suspended(self.is_hidden(), "hidden")
+
     def updateGeometry(self):
         super().updateGeometry()
         self._grid.updateGeometry()
@@ -135,6 +138,16 @@ class DisplayContainer(QWidget):
     def display(self):
         return self._display
 
+    def replace_display(self, display):
+        old = self._display
+        display.setParent(self)
+        display.set_index(self._index)
+        self._lay.replaceWidget(old, display)
+        old.hide()
+        self._display = display
+        self._update_hidden()
+        self.updateGeometry()
+
     def set_index(self, pos):
         self._index = pos
         self._display.set_index(pos)
@@ -32,7 +32,8 @@ class DisplayGridLayout(QLayout):
 
         self._container_list = []
         self._container_grid = Grid2D()
-        self._placeholder_grid = Grid2D()
+        self._placeholder_grid = {}
+        self._placeholder_bounds = None
 
         self._rect = None
 
@@ -40,7 +41,14 @@ class DisplayGridLayout(QLayout):
 
         self._drag_source = None
 
+        # Geometry recomputes requested in the same event loop iteration are
+        # coalesced into one
         self._update_timer = QTimer()
+        self._update_timer.setSingleShot(True)
+        self._update_timer.timeout.connect(self._recompute_geometry)
+
+    def containers(self):
+        return self._container_list
 
     def set_drag_source(self, value):
         pass
@@ -72,12 +80,30 @@ class DisplayGridLayout(QLayout):
         pass
 
     def _update_placeholders(self):
-        for placeholder in self._placeholder_grid.values():
-            placeholder.deleteLater()
-        self._placeholder_grid = Grid2D()
+        # Placeholders fill every cell of the bounding range of the grid.
+        # Only cells entering or leaving the range are touched.
+        g = self._container_grid
+        bounds = (g.min_col(), g.max_col(), g.min_row(), g.max_row())
+        old = self._placeholder_bounds
+        if bounds == old:
+            return
+        self._placeholder_bounds = bounds
 
-        for r in self._container_grid.row_range():
-            for c in self._container_grid.col_range():
+        def inside(c, r, b):
+            return b is not None and b[0] <= c <= b[1] and b[2] <= r <= b[3]
+
+        if old is not None:
+            for (c, r) in [key for key in self._placeholder_grid.keys() if not inside(*key, bounds)]:
+                self._placeholder_grid[c, r].deleteLater()
+                del self._placeholder_grid[c, r]
+
+        min_c, max_c, min_r, max_r = bounds
+        for r in range(min_r, max_r + 1):
+            if old is not None and old[2] <= r <= old[3]:
+                cols = [c for c in range(min_c, max_c + 1) if not old[0] <= c <= old[1]]
+            else:
+                cols = range(min_c, max_c + 1)
+            for c in cols:
                 container = DisplayContainer(self, DisplayPlaceholder(), c, r, 1, 1)
                 container.setParent(self._parent)
                 self._placeholder_grid[c, r] = container
@@ -96,7 +122,7 @@ class DisplayGridLayout(QLayout):
 
         self._update_placeholders()
 
-        self._recompute_geometry()
+        self.updateGeometry()
 
     def sizeHint(self):
         return self._min_size
@@ -125,11 +151,11 @@ class DisplayGridLayout(QLayout):
             return
         self._rect = rect
         self.__log.debug(f'rect = {rect.width()} x {rect.height()}')
-        QTimer.singleShot(1, self._recompute_geometry)
+        self.updateGeometry()
 
     def updateGeometry(self):
-        self._update_timer.stop()
-        self._update_timer.singleShot(1, self._recompute_geometry)
+        if not self._update_timer.isActive():
+            self._update_timer.start(1)
 
     def _recompute_geometry(self):
         rect = self._rect
@@ -272,7 +298,9 @@ class DisplayGridLayout(QLayout):
         x_end += s
         y_end += s
         min_size = QSize(x_end + 1, y_end + 1)
-        self._min_size = min_size
+        if min_size != self._min_size:
+            self._min_size = min_size
+            self._parent.updateGeometry()
 
         if rect is None:
             return
@@ -337,7 +365,7 @@ class DisplayGridLayout(QLayout):
         # Compute actual size
         compute_cell_sizes()
 
-        containers_processed = []
+        containers_processed = set()
         for col in self._container_grid.col_range():
             for row in self._container_grid.row_range():
                 placeholder = self._placeholder_grid[col, row]
@@ -371,6 +399,9 @@ class DisplayGridLayout(QLayout):
                         container.setGeometry(rect)
                         container.show()
 
-                        containers_processed.append(container)
+                        containers_processed.add(container)
+
+        if hasattr(self._parent, 'schedule_visibility_update'):
+            self._parent.schedule_visibility_update()
 
         self.__log.debug("done")
@@ -13,14 +13,16 @@
 from itypes import Struct, addr, TraceLogger
 from PyQt5.QtGui import QCursor, QPainter, QColor, QPixmap, QKeyEvent, QPalette
 from PyQt5.QtWidgets import QGridLayout, QWidget, QApplication
-from PyQt5.QtWidgets import QMenuBar, QAction, QMenu, QSizePolicy
+from PyQt5.QtWidgets import QMenuBar, QAction, QMenu, QSizePolicy, QLabel, QVBoxLayout
 from PyQt5.QtCore import pyqtSignal
-from PyQt5.QtCore import Qt, QPointF, QRect, QEvent, QObject
-from ...utils import qpixmap_to_numpy
+from PyQt5.QtCore import Qt, QPointF, QRect, QEvent, QObject, QTimer
+from ...utils import qpixmap_to_numpy, line_sampler
+from ...sequence import channel_names
 from PyQt5.QtWidgets import QFileDialog
 from ..dialogs import SaveViewsDialog
 from ..basic import Divider
-from ...resources import display_highlight_border_width, display_grid_spacing
+from ..plots import PlotPanel, curve_colors
+from ...resources import display_highlight_border_width, display_grid_spacing, plot_colors
 
 # Modifier keys:
 # Space or shift = preview
@@ -253,6 +255,20 @@ class IVizArea(QWidget):
         if self._has_menu_bar:
             view.addAction(self._actions.enable_interpolation)
 
+        self._actions.zoom_to_selection = QAction("Zoom to Selection")
+        self._actions.zoom_to_selection.setShortcut("z")
+        self._actions.zoom_to_selection.setWhatsThis("Zoom to the selected region")
+        self._actions.zoom_to_selection.triggered.connect(self.zoom_to_selection)
+        if self._has_menu_bar:
+            view.addAction(self._actions.zoom_to_selection)
+
+        self._actions.reset_zoom = QAction("Reset Zoom")
+        self._actions.reset_zoom.setShortcut("0")
+        self._actions.reset_zoom.setWhatsThis("Fit the image into the display")
+        self._actions.reset_zoom.triggered.connect(self.reset_zoom)
+        if self._has_menu_bar:
+            view.addAction(self._actions.reset_zoom)
+
         self._actions.show_display_controls = QAction("Show Widget Controls")
         self._actions.show_display_controls.setCheckable(True)
         self._actions.show_display_controls.setChecked(True)
@@ -283,6 +299,14 @@ class IVizArea(QWidget):
         if self._has_menu_bar:
             selection.addAction(self._actions.clear_selection)
 
+        self._actions.line_profile = QAction("Line Profile")
+        self._actions.line_profile.setShortcut("l")
+        self._actions.line_profile.setWhatsThis("Draw lines instead of boxes and plot the values along them")
+        self._actions.line_profile.setCheckable(True)
+        self._actions.line_profile.toggled.connect(self.set_line_tool)
+        if self._has_menu_bar:
+            selection.addAction(self._actions.line_profile)
+
         self._actions.next_sample = QAction("Next")
         self._actions.next_sample.setShortcut("Space")
         self._actions.clear_selection.setWhatsThis("Next sample")
@@ -297,8 +321,41 @@ class IVizArea(QWidget):
 
         self._divider = Divider()
 
+        # Panels (like plots) between the displays and the sequence controls
+        self._panels = QWidget()
+        self._panel_layout = QVBoxLayout()
+        m = display_highlight_border_width + display_grid_spacing
+        self._panel_layout.setContentsMargins(m, 0, m, 0)
+        self._panels.setLayout(self._panel_layout)
+        self._panels.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Maximum)
+        self._panels.hide()
+        self._outer_lay.addWidget(self._panels, 2, 0)
+
         self._group_menu = GroupMenu(self)
 
+        # Memory held by the displays and caches, details in the tool tip
+        self._memory_status = QLabel()
+        self._memory_status.setAlignment(Qt.AlignRight)
+        m = display_highlight_border_width + display_grid_spacing
+        self._memory_status.setContentsMargins(m, 0, m, m)
+        self._outer_lay.addWidget(self._memory_status, 5, 0)
+        self._manager.memory().usage_changed.connect(self._update_memory_status)
+        self._update_memory_status()
+
+        # Profiles along the lines of all displays with one, sampled once
+        # per event loop iteration however many displays changed
+        self._profile_panel = None
+        self._profile_closed = False
+        self._profile_timer = QTimer(self)
+        self._profile_timer.setSingleShot(True)
+        self._profile_timer.setInterval(0)
+        self._profile_timer.timeout.connect(self._update_profile)
+        self._manager.selected_line_changed.connect(self._line_changed)
+        self._manager.selected_pixel_changed.connect(self._profile_timer.start)
+        self._manager.selected_region_changed.connect(self._profile_timer.start)
+        self._manager.selection_cleared.connect(self._profile_timer.start)
+        self._manager.data_changed.connect(self._profile_timer.start)
+
     def save_views(self):
         # Collect data to save
         self.__log.debug('saving')
@@ -328,6 +385,58 @@ class IVizArea(QWidget):
             self._manager.clear_modifiers()
             dialog.exec()
 
+    def _update_memory_status(self):
+        memory = self._manager.memory()
+        self._memory_status.setText(memory.status())
+        self._memory_status.setToolTip(memory.details())
+
+    def set_line_tool(self, value):
+        self._manager.set_line_tool(value)
+
+    def _profile_curves(self):
+        curves = []
+        single = 0
+        for display in self._manager.displays():
+            if not hasattr(display, 'view'):
+                continue
+            line = display.view().selected_line()
+            pixviz = display.view().pixviz()
+            if line is None or pixviz is None:
+                continue
+            data = pixviz.numpy_data()
+            if data is None:
+                continue
+            values = line_sampler(line, data.shape[1], data.shape[0]).sample(data)
+            count = values.shape[1]
+            names = channel_names('flow' if count == 2 else 'image', count)
+            if count == 1:
+                curves.append((str(display.id()), values[:, 0], plot_colors[single % len(plot_colors)]))
+                single += 1
+                continue
+            for c, color in enumerate(curve_colors(names)):
+                curves.append((f'{display.id()}.{names[c]}', values[:, c], color))
+        return curves
+
+    def _line_changed(self):
+        self._profile_closed = False
+        self._profile_timer.start()
+
+    def _close_profile(self):
+        self._profile_closed = True
+        self.remove_panel(self._profile_panel)
+
+    def _update_profile(self):
+        curves = [] if self._profile_closed else self._profile_curves()
+        if not len(curves):
+            if self._profile_panel is not None:
+                self.remove_panel(self._profile_panel)
+            return
+        if self._profile_panel is None:
+            self._profile_panel = PlotPanel("Line profile")
+            self._profile_panel.closed.connect(self._close_profile)
+        self._profile_panel.plot().set_curves(curves)
+        self.add_panel(self._profile_panel)
+
     def reload_views(self):
         for display in self._main_widget.widget().displays():
             display.reload()
@@ -368,6 +477,16 @@ class IVizArea(QWidget):
         self._manager.set_interpolation(value)
         self._temp_deselect()
 
+    def zoom_to_selection(self):
+        self._temp_select()
+        self._manager.zoom_to_selection()
+        self._temp_deselect()
+
+    def reset_zoom(self):
+        self._temp_select()
+        self._manager.set_relative_zoom(1.0, QPointF(0.5, 0.5))
+        self._temp_deselect()
+
     def clear_selection(self):
         self._temp_select()
         self._manager.clear_selection()
@@ -385,7 +504,7 @@ class IVizArea(QWidget):
         if controls is not None:
             self._outer_lay.removeWidget(self._controls)
         self._controls = controls
-        self._outer_lay.addWidget(self._divider, 2, 0)
+        self._outer_lay.addWidget(self._divider, 3, 0)
 
         self._controls_container = QWidget()
         self._control_layout = QGridLayout()
@@ -395,10 +514,21 @@ class IVizArea(QWidget):
         self._control_layout.addWidget(self._controls)
         self._controls_container.setLayout(self._control_layout)
 
-        self._outer_lay.addWidget(self._controls_container, 3, 0)
+        self._outer_lay.addWidget(self._controls_container, 4, 0)
         controls.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Minimum)
         self._preview_overlay.raise_()
 
+    def add_panel(self, panel):
+        if self._panel_layout.indexOf(panel) < 0:
+            self._panel_layout.addWidget(panel)
+        panel.show()
+        self._panels.show()
+
+    def remove_panel(self, panel):
+        self._panel_layout.removeWidget(panel)
+        panel.hide()
+        self._panels.setHidden(self._panel_layout.count() == 0)
+
     def set_modifiers(self, modifiers):
         if modifiers & Qt.SHIFT: self._manager.turn_on_modifier("preview")
         if modifiers & Qt.CTRL: self._manager.turn_on_modifier("all")
@@ -13,10 +13,11 @@
 from itypes import TraceLogger
 from PyQt5.QtWidgets import QWidget
 from PyQt5.QtGui import QPainter
-from PyQt5.QtCore import Qt, QSize, QPoint, QPointF, QRectF
-from PyQt5.QtCore import pyqtSignal
+from PyQt5.QtCore import Qt, QSize, QPoint, QPointF, QRectF, QLineF
+from PyQt5.QtCore import pyqtSignal, QTimer
 
 from ...renderers.pixviz import PixelVisualizationRenderer
+from ...resources import wheel_zoom_step
 
 
 class View(QWidget):
@@ -26,6 +27,7 @@ class View(QWidget):
     pan_offset_set = pyqtSignal(QPoint)
     selected_pixel_changed = pyqtSignal(QPointF)
     selected_region_changed = pyqtSignal(QRectF)
+    selected_line_changed = pyqtSignal(QLineF)
     selection_cleared = pyqtSignal()
     deregister_pixviz = pyqtSignal()
     register_pixviz = pyqtSignal()
@@ -41,9 +43,17 @@ class View(QWidget):
         self._mouse_moved = False
         self._shared_mode = True
         self._has_selection = False
+        self._deferred = []
+        self._replaying = False
         self.setMouseTracking(True)
         self._end_action()
 
+        # Restores full rendering quality once frames stop changing
+        self._quality_timer = QTimer(self)
+        self._quality_timer.setSingleShot(True)
+        self._quality_timer.setInterval(int(self._renderer.governor().idle_delay() * 1000))
+        self._quality_timer.timeout.connect(self._restore_quality)
+
     def last_mouse_pos(self): return self._last_mouse_pos
 
     def renderer(self):
@@ -60,7 +70,7 @@ class View(QWidget):
         if self._renderer._pixviz is not None:
             self.deregister_pixviz.emit()
             self._renderer._pixviz.changed.disconnect(self.update)
-        self._renderer._pixviz = pixviz
+        self._renderer.set_pixviz(pixviz)
         self._renderer._pixviz.changed.connect(self.update)
         self.register_pixviz.emit()
 
@@ -68,12 +78,58 @@ class View(QWidget):
         super().setEnabled(value)
         self._renderer.set_fade(not value)
 
+    def set_preview(self, image):
+        self._renderer.set_preview(image)
+        self.update()
+
     def interpolation(self): return self._renderer.interpolation()
     def set_interpolation(self, value):
         if self._renderer.set_interpolation(value):
             self.interpolation_changed.emit(value)
             self.update()
 
+    def _geometry_changed(self, changed):
+        # Zoom and pan only change the transform the cached pixmap is drawn
+        # with
+        if changed:
+            self.update()
+            self.zoom_changed.emit()
+
+    def set_relative_zoom(self, value, pos):
+        self._geometry_changed(self._renderer.set_relative_zoom(value, pos))
+
+    def differential_relative_zoom(self, value, pos):
+        zoom = self._renderer.relative_zoom()
+        if zoom is None: return
+        self._geometry_changed(self._renderer.set_relative_zoom(zoom * value, pos))
+
+    def set_screen_zoom(self, value, pos):
+        self._geometry_changed(self._renderer.set_screen_zoom(value, pos))
+
+    def set_pan_offset(self, value):
+        self._geometry_changed(self._renderer.set_pan_offset(value))
+
+    def differential_pan_offset(self, value):
+        self._geometry_changed(self._renderer.pan(value))
+
+    def zoom_to_selection(self):
+        region = self.selected_region()
+        if region is None:
+            return
+        self._geometry_changed(self._renderer.zoom_to_rect(QRectF(region)))
+
+    def _zoom(self, value, pos):
+        # Zooms this view and the other selected displays about the same
+        # normalized image position
+        self.differential_relative_zoom(value, pos)
+        if self._manager is not None:
+            self._manager.broadcast_differential_relative_zoom(value, pos)
+
+    def _pan(self, value):
+        self.differential_pan_offset(value)
+        if self._manager is not None:
+            self._manager.broadcast_differential_pan_offset(value)
+
     def _is_outside_image(self, e):
         norm_coords = self._renderer.viewport_to_norm(e.pos())
         if norm_coords is None: return True
@@ -89,23 +145,51 @@ class View(QWidget):
         self.setCursor(Qt.CrossCursor)
         self.mouse_hovered.emit(QPointF())
 
+    def replay(self, calls):
+        # Applies view calls recorded before this view existed, once it
+        # shows an image. They are not broadcast again.
+        self._deferred.extend(calls)
+        self.update()
+
+    def _replay_deferred(self):
+        calls, self._deferred = self._deferred, []
+        self._replaying = True
+        try:
+            for name, *args in calls:
+                getattr(self, name)(*args)
+        finally:
+            self._replaying = False
+
     def _emit_signal(self, incoming_name, outgoing_name, *args, **kwargs):
         getattr(self, outgoing_name).emit(*args, **kwargs)
+        if self._replaying:
+            return
         if self._manager is not None and getattr(self._manager, incoming_name):
             getattr(self._manager, incoming_name)(*args, **kwargs)
 
+    def _update_overlays(self, old_region):
+        # Repaint only where the overlays were and where they are now
+        new_region = self._renderer.overlay_region()
+        if old_region is None or new_region is None:
+            self.update()
+            return
+        region = old_region + new_region
+        if not region.isEmpty():
+            self.update(region)
+
     def select_pixel(self, norm_pos):
         overlay = self._renderer.overlays().crosshair
         image_pos = self._renderer.norm_to_image(norm_pos)
         if overlay.position() == image_pos:
             return
+        old_region = self._renderer.overlay_region()
         self._renderer.overlays().clear_selection()
         self._renderer.overlays().crosshair.set_position(
             self._renderer.norm_to_image(norm_pos)
         )
         self._has_selection = True
         self._emit_signal("select_pixel", "selected_pixel_changed", norm_pos)
-        self.update()
+        self._update_overlays(old_region)
 
     def select_region(self, norm_region):
         overlay = self._renderer.overlays().selection
@@ -120,18 +204,35 @@ class View(QWidget):
         )
         if overlay.region() == image_region:
             return
+        old_region = self._renderer.overlay_region()
         self._renderer.overlays().clear_selection()
         self._renderer.overlays().selection.set_region(image_region)
         self._has_selection = True
         self._emit_signal("select_region", "selected_region_changed", norm_region)
-        self.update()
+        self._update_overlays(old_region)
+
+    def select_line(self, norm_line):
+        p1 = self._renderer.norm_to_image(norm_line.p1())
+        p2 = self._renderer.norm_to_image(norm_line.p2())
+        if p1 is None or p2 is None:
+            return
+        image_line = QLineF(p1, p2)
+        if self._renderer.overlays().line.line() == image_line:
+            return
+        old_region = self._renderer.overlay_region()
+        self._renderer.overlays().clear_selection()
+        self._renderer.overlays().line.set_line(image_line)
+        self._has_selection = True
+        self._emit_signal("select_line", "selected_line_changed", norm_line)
+        self._update_overlays(old_region)
 
     def clear_selection(self):
         if self._has_selection:
+            old_region = self._renderer.overlay_region()
             self._renderer.overlays().clear_selection()
             self._has_selection = False
             self._emit_signal("clear_selection", "selection_cleared")
-            self.update()
+            self._update_overlays(old_region)
 
     def has_selection(self):
         return self._has_selection
@@ -144,6 +245,11 @@ class View(QWidget):
             return None
         return self._renderer.overlays().selection.int_region()
 
+    def selected_line(self):
+        if not self._has_selection:
+            return None
+        return self._renderer.overlays().line.line()
+
     def selected_region_image(self):
         if self.pixviz() is None:
             return None
@@ -160,8 +266,17 @@ class View(QWidget):
         painter = QPainter(self)
         screen_zoom = self._renderer.screen_zoom()
         self._renderer.render(painter)
+        if self._deferred and self._renderer.valid():
+            self._replay_deferred()
+            self.update()
         if self._renderer.screen_zoom() != screen_zoom:
             self.zoom_changed.emit()
+        if self._renderer.reduced_quality():
+            self._quality_timer.start()
+
+    def _restore_quality(self):
+        if self._renderer.restore_quality():
+            self.update()
 
     def mousePressEvent(self, e):
         if self._is_outside_image(e):
@@ -183,6 +298,15 @@ class View(QWidget):
     def mouseMoveEvent(self, e):
         self._mouse_moved = True
 
+        # Panning continues when the cursor leaves the image
+        if self._middle_down and self._last_mouse_pos is not None:
+            g = self._renderer._geometry
+            delta = e.pos() - self._last_mouse_pos
+            self._last_mouse_pos = e.pos()
+            if self._renderer.valid():
+                self._pan(QPointF(delta.x() / g.scaled_width, delta.y() / g.scaled_height))
+            return
+
         if self._is_outside_image(e):
             self._end_action()
             return
@@ -192,8 +316,11 @@ class View(QWidget):
 
         self._manager.update_preview_pos(new_pos)
 
-        if self._middle_down:
-            pass
+        if self._left_down and self._manager is not None and self._manager.line_tool():
+            self.select_line(QLineF(
+                self._renderer.viewport_to_norm(self._mouse_down_pos),
+                self._renderer.viewport_to_norm(e.pos())
+            ))
         elif self._left_down:
             self.select_region(QRectF(
                 self._renderer.viewport_to_norm(self._mouse_down_pos),
@@ -204,6 +331,12 @@ class View(QWidget):
             self.mouse_hovered.emit(image_pos)
 
     def mouseReleaseEvent(self, e):
+        if e.button() == Qt.MidButton and self._middle_down:
+            self.__log.debug("Middle button up")
+            self._middle_down = False
+            self._end_action()
+            return
+
         if self._is_outside_image(e):
             return
 
@@ -213,12 +346,27 @@ class View(QWidget):
             if not self._mouse_moved:
                 self.select_pixel(self._renderer.viewport_to_norm(e.pos()))
 
-        if e.button() == Qt.MidButton:
-            self.__log.debug("Middle button up")
-            self._middle_down = False
-
         self._end_action()
 
+    def mouseDoubleClickEvent(self, e):
+        # Middle double click resets the zoom of all selected displays
+        if e.button() == Qt.MidButton and self._manager is not None:
+            self._manager.set_relative_zoom(1.0, QPointF(0.5, 0.5))
+            return
+        super().mouseDoubleClickEvent(e)
+
+    def wheelEvent(self, e):
+        pos = self._renderer.viewport_to_norm(e.pos())
+        if pos is None:
+            return
+        steps = e.angleDelta().y() / 120
+        if steps == 0:
+            return
+        self._zoom(pow(wheel_zoom_step, steps), pos)
+        e.accept()
+
     def leaveEvent(self, e):
+        if self._middle_down:
+            return
         self._end_action()
 
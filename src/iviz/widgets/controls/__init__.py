@@ -15,5 +15,6 @@ from .int_slider import IntSlider
 from .float_slider import FloatSlider
 from .float_range_slider import FloatRangeSlider
 from .sequence_controls import SequenceControls
+from .filmstrip import Filmstrip
 from .flow_scale_slider import FlowScaleSlider
 from .visibility_button import VisibilityButton
\ No newline at end of file
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+
+### --------------------------------------------- ###
+### Part of iViz                                  ###
+### (C) 2022 Eddy ilg (me@eddy-ilg.net)           ###
+### Creative Commons                              ###
+### Attribution-NonCommercial-NoDerivatives       ###
+### 4.0 International License.                    ###
+### Commercial use an redistribution prohibited.  ###
+### See https://github.com/eddy-ilg/iviz          ###
+### --------------------------------------------- ###
+
+from collections import OrderedDict
+from itypes import TraceLogger
+from PyQt5.QtWidgets import QWidget, QScrollBar, QVBoxLayout, QSizePolicy
+from PyQt5.QtCore import pyqtSignal, Qt, QRect, QSize
+from PyQt5.QtGui import QPainter, QPixmap, QPen
+from ...resources import thumbnail_size, display_highlight_color, display_highlight_border_width
+
+
+class _Strip(QWidget):
+    clicked = pyqtSignal(int)
+
+    def __init__(self, filmstrip):
+        super().__init__()
+        self._filmstrip = filmstrip
+        self.setMinimumHeight(thumbnail_size.height() + 2 * filmstrip.spacing())
+        self.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Fixed)
+
+    def sizeHint(self):
+        return QSize(self._filmstrip.cell_width() * 8, self.minimumHeight())
+
+    def paintEvent(self, event):
+        self._filmstrip.paint(QPainter(self), self.width(), self.height())
+
+    def mousePressEvent(self, e):
+        index = self._filmstrip.index_at(e.pos().x())
+        if index is not None:
+            self.clicked.emit(index)
+
+    def wheelEvent(self, e):
+        self._filmstrip.scroll_by(-e.angleDelta().y() / 120 * self._filmstrip.cell_width())
+        e.accept()
+
+
+class Filmstrip(QWidget):
+    # Row of thumbnails over the whole sequence. Only the visible cells are
+    # painted and only their thumbnails (plus a margin on both sides) are
+    # kept, the others are requested from the thumbnail renderer when they
+    # are scrolled into view.
+    index_changed = pyqtSignal(int)
+
+    def __init__(self, thumbnails=None, margin=8):
+        self.__log = TraceLogger()
+        super().__init__()
+        self._thumbnails = None
+        self._length = 0
+        self._index = None
+        self._spacing = 2
+        self._margin = margin
+        self._pixmaps = OrderedDict()
+        self.initUI()
+        self.set_thumbnails(thumbnails)
+
+    def spacing(self): return self._spacing
+    def cell_width(self): return thumbnail_size.width() + self._spacing
+    def index(self): return self._index
+
+    def initUI(self):
+        lay = QVBoxLayout()
+        lay.setContentsMargins(0, 0, 0, 0)
+        lay.setSpacing(0)
+
+        self._strip = _Strip(self)
+        self._strip.clicked.connect(self._clicked)
+        lay.addWidget(self._strip)
+
+        self._scroll = QScrollBar(Qt.Horizontal)
+        self._scroll.valueChanged.connect(self._strip.update)
+        lay.addWidget(self._scroll)
+
+        self.setLayout(lay)
+
+    def set_thumbnails(self, thumbnails):
+        if self._thumbnails is not None:
+            self._thumbnails.thumbnail_ready.disconnect(self._thumbnail_ready)
+        self._thumbnails = thumbnails
+        self._pixmaps.clear()
+        if thumbnails is not None:
+            thumbnails.thumbnail_ready.connect(self._thumbnail_ready)
+        self._update_range()
+        self._strip.update()
+
+    def set_length(self, length):
+        self._length = length
+        self._pixmaps.clear()
+        self._update_range()
+        self._strip.update()
+
+    def set_index(self, index):
+        # Highlights the index and scrolls it into view, without emitting
+        # index_changed
+        if self._index == index:
+            return
+        self._index = index
+        if index is not None:
+            x = index * self.cell_width()
+            if x < self._scroll.value():
+                self._scroll.setValue(x)
+            elif x + self.cell_width() > self._scroll.value() + self._strip.width():
+                self._scroll.setValue(x + self.cell_width() - self._strip.width())
+        self._strip.update()
+
+    def scroll_by(self, dx):
+        self._scroll.setValue(int(self._scroll.value() + dx))
+
+    def _update_range(self):
+        total = self._length * self.cell_width()
+        self._scroll.setRange(0, max(0, total - self._strip.width()))
+        self._scroll.setPageStep(max(1, self._strip.width()))
+        self._scroll.setSingleStep(self.cell_width())
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self._update_range()
+
+    def index_at(self, x):
+        index = int((x + self._scroll.value()) // self.cell_width())
+        if 0 <= index < self._length:
+            return index
+        return None
+
+    def _clicked(self, index):
+        self.set_index(index)
+        self.index_changed.emit(index)
+
+    def _visible_range(self, width):
+        first = self._scroll.value() // self.cell_width()
+        last = min(self._length - 1, (self._scroll.value() + width) // self.cell_width())
+        return first, last
+
+    def _thumbnail_ready(self, index, image):
+        first, last = self._visible_range(self._strip.width())
+        if not first - self._margin <= index <= last + self._margin:
+            return
+        self._pixmaps[index] = QPixmap.fromImage(image)
+        if first <= index <= last:
+            self._strip.update()
+
+    def memory(self):
+        return sum(pixmap.width() * pixmap.height() * pixmap.depth() // 8 for pixmap in self._pixmaps.values())
+
+    def release(self, nbytes):
+        # Drops the thumbnails kept outside of the visible cells, returns
+        # the bytes freed
+        first, last = self._visible_range(self._strip.width())
+        freed = 0
+        for index in [index for index in self._pixmaps if not first <= index <= last]:
+            if freed >= nbytes:
+                break
+            pixmap = self._pixmaps.pop(index)
+            freed += pixmap.width() * pixmap.height() * pixmap.depth() // 8
+        return freed
+
+    def _evict(self, first, last):
+        for index in [index for index in self._pixmaps if not first <= index <= last]:
+            del self._pixmaps[index]
+
+    def paint(self, painter, width, height):
+        painter.fillRect(0, 0, width, height, self.palette().dark())
+        if self._length == 0:
+            return
+
+        first, last = self._visible_range(width)
+        self._evict(first - self._margin, last + self._margin)
+        if self._thumbnails is not None:
+            self._thumbnails.set_wanted(max(0, first - self._margin), last + self._margin)
+
+        tw, th = thumbnail_size.width(), thumbnail_size.height()
+        for index in range(first, last + 1):
+            cell = QRect(index * self.cell_width() - self._scroll.value() + self._spacing // 2, self._spacing, tw, th)
+            pixmap = self._pixmaps.get(index)
+            if pixmap is None:
+                painter.fillRect(cell, self.palette().mid())
+                if self._thumbnails is not None:
+                    self._thumbnails.request(index)
+            else:
+                # Thumbnails keep their aspect ratio and are centered
+                x = cell.x() + (tw - pixmap.width()) // 2
+                y = cell.y() + (th - pixmap.height()) // 2
+                painter.drawPixmap(x, y, pixmap)
+
+            if index == self._index:
+                pen = QPen(display_highlight_color)
+                pen.setWidth(display_highlight_border_width)
+                painter.setPen(pen)
+                painter.drawRect(cell.adjusted(1, 1, -1, -1))
+
+        # Prefetch the thumbnails in the margins
+        if self._thumbnails is not None:
+            for index in list(range(last + 1, min(self._length, last + 1 + self._margin))) + list(range(max(0, first - self._margin), first)):
+                if index not in self._pixmaps:
+                    self._thumbnails.request(index)
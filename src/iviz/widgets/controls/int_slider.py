@@ -10,12 +10,13 @@
 ### See https://github.com/eddy-ilg/iviz          ###
 ### --------------------------------------------- ###
 
-from PyQt5.QtWidgets import QWidget, QHBoxLayout, QSlider, QSpinBox
-from PyQt5.QtCore import pyqtSignal, Qt
+from PyQt5.QtWidgets import QWidget, QHBoxLayout, QSlider, QSpinBox, QStyle, QStyleOptionSlider
+from PyQt5.QtCore import pyqtSignal, Qt, QPoint
 
 
 class IntSlider(QWidget):
     value_changed = pyqtSignal(int)
+    geometry_changed = pyqtSignal()
 
     def __init__(self, range):
         super().__init__()
@@ -62,6 +63,28 @@ class IntSlider(QWidget):
     def value(self):
         return self._value
 
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.geometry_changed.emit()
+
+    def moveEvent(self, event):
+        super().moveEvent(event)
+        self.geometry_changed.emit()
+
+    def slider(self): return self._slider
+
+    def value_position(self, value):
+        # Horizontal center of the handle at the given value, in coordinates
+        # of this widget
+        opt = QStyleOptionSlider()
+        self._slider.initStyleOption(opt)
+        style = self._slider.style()
+        groove = style.subControlRect(QStyle.CC_Slider, opt, QStyle.SC_SliderGroove, self._slider)
+        handle = style.subControlRect(QStyle.CC_Slider, opt, QStyle.SC_SliderHandle, self._slider)
+        span = groove.width() - handle.width()
+        x = groove.x() + handle.width() // 2 + QStyle.sliderPositionFromValue(self._range[0], self._range[1], value, span)
+        return self._slider.mapTo(self, QPoint(x, 0)).x()
+
     def _change_slider_value(self, value):
         self.change_value(value)
 
@@ -13,21 +13,78 @@
 from itypes import TraceLogger
 from .int_slider import IntSlider
 from .fps_slider import FPSSlider
-from PyQt5.QtWidgets import QWidget, QComboBox, QGridLayout, QPushButton, QSizePolicy
+from .filmstrip import Filmstrip
+from .tracks import TrackStrip
+from PyQt5.QtWidgets import QWidget, QComboBox, QGridLayout, QPushButton, QSizePolicy, QToolButton, QMenu
 from PyQt5.QtCore import pyqtSignal
-from PyQt5.QtCore import QTimer
+from PyQt5.QtCore import QTimer, Qt, QAbstractListModel, QModelIndex
 from PyQt5.QtGui import QIcon
 from ...resources import display_highlight_border_width, play_icon_file, previous_icon_file, next_icon_file
+from ...sequence import SequenceIndex, ScalarTracks, statistic_names
+from ...renderers import ThumbnailRenderer
+
+
+class _GroupListModel(QAbstractListModel):
+    def __init__(self, index):
+        super().__init__()
+        self._index = index
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return self._index.group_count()
+
+    def data(self, model_index, role=Qt.DisplayRole):
+        if not model_index.isValid():
+            return None
+        if role == Qt.DisplayRole:
+            return str(self._index.group_label(model_index.row()))
+        if role == Qt.UserRole:
+            return self._index.group_start(model_index.row())
+        return None
+
+
+class _ItemListModel(QAbstractListModel):
+    # Lists the items of a single group, only reset when the group changes
+    def __init__(self, index):
+        super().__init__()
+        self._index = index
+        self._group = None
+
+    def group(self): return self._group
+
+    def set_group(self, group):
+        if group == self._group:
+            return
+        self.beginResetModel()
+        self._group = group
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid() or self._group is None:
+            return 0
+        return self._index.group_size(self._group)
+
+    def data(self, model_index, role=Qt.DisplayRole):
+        if not model_index.isValid() or self._group is None:
+            return None
+        index = self._index.index(self._group, model_index.row())
+        if role == Qt.DisplayRole:
+            return str(self._index.item_label(index))
+        if role == Qt.UserRole:
+            return index
+        return None
 
 
 class SequenceControls(QWidget):
     index_changed = pyqtSignal(int)
 
-    def __init__(self, dataset):
+    def __init__(self, dataset, index=None):
         self.__log = TraceLogger()
         super().__init__()
 
         self._ds = dataset
+        self._seq = index
         self._index = None
 
         self._frame_delay = 1/5 # 5 frames per second
@@ -37,16 +94,69 @@ class SequenceControls(QWidget):
         self.initUI()
 
     def _len(self):
-        return len(self._ds)
-    
-    def set_dataset(self, dataset):
+        return len(self._seq)
+
+    def sequence_index(self): return self._seq
+    def scalar_tracks(self): return self._scalar_tracks
+    def filmstrip(self): return self._filmstrip
+
+    def set_dataset(self, dataset, index=None):
+        if dataset is not self._ds or self._seq is None:
+            self._seq = index if index is not None else SequenceIndex(dataset.seq)
         self._ds = dataset
+        self._index = None
         self._slider.set_range((0, self._len() - 1))
 
-        for item in self._ds.seq.group_list():
-            index = item["index"]
-            label = item["label"]
-            self._group_id_dropdown.addItem(label, index)
+        self._group_model = _GroupListModel(self._seq)
+        self._item_model = _ItemListModel(self._seq)
+        self._group_id_dropdown.blockSignals(True)
+        self._item_id_dropdown.blockSignals(True)
+        self._group_id_dropdown.setModel(self._group_model)
+        self._item_id_dropdown.setModel(self._item_model)
+        self._group_id_dropdown.blockSignals(False)
+        self._item_id_dropdown.blockSignals(False)
+
+        thumbnails = ThumbnailRenderer(dataset, self._seq) if hasattr(dataset, 'viz') else None
+        if thumbnails is not None and not thumbnails.valid():
+            thumbnails = None
+        self._filmstrip.set_thumbnails(thumbnails)
+        self._filmstrip.set_length(self._len())
+        self._filmstrip.setHidden(thumbnails is None or self._len() < 2)
+
+        self._scalar_tracks = ScalarTracks(dataset, self._seq) if hasattr(dataset, 'viz') else None
+        if self._scalar_tracks is not None and not len(self._scalar_tracks.viz_ids()):
+            self._scalar_tracks = None
+        self._track_strip.set_tracks(self._scalar_tracks)
+        self._tracks_button.setHidden(self._scalar_tracks is None or self._len() < 2)
+
+    def add_tracks(self, tracks):
+        if self._scalar_tracks is None:
+            raise Exception("the dataset has no visualizations to compute statistics of")
+        self._scalar_tracks.add_tracks(tracks)
+
+    def _update_tracks_menu(self):
+        # One submenu per visualization with its statistics as checkable
+        # entries
+        self._tracks_menu.clear()
+        if self._scalar_tracks is None:
+            return
+        tracks = self._scalar_tracks.tracks()
+        for viz_id in self._scalar_tracks.viz_ids():
+            menu = self._tracks_menu.addMenu(str(viz_id))
+            for statistic in statistic_names():
+                action = menu.addAction(statistic)
+                action.setCheckable(True)
+                action.setChecked((viz_id, statistic) in tracks)
+                action.toggled.connect(lambda value, track=(viz_id, statistic): self._toggle_track(track, value))
+        if len(tracks):
+            self._tracks_menu.addSeparator()
+            self._tracks_menu.addAction("Remove All").triggered.connect(self._scalar_tracks.clear)
+
+    def _toggle_track(self, track, value):
+        if value:
+            self._scalar_tracks.add_track(*track)
+        else:
+            self._scalar_tracks.remove_track(*track)
 
     def goto_index(self, index):
         if self._index == index: return
@@ -55,22 +165,17 @@ class SequenceControls(QWidget):
         self._index = index
 
         self._slider.change_value(index)
+        self._filmstrip.set_index(index)
+        self._track_strip.set_index(index)
 
-        item = self._ds.seq.full_item_list()[self._index]
-        group_label = item["group_label"]
-        group_id = item["group_id"]
+        group = self._seq.group(self._index)
         self._group_id_dropdown.blockSignals(True)
-        self._group_id_dropdown.setCurrentText(group_label)
+        self._group_id_dropdown.setCurrentIndex(group)
         self._group_id_dropdown.blockSignals(False)
 
-        item_label = item["item_label"]
         self._item_id_dropdown.blockSignals(True)
-        self._item_id_dropdown.clear()
-        for item in self._ds.seq.item_list(group_id):
-            index = item["index"]
-            label = item["label"]
-            self._item_id_dropdown.addItem(label, index)
-        self._item_id_dropdown.setCurrentText(item_label)
+        self._item_model.set_group(group)
+        self._item_id_dropdown.setCurrentIndex(self._seq.row(self._index))
         self._item_id_dropdown.blockSignals(False)
 
         self.index_changed.emit(self._index)
@@ -80,11 +185,18 @@ class SequenceControls(QWidget):
 
         self._layout.setContentsMargins(0, 0, 0, 0)
 
+        # Sizing the dropdowns to their contents would visit every label
         self._group_id_dropdown = QComboBox()
+        self._group_id_dropdown.setSizeAdjustPolicy(QComboBox.AdjustToMinimumContentsLengthWithIcon)
+        self._group_id_dropdown.setMinimumContentsLength(12)
+        self._group_id_dropdown.view().setUniformItemSizes(True)
         self._group_id_dropdown.currentIndexChanged.connect(self.current_group_dropdown_changed)
         self._layout.addWidget(self._group_id_dropdown, 0, 0, 1, 1)
 
         self._item_id_dropdown = QComboBox()
+        self._item_id_dropdown.setSizeAdjustPolicy(QComboBox.AdjustToMinimumContentsLengthWithIcon)
+        self._item_id_dropdown.setMinimumContentsLength(12)
+        self._item_id_dropdown.view().setUniformItemSizes(True)
         self._item_id_dropdown.currentIndexChanged.connect(self.current_sample_dropdown_changed)
         self._layout.addWidget(self._item_id_dropdown, 0, 1, 1, 1)
 
@@ -119,9 +231,27 @@ class SequenceControls(QWidget):
         self._next_button.clicked.connect(self.next)
         self._layout.addWidget(self._next_button, 0, 4, 1, 1)
 
+        self._tracks_menu = QMenu(self)
+        self._tracks_menu.aboutToShow.connect(self._update_tracks_menu)
+        self._tracks_button = QToolButton()
+        self._tracks_button.setText("Tracks")
+        self._tracks_button.setToolTip("Show per frame statistics under the slider")
+        self._tracks_button.setMenu(self._tracks_menu)
+        self._tracks_button.setPopupMode(QToolButton.InstantPopup)
+        self._layout.addWidget(self._tracks_button, 0, 7, 1, 1)
+
+        # Tracks are aligned with the slider, their names are shown left of it
+        self._track_strip = TrackStrip(self._slider)
+        self._track_strip.index_changed.connect(self.goto_index)
+        self._layout.addWidget(self._track_strip, 1, 0, 1, 3)
+
+        self._filmstrip = Filmstrip()
+        self._filmstrip.index_changed.connect(self.goto_index)
+        self._layout.addWidget(self._filmstrip, 2, 0, 1, 8)
+
         self.setLayout(self._layout)
 
-        self.set_dataset(self._ds)
+        self.set_dataset(self._ds, self._seq)
 
     def _update_fps(self, value):
         self._frame_delay = 1 / value
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+
+### --------------------------------------------- ###
+### Part of iViz                                  ###
+### (C) 2022 Eddy ilg (me@eddy-ilg.net)           ###
+### Creative Commons                              ###
+### Attribution-NonCommercial-NoDerivatives       ###
+### 4.0 International License.                    ###
+### Commercial use an redistribution prohibited.  ###
+### See https://github.com/eddy-ilg/iviz          ###
+### --------------------------------------------- ###
+
+import numpy as np
+from PyQt5.QtWidgets import QWidget, QSizePolicy, QToolTip
+from PyQt5.QtCore import pyqtSignal, Qt, QPoint, QRect, QLineF
+from PyQt5.QtGui import QPainter, QPen
+from ..plots import column_range
+from ...resources import track_height, track_min_width, display_highlight_color, plot_colors
+
+
+class TrackStrip(QWidget):
+    # Per frame statistics drawn as rows of bars under the sequence slider,
+    # each frame at the horizontal position of the slider handle for it.
+    # The names of the tracks are shown left of the slider. Clicking a
+    # track jumps to the frame.
+    index_changed = pyqtSignal(int)
+
+    def __init__(self, slider):
+        super().__init__()
+        self._slider = slider
+        self._tracks = None
+        self._index = None
+        self._slider.geometry_changed.connect(self.update)
+        self.setMouseTracking(True)
+        self.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Fixed)
+        self._update_height()
+
+    def set_tracks(self, tracks):
+        if self._tracks is not None:
+            self._tracks.values_changed.disconnect(self.update)
+            self._tracks.tracks_changed.disconnect(self._update_height)
+        self._tracks = tracks
+        if tracks is not None:
+            tracks.values_changed.connect(self.update)
+            tracks.tracks_changed.connect(self._update_height)
+        self._update_height()
+
+    def set_index(self, index):
+        if self._index == index:
+            return
+        self._index = index
+        self.update()
+
+    def _track_list(self):
+        return [] if self._tracks is None else self._tracks.tracks()
+
+    def _update_height(self):
+        count = len(self._track_list())
+        # Frames can only be told apart on a slider with some room
+        self._slider.slider().setMinimumWidth(track_min_width if count else 0)
+        self.setFixedHeight(count * track_height)
+        self.setHidden(count == 0)
+        self.update()
+
+    def _span(self):
+        # Horizontal positions of the first and the last frame
+        total = self._tracks.total()
+        first = self._map_from_slider(self._slider.value_position(0))
+        last = self._map_from_slider(self._slider.value_position(max(0, total - 1)))
+        return first, max(first + 1, last)
+
+    def _map_from_slider(self, x):
+        return self.mapFromGlobal(self._slider.mapToGlobal(QPoint(x, 0))).x()
+
+    def index_at(self, x):
+        if self._tracks is None or self._tracks.total() == 0:
+            return None
+        first, last = self._span()
+        index = round((x - first) / (last - first) * (self._tracks.total() - 1))
+        return max(0, min(self._tracks.total() - 1, index))
+
+    def paintEvent(self, event):
+        if self._tracks is None:
+            return
+        painter = QPainter(self)
+        first, last = self._span()
+        columns = last - first + 1
+
+        for row, track in enumerate(self._track_list()):
+            top = row * track_height
+            bottom = top + track_height - 2
+            values = self._tracks.values(track)
+            color = plot_colors[row % len(plot_colors)]
+
+            name = f'{track[0]} {track[1]}'
+            if not self._tracks.complete(track):
+                name += f' ({100 * self._tracks.done(track) // max(1, self._tracks.total())}%)'
+            label = QRect(0, top, max(0, first - 6), track_height)
+            painter.setPen(self.palette().text().color())
+            painter.drawText(label, Qt.AlignRight | Qt.AlignVCenter, painter.fontMetrics().elidedText(name, Qt.ElideLeft, label.width()))
+
+            painter.fillRect(QRect(first, top, columns, track_height - 2), self.palette().base())
+            finite = values[np.isfinite(values)]
+            if not len(finite):
+                continue
+
+            # Bars rise from the smallest value of the track to the largest
+            # value of the frames in each column
+            low, high = finite.min(), finite.max()
+            scale = (bottom - top - 1) / (high - low) if high > low else 0.0
+            _, maxs = column_range(values, columns)
+            valid = np.flatnonzero(np.isfinite(maxs))
+            segments = np.empty((len(valid), 4))
+            segments[:, 0] = segments[:, 2] = first + valid + 0.5
+            segments[:, 1] = bottom
+            segments[:, 3] = bottom - 1 - (maxs[valid] - low) * scale
+            painter.setPen(QPen(color, 1))
+            painter.drawLines([QLineF(*segment) for segment in segments.tolist()])
+
+        if self._index is not None and self._tracks.total() > 1:
+            x = first + self._index * (last - first) / (self._tracks.total() - 1)
+            painter.setPen(QPen(display_highlight_color, 1))
+            painter.drawLine(QLineF(x, 0, x, self.height()))
+
+    def mousePressEvent(self, e):
+        if e.button() == Qt.LeftButton:
+            self._jump(e.pos())
+
+    def mouseMoveEvent(self, e):
+        if e.buttons() & Qt.LeftButton:
+            self._jump(e.pos())
+        self._show_value(e)
+
+    def _jump(self, pos):
+        if pos.x() < self._span()[0] - 2:
+            return
+        index = self.index_at(pos.x())
+        if index is not None and index != self._index:
+            self.index_changed.emit(index)
+
+    def _show_value(self, e):
+        tracks = self._track_list()
+        row = e.pos().y() // track_height
+        index = self.index_at(e.pos().x())
+        if index is None or not 0 <= row < len(tracks) or e.pos().x() < self._span()[0] - 2:
+            QToolTip.hideText()
+            return
+        value = self._tracks.values(tracks[row])[index]
+        QToolTip.showText(e.globalPos(), f'{tracks[row][0]} {tracks[row][1]}: {value:.4g} at {index}', self)
@@ -13,4 +13,6 @@
 from .image import ImageDisplay
 from .flow import FlowDisplay
 from .float import FloatDisplay
-from .text import TextDisplay
\ No newline at end of file
+from .label import LabelDisplay
+from .text import TextDisplay
+from .virtual import VirtualDisplay
\ No newline at end of file
@@ -28,6 +28,10 @@ class _BaseDisplay(QWidget):
         self._label = label
         self._index = None
         self._faded = False
+        self._suspend_reasons = set()
+        self._releasing_reasons = set()
+        self._data_pending = False
+        self._pending_data = None
 
         self._expanding_minimum_size = expanding_minimum_size
         s = viz_button_size + 2 * display_highlight_border_width
@@ -85,6 +89,59 @@ class _BaseDisplay(QWidget):
     def update_property(self, property, value):
         pass
 
+    def set_data(self, data, rendered=None):
+        # While suspended only the latest data is kept, it is applied once
+        # the display is resumed
+        if self.suspended():
+            self._pending_data = data
+            self._data_pending = True
+            return
+        self._set_data(data, rendered)
+
+    def _set_data(self, data, rendered=None):
+        pass
+
+    def suspended(self): return len(self._suspend_reasons) > 0
+
+    def set_suspended(self, value, reason="offscreen", release=True):
+        # A display is suspended as long as any reason applies, e.g. being
+        # scrolled out of view, collapsed or faded. Only reasons that make
+        # the display invisible release its pixmaps.
+        was_suspended = self.suspended()
+        if value:
+            if reason in self._suspend_reasons:
+                return
+            self._suspend_reasons.add(reason)
+            self.__log.debug(f'suspended ({reason})')
+            if release:
+                self._releasing_reasons.add(reason)
+                self.release()
+            return
+
+        if reason not in self._suspend_reasons:
+            return
+        self._suspend_reasons.remove(reason)
+        self._releasing_reasons.discard(reason)
+        self.__log.debug(f'resumed ({reason})')
+        if was_suspended and not self.suspended() and self._data_pending:
+            data = self._pending_data
+            self._pending_data = None
+            self._data_pending = False
+            self._set_data(data)
+
+    def release(self):
+        pass
+
+    def invisible(self):
+        # Suspended for a reason that hides the display (not just faded)
+        return len(self._releasing_reasons) > 0
+
+    def memory(self):
+        return 0
+
+    def release_memory(self):
+        return False
+
     def _update_contents_enabled(self):
         pass
 
@@ -96,6 +153,7 @@ class _BaseDisplay(QWidget):
 
         self.__log.debug(f'value = {value}')
         self._update_contents_enabled()
+        self.set_suspended(value, "faded", release=False)
 
     def enter(self):
         pass
@@ -18,6 +18,7 @@ from ._viz import _VisualizationDisplay
 from ..containers import View
 from itypes import addr, TraceLogger
 from ...utils import to_qpixmap, to_qimage
+from ...utils import region_statistics
 
 
 class _RasterDisplay(_VisualizationDisplay):
@@ -25,6 +26,7 @@ class _RasterDisplay(_VisualizationDisplay):
         self.__log = TraceLogger()
         self._selected_position = None
         self._selected_region = None
+        self._selected_line = None
         self._pixviz = pixviz
         super().__init__(manager, id, label)
 
@@ -54,6 +56,11 @@ class _RasterDisplay(_VisualizationDisplay):
         self._copy_selection.triggered.connect(self.copy_selection)
         self._context_menu.addAction(self._copy_selection)
 
+        self._probe_action = QAction("Probe Over Time")
+        self._probe_action.setWhatsThis("Plot the selected pixel or region across the whole sequence")
+        self._probe_action.triggered.connect(self.probe)
+        self._context_menu.addAction(self._probe_action)
+
         self._reload_action = QAction("Reload")
         self._reload_action.setWhatsThis("Reload the current file")
         self._reload_action.triggered.connect(self.reload)
@@ -75,6 +82,19 @@ class _RasterDisplay(_VisualizationDisplay):
             QApplication.clipboard().clear()
         self.__log.debug("called")
 
+    def probe_region(self):
+        # Selection in image pixels, a selected pixel is a 1 x 1 region
+        if self._selected_region is not None:
+            return QRect(self._selected_region)
+        if self._selected_position is not None:
+            return QRect(int(self._selected_position.x()), int(self._selected_position.y()), 1, 1)
+        return None
+
+    def probe(self):
+        region = self.probe_region()
+        if region is not None and self.is_valid():
+            self._manager.request_probe(self, region)
+
     def drag_and_drop_image(self):
         if self._view.pixviz() is not None and self._view.selected_region_image() is not None:
             image = self._view.selected_region_image()
@@ -93,6 +113,7 @@ class _RasterDisplay(_VisualizationDisplay):
 
         self._view.selected_pixel_changed.connect(self.select_pixel)
         self._view.selected_region_changed.connect(self.select_region)
+        self._view.selected_line_changed.connect(self.select_line)
         self._view.selection_cleared.connect(self.clear_selection)
         self._view.mouse_hovered.connect(self.hover)
         self._view.zoom_changed.connect(self._update_zoom)
@@ -127,6 +148,7 @@ class _RasterDisplay(_VisualizationDisplay):
             var_id = self._view.pixviz().data().var_id()
 
         self._update_source_info(var_id, self._view.pixviz().file())
+        self._manager.notify_data_changed(self)
 
     def is_valid(self):
         if self._view.pixviz() is None or not self._view.pixviz().valid():
@@ -141,10 +163,12 @@ class _RasterDisplay(_VisualizationDisplay):
             self._copy_path_action.setEnabled(False)
             self._copy_image.setEnabled(False)
             self._copy_selection.setEnabled(False)
+            self._probe_action.setEnabled(False)
         else:
             self._copy_path_action.setEnabled(True)
             self._copy_image.setEnabled(True)
             self._copy_selection.setEnabled(self._selected_region is not None)
+            self._probe_action.setEnabled(self.probe_region() is not None)
 
         self._label_widget.setEnabled(not fade)
         self._head_widget.setEnabled(not fade)
@@ -157,6 +181,8 @@ class _RasterDisplay(_VisualizationDisplay):
             return
         if self._selected_region is not None:
             return
+        if self._selected_line is not None:
+            return
         if image_point is None or image_point.isNull():
             return self.set_idle_message()
         self._update_hover_message(int(image_point.x()), int(image_point.y()))
@@ -174,16 +200,56 @@ class _RasterDisplay(_VisualizationDisplay):
         width = x2 - x1
         height = y2 - y1
 
-        data = self._view.pixviz().numpy_data()[y1:y2, x1:x2, :]
+        stats = region_statistics(self._view.pixviz().numpy_data()).query(x1, y1, x2, y2)
 
-        if width > 0 and height > 0:
+        if width > 0 and height > 0 and stats is not None:
             self.set_status_message(
-                f'Selected: tl = ({x1}, {y1}), br = ({x2}, {y2}), width = {width}, height = {height}, min = {data.min()}, max = {data.max()}, mean = {data.mean():.2f}')
+                f'Selected: tl = ({x1}, {y1}), br = ({x2}, {y2}), width = {width}, height = {height}, min = {stats.min}, max = {stats.max}, mean = {stats.mean:.2f}, std = {stats.std:.2f}')
         else:
             self.set_idle_message()
 
-    def set_data(self, data):
-        self.view().pixviz().set_data(data)
+    def render(self, data):
+        # Thread safe, see RenderPipeline
+        if self._view.pixviz() is None:
+            return None
+        rendered = self._view.pixviz().render(data)
+        self._view.pixviz().store_preview(rendered)
+        return rendered
+
+    def show_preview(self, data):
+        # Shows a preview from a previous run until data is set, returns
+        # whether there was one
+        if self._view.pixviz() is None or data is None:
+            return False
+        image = self._view.pixviz().load_preview(data)
+        if image is None:
+            return False
+        self._view.set_preview(image)
+        return True
+
+    def _set_data(self, data, rendered=None):
+        self.view().pixviz().set_data(data, rendered)
+
+    def release(self):
+        self._view.renderer().release()
+
+    def memory(self):
+        total = self._view.renderer().memory()
+        if self._view.pixviz() is not None:
+            total += self._view.pixviz().memory()
+        return total
+
+    def release_memory(self):
+        # Also drops the colorized image of a hidden display, its data is
+        # set again once it is resumed
+        self.release()
+        pixviz = self._view.pixviz()
+        if pixviz is None or not pixviz.release_image():
+            return False
+        if not self._data_pending:
+            self._pending_data = pixviz.data()
+            self._data_pending = True
+        return True
 
     def _update_selected_position_message(self, x, y):
         pass
@@ -217,28 +283,49 @@ class _RasterDisplay(_VisualizationDisplay):
                 return self.set_idle_message()
             return self._update_selected_region_message(x1, y1, x2, y2)
 
+        if self._selected_line is not None:
+            return self._update_selected_line_message(self._selected_line)
+
         return self.set_idle_message()
 
+    def _update_selected_line_message(self, line):
+        self.set_status_message(
+            f'Line: from ({line.x1():.1f}, {line.y1():.1f}) to ({line.x2():.1f}, {line.y2():.1f}), length = {line.length():.1f}')
+
     def select_pixel(self, norm_pos):
         self._selected_region = None
+        self._selected_line = None
         self._selected_position = self._view.renderer().norm_to_image(norm_pos)
+        self._probe_action.setEnabled(self.is_valid())
         self._update_status_message()
 
     def select_region(self, norm_rect):
         self._selected_position = None
+        self._selected_line = None
         int_region = self._view.renderer().overlays().selection.int_region()
         if int_region is not None:
             self._selected_region = int_region
             self._copy_selection.setEnabled(True)
         else:
             self._copy_selection.setEnabled(False)
+        self._probe_action.setEnabled(self.is_valid() and self._selected_region is not None)
+        self._update_status_message()
+
+    def select_line(self, norm_line):
+        self._selected_position = None
+        self._selected_region = None
+        self._selected_line = self._view.selected_line()
+        self._copy_selection.setEnabled(False)
+        self._probe_action.setEnabled(False)
         self._update_status_message()
 
     def clear_selection(self):
         self.__log.debug(f'called')
         self._selected_position = None
         self._selected_region = None
+        self._selected_line = None
         self._copy_selection.setEnabled(False)
+        self._probe_action.setEnabled(False)
         self._update_status_message()
 
     def set_idle_message(self):
@@ -14,11 +14,12 @@ from itypes import addr, TraceLogger
 from ._raster import _RasterDisplay
 from ..controls import FloatRangeSlider
 from PyQt5.Qt import Qt, QSizePolicy, pyqtSignal, QTimer, QEvent
-from PyQt5.QtWidgets import QLabel, QPushButton, QWidget, QGridLayout, QSpinBox
+from PyQt5.QtWidgets import QLabel, QPushButton, QWidget, QGridLayout, QSpinBox, QAction
 from PyQt5.QtGui import QPalette
 from .widgets import DisplayComboBox
 from ..basic import Divider
 from ...resources import status_bar_color
+from ...utils import region_statistics
 
 
 class FloatDisplay(_RasterDisplay):
@@ -63,6 +64,15 @@ class FloatDisplay(_RasterDisplay):
         if self._pixviz is not None:
             self._view.set_pixviz(self._pixviz)
 
+    def _create_context_menu(self):
+        super()._create_context_menu()
+
+        self._quantized_action = QAction("Quantized Ranges")
+        self._quantized_action.setWhatsThis("Quantize each frame once so that range changes are instant, at 16 bit precision")
+        self._quantized_action.setCheckable(True)
+        self._quantized_action.triggered.connect(self._change_quantized)
+        self._context_menu.addAction(self._quantized_action)
+
     def _range_to_channel(self):
         viz = self._view.pixviz()
         if viz is None: return
@@ -95,6 +105,8 @@ class FloatDisplay(_RasterDisplay):
         else:                         self._viz_type.setCurrentText('RGB')
         self._viz_type.blockSignals(False)
 
+        self._quantized_action.setChecked(viz.quantized())
+
         if viz.valid():
             self._range_slider.blockSignals(True)
             self._range_slider.set_range(
@@ -131,6 +143,10 @@ class FloatDisplay(_RasterDisplay):
             self.__log.debug(f"property float_viz_range_max updated to {value}")
             pixviz.set_range_max(value)
 
+        if property == 'float_quantized':
+            self.__log.debug(f"property float_quantized updated to {value}")
+            pixviz.set_quantized(value)
+
     def _change_viz_type(self, value):
         if value == 0:   type = 'heatmap'
         elif value == 1: type = 'grayscale'
@@ -139,6 +155,10 @@ class FloatDisplay(_RasterDisplay):
         self.__log.debug(f"broadcasting float_viz_type")
         self._manager.broadcast_property_update(self, 'float_viz_type', type)
 
+    def _change_quantized(self, value):
+        self.__log.debug(f"broadcasting float_quantized = {value}")
+        self._manager.broadcast_property_update(self, 'float_quantized', value)
+
     def _change_viz_range_min(self, value):
         self.__log.debug(f"broadcasting float_viz_range_min = {value}")
         self._manager.broadcast_property_update(self, 'float_viz_range_min', value)
@@ -192,9 +212,9 @@ class FloatDisplay(_RasterDisplay):
         width = x2 - x1
         height = y2 - y1
 
-        data = viz.numpy_slice_data()[y1:y2, x1:x2, :]
+        stats = region_statistics(viz.numpy_data()).query(x1, y1, x2, y2)
 
-        if width > 0 and height > 0:
-            self.set_status_message(f'Selected: start = {index1}, end = {index2}, min = {data.min()}, max = {data.max()}, mean = {data.mean():.2f}')
+        if width > 0 and height > 0 and stats is not None:
+            self.set_status_message(f'Selected: start = {index1}, end = {index2}, min = {stats.min}, max = {stats.max}, mean = {stats.mean:.2f}, std = {stats.std:.2f}')
         else:
             self.set_idle_message()
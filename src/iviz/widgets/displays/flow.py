@@ -14,6 +14,7 @@ from itypes import addr, TraceLogger
 from ._raster import _RasterDisplay
 from ..controls import FlowScaleSlider
 from .widgets import DisplayComboBox
+from ...renderers.pixviz.renderer.flow_arrows import FlowArrows
 from PyQt5.QtWidgets import QPushButton
 
 
@@ -46,6 +47,16 @@ class FlowDisplay(_RasterDisplay):
         self._controls_layout.addWidget(self._max_button, 1, 2)
         self._max_button.clicked.connect(self._range_to_max)
 
+        self._arrows_button = QPushButton("Vec")
+        self._arrows_button.setFixedWidth(40)
+        self._arrows_button.setCheckable(True)
+        self._arrows_button.setWhatsThis("Show flow vectors as arrows")
+        self._controls_layout.addWidget(self._arrows_button, 0, 3, 2, 1)
+        self._arrows_button.toggled.connect(self._change_arrows)
+
+        self._arrows = FlowArrows()
+        self._view.renderer().add_layer("flow_arrows", self._arrows)
+
         if self._pixviz is not None:
             self._view.set_pixviz(self._pixviz)
 
@@ -70,6 +81,12 @@ class FlowDisplay(_RasterDisplay):
 
         self._slider.set_value(viz.scale())
 
+        if viz.valid():
+            self._arrows.set_flow(viz.numpy_data(), viz.scale())
+        else:
+            self._arrows.set_flow(None)
+        self._view.renderer().invalidate_frame()
+
         self.__log.debug(f"visualization renderer updated, viz_type={viz_type}, scale={viz.scale()}")
 
         super()._pixviz_updated()
@@ -86,6 +103,18 @@ class FlowDisplay(_RasterDisplay):
             self.__log.debug(f"property flow_scale updated to {value}")
             pixviz.set_scale(value)
 
+        if property == 'flow_arrows':
+            self.__log.debug(f"property flow_arrows updated to {value}")
+            self._set_arrows_visible(value)
+
+    def _set_arrows_visible(self, value):
+        self._arrows_button.blockSignals(True)
+        self._arrows_button.setChecked(value)
+        self._arrows_button.blockSignals(False)
+        self._arrows.set_visible(value)
+        self._view.renderer().invalidate_frame()
+        self._view.update()
+
     def _change_viz_type(self, value):
         if value == 0: type = 'middlebury'
         else:          type = 'sintel'
@@ -97,6 +126,10 @@ class FlowDisplay(_RasterDisplay):
         self.__log.debug(f"broadcasting flow_scale")
         self._manager.broadcast_property_update(self, 'flow_scale', value)
 
+    def _change_arrows(self, value):
+        self.__log.debug(f"broadcasting flow_arrows")
+        self._manager.broadcast_property_update(self, 'flow_arrows', value)
+
     def _update_hover_message(self, x, y):
         data = self._view.pixviz().numpy_data()
         if x < data.shape[1] and y < data.shape[0]:
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+
+### --------------------------------------------- ###
+### Part of iViz                                  ###
+### (C) 2022 Eddy ilg (me@eddy-ilg.net)           ###
+### Creative Commons                              ###
+### Attribution-NonCommercial-NoDerivatives       ###
+### 4.0 International License.                    ###
+### Commercial use an redistribution prohibited.  ###
+### See https://github.com/eddy-ilg/iviz          ###
+### --------------------------------------------- ###
+
+from ._raster import _RasterDisplay
+from .widgets import DisplayComboBox
+from itypes import TraceLogger
+from PyQt5.QtWidgets import QSizePolicy, QLabel, QPushButton, QAction
+
+
+class LabelDisplay(_RasterDisplay):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.__log = TraceLogger()
+        self.initUI()
+
+    def initUI(self):
+        super().initUI()
+
+        self._palette = DisplayComboBox()
+        self._palette.addItem('COLOR')
+        self._palette.addItem('GRAY')
+        self._controls_layout.addWidget(self._palette, 0, 0)
+        self._palette.activated.connect(self._change_palette)
+
+        self._spacer = QLabel()
+        self._spacer.setSizePolicy(QSizePolicy.MinimumExpanding, QSizePolicy.Minimum)
+        self._controls_layout.addWidget(self._spacer, 0, 1)
+
+        self._show_all_button = QPushButton("Show All")
+        self._show_all_button.setFixedWidth(65)
+        self._controls_layout.addWidget(self._show_all_button, 0, 2)
+        self._show_all_button.clicked.connect(self._show_all_labels)
+
+        if self._pixviz is not None:
+            self._view.set_pixviz(self._pixviz)
+
+    def _create_context_menu(self):
+        super()._create_context_menu()
+
+        self._hide_label_action = QAction("Hide Selected Label")
+        self._hide_label_action.setWhatsThis("Hide the label at the selected pixel")
+        self._hide_label_action.triggered.connect(self._hide_selected_label)
+        self._context_menu.addAction(self._hide_label_action)
+
+        self._show_all_action = QAction("Show All Labels")
+        self._show_all_action.setWhatsThis("Show all hidden labels")
+        self._show_all_action.triggered.connect(self._show_all_labels)
+        self._context_menu.addAction(self._show_all_action)
+
+    def _pixviz_updated(self):
+        viz = self._view.pixviz()
+
+        if viz.palette() == 'gray': self._palette.setCurrentText('GRAY')
+        else:                       self._palette.setCurrentText('COLOR')
+
+        self._show_all_button.setEnabled(len(viz.hidden()) > 0)
+        self._hide_label_action.setEnabled(self._selected_label() is not None)
+
+        super()._pixviz_updated()
+
+    def update_property(self, property, value):
+        pixviz = self.view().pixviz()
+        if pixviz is None: return
+
+        if property == 'label_palette':
+            self.__log.debug(f"property label_palette updated to {value}")
+            pixviz.set_palette(value)
+
+        if property == 'label_highlighted':
+            self.__log.debug(f"property label_highlighted updated to {value}")
+            pixviz.set_highlighted(value)
+
+        if property == 'label_hidden':
+            self.__log.debug(f"property label_hidden updated to {value}")
+            pixviz.set_hidden(value)
+
+    def _change_palette(self, value):
+        if value == 0: palette = 'color'
+        else:          palette = 'gray'
+
+        self.__log.debug(f"broadcasting label_palette")
+        self._manager.broadcast_property_update(self, 'label_palette', palette)
+
+    def _selected_label(self):
+        if self._selected_position is None:
+            return None
+        return self._view.pixviz().label(int(self._selected_position.x()), int(self._selected_position.y()))
+
+    def _hide_selected_label(self):
+        label = self._selected_label()
+        if label is None:
+            return
+        hidden = self._view.pixviz().hidden() | {label}
+        self._manager.broadcast_property_update(self, 'label_hidden', hidden)
+
+    def _show_all_labels(self):
+        self._manager.broadcast_property_update(self, 'label_hidden', frozenset())
+
+    def _highlight(self, label):
+        # Selections reach all linked displays, so only the clicked display
+        # shares its label, the others highlight the label at their own
+        # selection
+        if self._manager.current_display() is self:
+            self._manager.broadcast_property_update(self, 'label_highlighted', label)
+        else:
+            self.update_property('label_highlighted', label)
+
+    def select_pixel(self, norm_pos):
+        super().select_pixel(norm_pos)
+        self._hide_label_action.setEnabled(self._selected_label() is not None)
+        self._highlight(self._selected_label())
+
+    def select_region(self, norm_rect):
+        super().select_region(norm_rect)
+        self._hide_label_action.setEnabled(False)
+        self._highlight(None)
+
+    def clear_selection(self):
+        super().clear_selection()
+        self._hide_label_action.setEnabled(False)
+        self._highlight(None)
+
+    def _update_hover_message(self, x, y):
+        label = self._view.pixviz().label(x, y)
+        if label is None:
+            return self.set_idle_message()
+        self.set_status_message(f"Hover: x = {x}, y = {y}, label = {label}")
+
+    def _update_selected_position_message(self, x, y):
+        label = self._view.pixviz().label(x, y)
+        if label is None:
+            return self.set_idle_message()
+        self.set_status_message(f"Selected: x = {x}, y = {y}, label = {label}")
@@ -98,7 +98,7 @@ class TextDisplay(_BaseDisplay):
         if self._height is not None: height = self._height
         return QSize(width, height)
 
-    def set_data(self, data):
+    def _set_data(self, data, rendered=None):
         text = self._text
         if data is not None:
             text = data.text().data()
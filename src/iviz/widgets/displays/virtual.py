@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+
+### --------------------------------------------- ###
+### Part of iViz                                  ###
+### (C) 2022 Eddy ilg (me@eddy-ilg.net)           ###
+### Creative Commons                              ###
+### Attribution-NonCommercial-NoDerivatives       ###
+### 4.0 International License.                    ###
+### Commercial use an redistribution prohibited.  ###
+### See https://github.com/eddy-ilg/iviz          ###
+### --------------------------------------------- ###
+
+from itypes import TraceLogger
+from PyQt5.QtWidgets import QLabel, QGridLayout
+from PyQt5.QtGui import QPainter
+from PyQt5.QtCore import pyqtSignal, Qt, QTimer
+from ._base import _BaseDisplay
+from ...resources import display_color
+
+
+class _PendingView:
+    # Records the calls the manager broadcasts to the view of a display that
+    # is not created yet: the interpolation, the last selection and the zoom
+    # and pan since the last absolute zoom
+    def __init__(self):
+        self._interpolation = None
+        self._selection = None
+        self._zoom = []
+
+    def set_interpolation(self, value): self._interpolation = value
+    def select_pixel(self, value): self._selection = ('select_pixel', value)
+    def select_region(self, value): self._selection = ('select_region', value)
+    def select_line(self, value): self._selection = ('select_line', value)
+    def clear_selection(self): self._selection = ('clear_selection',)
+
+    def set_relative_zoom(self, value, pos): self._zoom = [('set_relative_zoom', value, pos)]
+    def set_screen_zoom(self, value, pos): self._zoom = [('set_screen_zoom', value, pos)]
+    def zoom_to_selection(self): self._zoom = [('zoom_to_selection',)]
+    def set_pan_offset(self, value): self._zoom.append(('set_pan_offset', value))
+
+    def differential_relative_zoom(self, value, pos):
+        # Consecutive steps about the same position are combined
+        if len(self._zoom) and self._zoom[-1][0] == 'differential_relative_zoom' and self._zoom[-1][2] == pos:
+            self._zoom[-1] = ('differential_relative_zoom', self._zoom[-1][1] * value, pos)
+        else:
+            self._zoom.append(('differential_relative_zoom', value, pos))
+
+    def differential_pan_offset(self, value):
+        if len(self._zoom) and self._zoom[-1][0] == 'differential_pan_offset':
+            self._zoom[-1] = ('differential_pan_offset', self._zoom[-1][1] + value)
+        else:
+            self._zoom.append(('differential_pan_offset', value))
+
+    def replay(self, view):
+        if self._interpolation is not None:
+            view.set_interpolation(self._interpolation)
+        calls = [] if self._selection is None else [self._selection]
+        view.replay(calls + self._zoom)
+
+
+class VirtualDisplay(_BaseDisplay):
+    # Stands in for a display until it is first painted, i.e. scrolled into
+    # view. Data, property updates and view calls received until then are
+    # kept and handed to the real display, which then replaces the proxy in
+    # its container and in the manager.
+    materialized = pyqtSignal(object)
+
+    def __init__(self, manager, factory, id=None, label=None):
+        self.__log = TraceLogger()
+        super().__init__(manager, id, label)
+        self._factory = factory
+        self._display = None
+        self._has_data = False
+        self._data = None
+        self._properties = {}
+        self._pending_view = _PendingView()
+        self._show_controls = True
+        self._materialize_pending = False
+        self.initUI()
+
+    def initUI(self):
+        self._layout = QGridLayout()
+        self._layout.setContentsMargins(0, 0, 0, 0)
+        self._label_widget = QLabel(self._id if self._label is None else self._label)
+        self._label_widget.setAlignment(Qt.AlignCenter)
+        self._label_widget.setStyleSheet("color: #999999; font-weight: bold")
+        self._layout.addWidget(self._label_widget)
+        self.setLayout(self._layout)
+
+    def display(self): return self._display
+    def pending_view(self): return self._pending_view
+
+    def set_data(self, data, rendered=None):
+        self._has_data = True
+        self._data = data
+
+    def update_property(self, property, value):
+        self._properties[property] = value
+
+    def set_show_controls(self, value):
+        self._show_controls = value
+
+    def drag_and_drop_image(self):
+        return None
+
+    def paintEvent(self, e):
+        p = QPainter(self)
+        p.fillRect(self.rect(), display_color)
+        if self._display is None and not self._materialize_pending:
+            self._materialize_pending = True
+            QTimer.singleShot(0, self.materialize)
+
+    def materialize(self):
+        if self._display is not None:
+            return self._display
+        self.__log.debug(f"creating display {self._id}")
+
+        display = self._factory(self._manager)
+        self._display = display
+        self._manager.replace_display(self, display)
+        display.set_show_controls(self._show_controls)
+        display.set_faded(self._faded)
+        for property, value in self._properties.items():
+            display.update_property(property, value)
+        if self._has_data:
+            display.set_data(self._data)
+        self._data = None
+        if hasattr(display, 'view'):
+            self._pending_view.replay(display.view())
+
+        if self.parent() is not None:
+            self.parent().replace_display(display)
+        self.materialized.emit(display)
+        self.deleteLater()
+        return display
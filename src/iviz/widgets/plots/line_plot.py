@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+
+### --------------------------------------------- ###
+### Part of iViz                                  ###
+### (C) 2022 Eddy ilg (me@eddy-ilg.net)           ###
+### Creative Commons                              ###
+### Attribution-NonCommercial-NoDerivatives       ###
+### 4.0 International License.                    ###
+### Commercial use an redistribution prohibited.  ###
+### See https://github.com/eddy-ilg/iviz          ###
+### --------------------------------------------- ###
+
+import numpy as np
+from PyQt5.QtWidgets import QWidget, QSizePolicy
+from PyQt5.QtCore import pyqtSignal, Qt, QPointF, QLineF, QRectF, QSize
+from PyQt5.QtGui import QPainter, QPen, QPolygonF, QFontMetrics
+from ...resources import display_highlight_color, plot_colors, plot_channel_colors
+
+
+def _segments(values):
+    # Runs of consecutive finite values, as (start, stop)
+    finite = np.concatenate([[False], np.isfinite(values), [False]])
+    edges = np.flatnonzero(finite[1:] != finite[:-1])
+    return zip(edges[0::2], edges[1::2])
+
+
+def column_range(values, columns):
+    # Smallest and largest finite value of the samples falling into each of
+    # the pixel columns, NaN for columns without one. With fewer samples
+    # than columns each column takes the nearest sample.
+    if len(values) > columns:
+        starts = (np.arange(columns) * len(values)) // columns
+        return np.fmin.reduceat(values, starts), np.fmax.reduceat(values, starts)
+    nearest = np.rint(np.arange(columns) * ((len(values) - 1) / max(1, columns - 1))).astype(np.intp)
+    return values[nearest], values[nearest]
+
+
+def curve_colors(names):
+    return [plot_channel_colors.get(name, plot_colors[i % len(plot_colors)]) for i, name in enumerate(names)]
+
+
+class LinePlot(QWidget):
+    # Curves over sample indices, sharing one y axis. Curves with fewer
+    # samples than the longest one are stretched to the same width. Curves
+    # with more samples than pixel columns are drawn as the min/max envelope
+    # of each column. Clicking or dragging emits the index under the mouse.
+    index_clicked = pyqtSignal(int)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._curves = []
+        self._length = 0
+        self._marker = None
+        self._range = None
+        self.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
+        self.setMinimumHeight(100)
+
+    def sizeHint(self):
+        return QSize(400, 140)
+
+    def set_curves(self, curves):
+        # curves is a list of (label, values, color), non-finite values
+        # leave gaps
+        self._curves = [(label, np.asarray(values, dtype=np.float64), color) for label, values, color in curves]
+        self._length = max([len(values) for _, values, _ in self._curves], default=0)
+        self._range = self._value_range()
+        self.update()
+
+    def set_marker(self, index):
+        if self._marker == index:
+            return
+        self._marker = index
+        self.update()
+
+    def curves(self): return self._curves
+    def marker(self): return self._marker
+
+    def _value_range(self):
+        finite = [values[np.isfinite(values)] for _, values, _ in self._curves]
+        finite = [values for values in finite if len(values)]
+        if not len(finite):
+            return None
+        low = min(values.min() for values in finite)
+        high = max(values.max() for values in finite)
+        if low == high:
+            low, high = low - 0.5, high + 0.5
+        return low, high
+
+    def _plot_rect(self):
+        metrics = QFontMetrics(self.font())
+        left = metrics.horizontalAdvance('-0.000e+00') + 6
+        top = metrics.height() + 4
+        return QRectF(left, top, max(1, self.width() - left - 8), max(1, self.height() - top - 6))
+
+    def _x(self, rect, index):
+        if self._length <= 1:
+            return rect.left()
+        return rect.left() + index * rect.width() / (self._length - 1)
+
+    def index_at(self, x):
+        if self._length == 0:
+            return None
+        rect = self._plot_rect()
+        index = round((x - rect.left()) / rect.width() * (self._length - 1))
+        return max(0, min(self._length - 1, index))
+
+    def _paint_curve(self, painter, rect, values, low, high):
+        scale = rect.height() / (high - low)
+        columns = int(rect.width())
+        if len(values) > columns:
+            mins, maxs = column_range(values, columns)
+            valid = np.flatnonzero(np.isfinite(mins))
+            segments = np.empty((len(valid), 4))
+            segments[:, 0] = segments[:, 2] = rect.left() + valid + 0.5
+            segments[:, 1] = rect.bottom() - (mins[valid] - low) * scale
+            segments[:, 3] = rect.bottom() - (maxs[valid] - low) * scale
+            painter.drawLines([QLineF(*segment) for segment in segments.tolist()])
+            return
+
+        xs = rect.left() + np.arange(len(values)) * (rect.width() / max(1, len(values) - 1))
+        ys = rect.bottom() - (values - low) * scale
+        for start, stop in _segments(values):
+            if stop - start == 1:
+                painter.drawPoint(QPointF(xs[start], ys[start]))
+                continue
+            painter.drawPolyline(QPolygonF([QPointF(x, y) for x, y in zip(xs[start:stop], ys[start:stop])]))
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), self.palette().base())
+        rect = self._plot_rect()
+        painter.setPen(self.palette().mid().color())
+        painter.drawRect(rect)
+
+        if self._range is not None:
+            low, high = self._range
+            painter.setPen(self.palette().text().color())
+            flags = Qt.AlignRight | Qt.AlignVCenter
+            painter.drawText(QRectF(0, rect.top() - 10, rect.left() - 4, 20), flags, f'{high:.4g}')
+            painter.drawText(QRectF(0, rect.bottom() - 10, rect.left() - 4, 20), flags, f'{low:.4g}')
+
+            painter.save()
+            painter.setClipRect(rect)
+            for _, values, color in self._curves:
+                # Antialiasing costs far more than the curve is worth once
+                # it has a sample per pixel column
+                painter.setRenderHint(QPainter.Antialiasing, len(values) <= rect.width())
+                painter.setPen(QPen(color, 1.5))
+                self._paint_curve(painter, rect, values, low, high)
+            painter.restore()
+
+        if self._marker is not None and 0 <= self._marker < self._length:
+            x = self._x(rect, self._marker)
+            painter.setPen(QPen(display_highlight_color, 1))
+            painter.drawLine(QLineF(x, rect.top(), x, rect.bottom()))
+
+        # Legend with the values at the marker
+        x = rect.left()
+        for label, values, color in self._curves:
+            text = label
+            if self._marker is not None and 0 <= self._marker < len(values):
+                text = f'{label} = {values[self._marker]:.4g}'
+            painter.setPen(color)
+            painter.drawText(QPointF(x, rect.top() - 4), text)
+            x += painter.fontMetrics().horizontalAdvance(text) + 12
+
+    def mousePressEvent(self, e):
+        if e.button() == Qt.LeftButton:
+            self._emit_index(e.pos().x())
+
+    def mouseMoveEvent(self, e):
+        if e.buttons() & Qt.LeftButton:
+            self._emit_index(e.pos().x())
+
+    def _emit_index(self, x):
+        index = self.index_at(x)
+        if index is not None and index != self._marker:
+            self.index_clicked.emit(index)
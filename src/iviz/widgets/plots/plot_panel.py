@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+
+### --------------------------------------------- ###
+### Part of iViz                                  ###
+### (C) 2022 Eddy ilg (me@eddy-ilg.net)           ###
+### Creative Commons                              ###
+### Attribution-NonCommercial-NoDerivatives       ###
+### 4.0 International License.                    ###
+### Commercial use an redistribution prohibited.  ###
+### See https://github.com/eddy-ilg/iviz          ###
+### --------------------------------------------- ###
+
+from PyQt5.QtWidgets import QWidget, QGridLayout, QLabel, QToolButton, QSizePolicy
+from PyQt5.QtCore import pyqtSignal
+from .line_plot import LinePlot
+
+
+class PlotPanel(QWidget):
+    # Titled plot shown under the displays, with a button to close it
+    closed = pyqtSignal()
+
+    def __init__(self, title=''):
+        super().__init__()
+        self.initUI()
+        self.set_title(title)
+
+    def initUI(self):
+        lay = QGridLayout()
+        lay.setContentsMargins(0, 0, 0, 0)
+        lay.setSpacing(2)
+
+        self._title = QLabel()
+        self._title.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Fixed)
+        lay.addWidget(self._title, 0, 0)
+
+        self._close = QToolButton()
+        self._close.setText('×')
+        self._close.setAutoRaise(True)
+        self._close.setToolTip("Close")
+        self._close.clicked.connect(self.close_panel)
+        lay.addWidget(self._close, 0, 1)
+
+        self._plot = LinePlot()
+        lay.addWidget(self._plot, 1, 0, 1, 2)
+
+        self.setLayout(lay)
+
+    def plot(self): return self._plot
+
+    def set_title(self, title):
+        self._title.setText(title)
+
+    def close_panel(self):
+        self.hide()
+        self.closed.emit()